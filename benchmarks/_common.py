@@ -0,0 +1,228 @@
+"""Shared helpers for the benchmark scripts.
+
+The scripts are meant to be run from a source checkout, e.g.
+``python benchmarks/bench_stream_install.py``.
+"""
+import contextlib
+import functools
+import http.server
+import io
+import json
+import os
+import random
+import sys
+import tarfile
+import threading
+import time
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR / "lib"))
+sys.path.insert(0, str(ROOT_DIR / "cli"))
+
+
+class _QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class RangeRequestHandler(_QuietHandler):
+    """Static file handler that also answers single "bytes=a-b" Range requests.
+
+    rate_limit, if set on a subclass, caps each connection to that many
+    bytes per second to mimic per-connection throttling by mirrors.
+    """
+    rate_limit = None
+
+    def send_head(self):
+        self._range = None
+        path = self.translate_path(self.path)
+        header = self.headers.get("Range")
+        if not header or not os.path.isfile(path):
+            return super().send_head()
+        size = os.path.getsize(path)
+        start, _, end = header.replace("bytes=", "").partition("-")
+        start = int(start)
+        end = min(int(end), size - 1) if end else size - 1
+        if start >= size:
+            self.send_error(416)
+            return None
+        f = open(path, 'rb')
+        f.seek(start)
+        self._range = end - start + 1
+        self.send_response(206)
+        self.send_header("Content-Type", self.guess_type(path))
+        self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        self.send_header("Content-Length", str(self._range))
+        self.send_header("Accept-Ranges", "bytes")
+        self.end_headers()
+        return f
+
+    def end_headers(self):
+        if not self.headers.get("Range"):
+            self.send_header("Accept-Ranges", "bytes")
+        super().end_headers()
+
+    def copyfile(self, source, outputfile):
+        remaining = self._range
+        while remaining is None or remaining > 0:
+            block = source.read(64 * 1024 if remaining is None else min(64 * 1024, remaining))
+            if not block:
+                break
+            outputfile.write(block)
+            if remaining is not None:
+                remaining -= len(block)
+            if self.rate_limit:
+                time.sleep(len(block) / self.rate_limit)
+
+
+@contextlib.contextmanager
+def serve_directory(directory, handler_class=_QuietHandler):
+    """Serve directory over HTTP on localhost, yielding the base URL."""
+    handler = functools.partial(handler_class, directory=str(directory))
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def make_tarball(path, top_dir, size_mb, files=64, compression="gz", seed=0):
+    """Write a synthetic, partly compressible tarball with one top-level dir."""
+    rng = random.Random(seed)
+    file_size = max(1, size_mb * 1024 * 1024 // files)
+    with tarfile.open(path, f"w:{compression}") as tar:
+        for i in range(files):
+            # Half random, half repeated bytes so the compressor has work to do
+            half = file_size // 2
+            data = rng.randbytes(half) + bytes([i % 256]) * (file_size - half)
+            info = tarfile.TarInfo(f"{top_dir}/lib/file{i:05d}.dll")
+            info.size = len(data)
+            info.mode = 0o644
+            tar.addfile(info, io.BytesIO(data))
+        wine = b"#!/bin/sh\nexit 0\n"
+        info = tarfile.TarInfo(f"{top_dir}/bin/wine")
+        info.size = len(wine)
+        info.mode = 0o755
+        tar.addfile(info, io.BytesIO(wine))
+    return os.path.getsize(path)
+
+
+def write_catalog(path, entries, category="bench"):
+    """Write a catalog file in the shape of data/wine.json."""
+    data = {
+        "categories": [{"id": category, "name": category.title()}],
+        "versions": {category: entries},
+    }
+    with open(path, "w") as f:
+        json.dump(data, f)
+
+
+def synthetic_versions(count, categories=("ge-proton", "lutris", "soda", "wine-tkg")):
+    """Return a catalog dict shaped like data/wine.json with count entries."""
+    versions = {category: [] for category in categories}
+    for i in range(count):
+        category = categories[i % len(categories)]
+        name = f"{category}-{i // 100}.{i % 100}-x86_64"
+        versions[category].append({
+            "name": name,
+            "title": f"{category.title()} {i // 100}.{i % 100}",
+            "uri": f"https://example.invalid/{category}/{name}.tar.xz",
+            "files": {
+                "wine": "bin/wine",
+                "wine64": "bin/wine64",
+                "wineserver": "bin/wineserver",
+                "wineboot": "bin/wineboot",
+            },
+        })
+    return {
+        "categories": [{"id": c, "name": c.title()} for c in categories],
+        "versions": versions,
+    }
+
+
+COMPONENT_DLLS = ("d3d9.dll", "d3d10core.dll", "d3d11.dll", "dxgi.dll")
+
+
+def synthetic_components(count, categories=("dxvk", "vkd3d-proton"), uri=None):
+    """Return a catalog dict shaped like data/components.json with count entries.
+
+    uri, if given, is used for every entry, e.g. a tarball made by
+    make_component_tarball() for the first entry's name.
+    """
+    versions = {category: [] for category in categories}
+    for i in range(count):
+        category = categories[i % len(categories)]
+        name = f"{category}-{i // 100}.{i % 100}"
+        dlls = list(COMPONENT_DLLS)
+        versions[category].append({
+            "name": name,
+            "title": f"{i // 100}.{i % 100}",
+            "version": f"{i // 100}.{i % 100}",
+            "uri": uri or f"https://example.invalid/{category}/{name}.tar.gz",
+            "installation": {
+                "type": "dll_override",
+                "files": {
+                    "x32": {"source": "x32/*.dll", "target": "system32", "dlls": dlls},
+                    "x64": {"source": "x64/*.dll", "target": "system64", "dlls": dlls},
+                },
+                "overrides": [f"{dll[:-4]}=n,native" for dll in dlls],
+                "environment": {"DXVK_HUD": "1", "DXVK_LOG_LEVEL": "none"},
+            },
+        })
+    return {
+        "categories": [{"id": c, "name": c.upper()} for c in categories],
+        "versions": versions,
+    }
+
+
+def make_component_tarball(path, name, dll_kb=2048, seed=0):
+    """Write a DXVK-style component tarball: name/x32/*.dll and name/x64/*.dll."""
+    rng = random.Random(seed)
+    with tarfile.open(path, "w:gz") as tar:
+        for arch in ("x32", "x64"):
+            for dll in COMPONENT_DLLS:
+                data = rng.randbytes(dll_kb * 512) + bytes(dll_kb * 512)
+                info = tarfile.TarInfo(f"{name}/{arch}/{dll}")
+                info.size = len(data)
+                info.mode = 0o644
+                tar.addfile(info, io.BytesIO(data))
+    return os.path.getsize(path)
+
+
+def make_prefix(path, reg_sections):
+    """Create a fake Wine prefix with large user.reg and system.reg files."""
+    path = Path(path)
+    for directory in ("drive_c/windows/system32", "drive_c/windows/system64"):
+        (path / directory).mkdir(parents=True, exist_ok=True)
+    write_registry(path / "user.reg", reg_sections, root="User", seed=1)
+    write_registry(path / "system.reg", reg_sections, root="Machine", seed=2)
+    return path
+
+
+def write_registry(path, sections, values_per_section=8, root="Machine", seed=0):
+    """Write a Wine-style .reg file with the given number of sections."""
+    rng = random.Random(seed)
+    with open(path, "w") as f:
+        f.write(f"WINE REGISTRY Version 2\n;; All keys relative to \\\\{root}\n\n#arch=win64\n")
+        for i in range(sections):
+            f.write(f"\n[Software\\\\Classes\\\\CLSID\\\\{{{i:08X}-0000-0000-C000-000000000046}}] 1700000000\n")
+            f.write("#time=1da0f00aabbccdd\n")
+            for j in range(values_per_section):
+                if j % 4 == 3:
+                    data = [f"{rng.randrange(256):02x}" for _ in range(24)]
+                    f.write(f'"Blob{j}"=hex:{",".join(data[:12])},\\\n  {",".join(data[12:])}\n')
+                else:
+                    f.write(f'"Value{j}"="C:\\\\windows\\\\system32\\\\file{i}_{j}.dll"\n')
+        f.write("\n[System\\\\CurrentControlSet\\\\Control\\\\Session Manager\\\\Environment] 1700000000\n")
+        f.write('#time=1da0f00aabbccdd\n"PATH"=str(2):"C:\\\\windows"\n')
+    return os.path.getsize(path)
+
+
+def report(name, **values):
+    """Print one benchmark result line."""
+    fields = "  ".join(f"{key}={value}" for key, value in values.items())
+    print(f"{name:<32} {fields}")
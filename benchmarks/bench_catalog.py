@@ -0,0 +1,83 @@
+"""Catalog loading and lookup: linear JSON scan vs the indexed Catalog."""
+import argparse
+import json
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from _common import report, synthetic_versions
+
+from vodka import catalog as catalog_module
+from vodka.catalog import Catalog
+
+
+def linear_find(path, name):
+    """The lookup find_version used to do: parse the file and scan it."""
+    with open(path) as f:
+        data = json.load(f)
+    for category_versions in data['versions'].values():
+        for version in category_versions:
+            if version['name'].lower() == name.lower():
+                return version
+    return None
+
+
+def timed(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--entries", type=int, default=50000)
+    parser.add_argument("--lookups", type=int, default=10000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "versions.json"
+        data = synthetic_versions(args.entries)
+        with open(path, "w") as f:
+            json.dump(data, f)
+        names = [v["name"] for vs in data["versions"].values() for v in vs]
+        sample = random.Random(0).sample(names, min(args.lookups, len(names)))
+
+        report("linear json.load + scan", entries=args.entries,
+               ms_per_lookup=round(timed(lambda: linear_find(path, sample[-1]), 3) * 1e3, 2))
+
+        def cold_load():
+            catalog_module._loaded.clear()
+            Catalog.load(path)
+
+        def json_load():
+            catalog_module._loaded.clear()
+            catalog_module._cache_path(path).unlink(missing_ok=True)
+            Catalog.load(path)
+
+        report("Catalog.load (parse json)", ms=round(timed(json_load, 3) * 1e3, 2))
+        Catalog.load(path)
+        report("Catalog.load (compiled cache)", ms=round(timed(cold_load, 5) * 1e3, 2))
+
+        catalog = Catalog.load(path)
+        start = time.perf_counter()
+        for name in sample:
+            catalog.get(name.upper())
+        elapsed = time.perf_counter() - start
+        report("Catalog.get", lookups=len(sample),
+               us_per_lookup=round(elapsed / len(sample) * 1e6, 3))
+
+        # A fresh interpreter is what a CLI run sees
+        code = ("import sys, time; sys.path.insert(0, %r); from vodka.catalog import Catalog; "
+                "t = time.perf_counter(); Catalog.load(%r).get(%r); "
+                "print(time.perf_counter() - t)") % (
+                    str(Path(catalog_module.__file__).parent.parent), str(path), sample[0])
+        elapsed = float(subprocess.check_output([sys.executable, "-c", code]))
+        report("new process load + get", ms=round(elapsed * 1e3, 2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Catalog refresh: full download vs applying a delta patch.
+
+A synthetic catalog is published at revision 1, a client downloads it,
+then one release is added as revision 2 and the client refreshes again.
+The local server hosts the catalog and its deltas directory exactly as
+"python -m vodka.delta" writes them.
+"""
+import argparse
+import json
+import shutil
+import tempfile
+from pathlib import Path
+
+from _common import report, serve_directory, synthetic_versions
+
+from vodka.catalog import Catalog
+from vodka.delta import catalog_digest, publish_deltas
+from vodka.refresh import fetch_catalog
+
+
+def publish(serve_dir, data):
+    path = serve_dir / "wine.json"
+    with open(path, "w") as f:
+        json.dump(data, f, indent=4)
+    publish_deltas(path, serve_dir / "deltas")
+
+
+def new_release(data):
+    """Return data with one GE-Proton release added at the top, as revision + 1."""
+    data = json.loads(json.dumps(data))
+    data["revision"] += 1
+    name = f"GE-Proton99-{data['revision']}"
+    data["versions"]["ge-proton"].insert(0, {
+        "name": name,
+        "title": name.replace("-", " ", 1),
+        "uri": f"https://example.invalid/ge-proton/{name}.tar.gz",
+        "files": {"wine": "files/bin/wine"},
+    })
+    return data
+
+
+def refresh(label, url, dest, expected):
+    result = fetch_catalog(url, dest)
+    with open(dest) as f:
+        if catalog_digest(json.load(f)) != catalog_digest(expected):
+            raise SystemExit(f"{label}: refreshed catalog differs from the server's")
+    # The merged file loads like a downloaded one
+    assert len(Catalog.load(dest)) == sum(len(v) for v in expected["versions"].values())
+    report(label, status=result["status"], bytes=result["bytes_transferred"],
+           full_bytes=result["bytes_full"], ms=round(result["seconds"] * 1e3, 1))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=5000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        serve_dir = Path(tmp) / "serve"
+        serve_dir.mkdir()
+        client_dir = Path(tmp) / "client"
+        client_dir.mkdir()
+        dest = client_dir / "versions.json"
+
+        revision1 = {"revision": 1, **synthetic_versions(args.entries)}
+        publish(serve_dir, revision1)
+        revision2 = new_release(revision1)
+        with serve_directory(serve_dir) as base_url:
+            url = f"{base_url}/wine.json"
+            refresh("first download", url, dest, revision1)
+            refresh("unchanged", url, dest, revision1)
+
+            publish(serve_dir, revision2)
+            refresh("one release added", url, dest, revision2)
+
+            # A client whose revision has no delta falls back to a full download
+            shutil.rmtree(serve_dir / "deltas")
+            publish(serve_dir, new_release(revision2))
+            refresh("no delta available", url, dest, new_release(revision2))
+
+
+if __name__ == "__main__":
+    main()
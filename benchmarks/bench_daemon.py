@@ -0,0 +1,189 @@
+"""API latency and throughput: in-process calls vs the vodka daemon.
+
+The in-process numbers do what vodka.api does on every call: build a
+VodkaManager and compute the answer, "cold" as a new process would (no
+parsed catalog in memory) and "warm" as a long-running one. The daemon runs
+in its own process and is called through vodka.client. Finally two clients
+install the same version at once to check that the daemon serializes them
+and pushes progress events.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from _common import ROOT_DIR, make_tarball, report, serve_directory, synthetic_versions, \
+    write_catalog
+
+from vodka import catalog as catalog_module
+from vodka.api import wine
+from vodka.client import VodkaClient
+from vodka.manager import VodkaManager
+
+DAEMON = """
+import sys
+from vodka.daemon import VodkaDaemon
+from vodka.manager import VodkaManager
+VodkaDaemon(VodkaManager(sys.argv[1]), sys.argv[2]).run()
+"""
+
+# One API call from a new process, the way many orchestrator workers call
+IN_PROCESS_CALL = """
+import sys
+from vodka.api import wine
+from vodka.manager import VodkaManager
+assert wine._get_installed(VodkaManager(sys.argv[1]))["response_code"] == 200
+"""
+CLIENT_CALL = """
+import sys
+from vodka.client import VodkaClient
+assert VodkaClient(sys.argv[2]).call("WineGetInstalled")["response_code"] == 200
+"""
+
+
+def setup_base_dir(base_dir, entries, installed):
+    base_dir.mkdir()
+    data = synthetic_versions(entries)
+    versions = [version for entries in data["versions"].values() for version in entries]
+    write_catalog(base_dir / "versions.json", versions)
+    manager = VodkaManager(base_dir)
+    for version in versions[:installed]:
+        (base_dir / version["name"]).mkdir()
+        manager.manifests.write(version, base_dir / version["name"])
+
+
+def python(script, *args, **kwargs):
+    env = dict(os.environ, PYTHONPATH=str(ROOT_DIR / "lib"))
+    return subprocess.Popen([sys.executable, "-c", script, *map(str, args)], env=env,
+                            **kwargs)
+
+
+def per_process(script, base_dir, socket_path, processes):
+    """Return the median milliseconds of a new process making one call."""
+    times = []
+    for _ in range(processes):
+        start = time.perf_counter()
+        if python(script, base_dir, socket_path).wait() != 0:
+            raise SystemExit("API call failed")
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1e3
+
+
+def start_daemon(base_dir, socket_path):
+    process = python(DAEMON, base_dir, socket_path, stdout=subprocess.DEVNULL)
+    client = VodkaClient(socket_path)
+    for _ in range(200):
+        if client.call("ping")["response_code"] == 200:
+            return process, client
+        time.sleep(0.05)
+    process.kill()
+    raise SystemExit("daemon did not start")
+
+
+def latency(func, calls, setup=None):
+    times = []
+    for _ in range(calls):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        response = func()
+        times.append(time.perf_counter() - start)
+        assert response["response_code"] == 200, response
+    return statistics.median(times) * 1e3
+
+
+def throughput(func, calls, threads):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        for response in pool.map(lambda _: func(), range(calls)):
+            assert response["response_code"] == 200, response
+    return calls / (time.perf_counter() - start)
+
+
+def check_installs(workdir, base_dir, client):
+    serve_dir = workdir / "serve"
+    serve_dir.mkdir()
+    make_tarball(serve_dir / "bench-wine.tar.gz", "bench-wine", 8)
+    events = []
+    with serve_directory(serve_dir) as base_url:
+        write_catalog(base_dir / "versions.json", [{
+            "name": "bench-wine", "title": "Bench Wine",
+            "uri": f"{base_url}/bench-wine.tar.gz", "files": {"wine": "bin/wine"}}])
+
+        subscription = client.subscribe()
+
+        def listen():
+            for event in subscription:
+                events.append(event)
+                if event["event"] == "version_installed":
+                    return
+        listener = threading.Thread(target=listen, daemon=True)
+        listener.start()
+        time.sleep(0.1)
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            responses = list(pool.map(
+                lambda _: client.call("WineInstallVersion", "bench-wine"), range(2)))
+        codes = sorted(response["response_code"] for response in responses)
+        listener.join(timeout=5)
+    if codes != [200, 409]:
+        raise SystemExit(f"concurrent installs were not serialized: {codes} {responses}")
+    stages = [event["data"].get("stage") or event["event"] for event in events]
+    report("concurrent installs", codes=codes, events=",".join(stages))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=1000)
+    parser.add_argument("--installed", type=int, default=20)
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--processes", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+        base_dir = workdir / "vodka"
+        setup_base_dir(base_dir, args.entries, args.installed)
+
+        def in_process():
+            return wine._get_installed(VodkaManager(base_dir))
+
+        cold = latency(in_process, args.calls // 4, catalog_module._loaded.clear)
+        warm = latency(in_process, args.calls)
+        report("in-process (cold)", entries=args.entries, ms=round(cold, 3))
+        report("in-process (warm)", entries=args.entries, ms=round(warm, 3))
+
+        socket_path = workdir / "daemon.sock"
+        process, client = start_daemon(base_dir, socket_path)
+        try:
+            def via_daemon():
+                return client.call("WineGetInstalled")
+
+            via_daemon()
+            daemon = latency(via_daemon, args.calls)
+            report("daemon", entries=args.entries, ms=round(daemon, 3),
+                   speedup_vs_cold=round(cold / daemon, 1))
+            report("in-process throughput", threads=args.threads,
+                   calls_per_s=round(throughput(in_process, args.calls, args.threads)))
+            report("daemon throughput", threads=args.threads,
+                   calls_per_s=round(throughput(via_daemon, args.calls, args.threads)))
+            in_process_ms = per_process(IN_PROCESS_CALL, base_dir, socket_path, args.processes)
+            client_ms = per_process(CLIENT_CALL, base_dir, socket_path, args.processes)
+            report("new process, in-process call", ms=round(in_process_ms, 1))
+            report("new process, daemon call", ms=round(client_ms, 1),
+                   speedup=round(in_process_ms / client_ms, 1))
+            check_installs(workdir, base_dir, client)
+        finally:
+            process.terminate()
+            process.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""Single urlretrieve vs the ranged, resumable Downloader.
+
+The server throttles every connection (--rate-mbps) the way many mirrors
+do, which is where splitting a download over several connections pays off.
+"""
+import argparse
+import tempfile
+import time
+import urllib.request
+from pathlib import Path
+
+from _common import RangeRequestHandler, make_tarball, report, serve_directory
+
+from vodka.downloader import Downloader
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size-mb", type=int, default=64)
+    parser.add_argument("--rate-mbps", type=float, default=50.0,
+                        help="per-connection limit in MB/s")
+    parser.add_argument("--connections", type=int, nargs="+", default=[1, 4, 8])
+    args = parser.parse_args()
+
+    class Handler(RangeRequestHandler):
+        rate_limit = args.rate_mbps * 2**20
+
+    with tempfile.TemporaryDirectory() as serve_dir:
+        size = make_tarball(Path(serve_dir) / "bench.tar.gz", "bench", args.size_mb)
+        mb = size / 2**20
+        with serve_directory(serve_dir, Handler) as base_url:
+            uri = f"{base_url}/bench.tar.gz"
+
+            with tempfile.TemporaryDirectory() as dest:
+                start = time.perf_counter()
+                urllib.request.urlretrieve(uri, Path(dest) / "bench.tar.gz")
+                elapsed = time.perf_counter() - start
+            report("urlretrieve", mb=round(mb, 1), seconds=round(elapsed, 3),
+                   mb_per_s=round(mb / elapsed, 1))
+
+            for connections in args.connections:
+                with tempfile.TemporaryDirectory() as downloads_dir:
+                    downloader = Downloader(downloads_dir, connections, chunk_size=4 * 2**20)
+                    start = time.perf_counter()
+                    downloader.fetch(uri)
+                    elapsed = time.perf_counter() - start
+                    report(f"Downloader(connections={connections})", mb=round(mb, 1),
+                           seconds=round(elapsed, 3), mb_per_s=round(mb / elapsed, 1))
+
+                    start = time.perf_counter()
+                    downloader.fetch(uri)
+                    report("  cached refetch", seconds=round(time.perf_counter() - start, 4))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Per-command latency of execute(): cold wine vs a persistent wineserver.
+
+Uses stub wine/wineserver scripts: wine sleeps --cold-ms when no server is
+running for the prefix (standing in for wineserver startup and prefix
+boot), and wineserver -p starts a "server" by paying that cost once.
+"""
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from _common import report, write_catalog
+
+from vodka.manager import VodkaManager
+
+STUB_WINE = """#!/bin/sh
+if [ ! -e "$WINEPREFIX/.stub-wineserver" ]; then
+    sleep "$STUB_COLD_SECONDS"
+fi
+exit 0
+"""
+
+STUB_WINESERVER = """#!/bin/sh
+case "$1" in
+    -k) rm -f "$WINEPREFIX/.stub-wineserver" ;;
+    -p*) [ -e "$WINEPREFIX/.stub-wineserver" ] && exit 1
+         sleep "$STUB_COLD_SECONDS"; touch "$WINEPREFIX/.stub-wineserver" ;;
+esac
+"""
+
+
+def make_version(manager):
+    """Install a stub version and make it the default."""
+    base_dir = manager.base_dir
+    bin_dir = base_dir / "stub-wine" / "bin"
+    bin_dir.mkdir(parents=True)
+    for name, script in (("wine", STUB_WINE), ("wineserver", STUB_WINESERVER)):
+        (bin_dir / name).write_text(script)
+        os.chmod(bin_dir / name, 0o755)
+    version = {"name": "stub-wine", "uri": "https://example.invalid/stub-wine.tar.gz",
+               "files": {"wine": "bin/wine", "wineserver": "bin/wineserver"}}
+    write_catalog(base_dir / "versions.json", [version])
+    manager.manifests.write(version, base_dir / "stub-wine")
+    manager.set_default("stub-wine")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--commands", type=int, default=20)
+    parser.add_argument("--cold-ms", type=int, default=200)
+    args = parser.parse_args()
+    os.environ["STUB_COLD_SECONDS"] = str(args.cold_ms / 1000)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        base_dir = Path(tmp) / "vodka"
+        manager = VodkaManager(base_dir)
+        make_version(manager)
+        prefix = Path(tmp) / "prefix"
+        prefix.mkdir()
+        commands = [["cmd", "/c", f"echo {i}"] for i in range(args.commands)]
+
+        start = time.perf_counter()
+        for command in commands:
+            manager.execute(command, prefix, persistent=False)
+        cold = (time.perf_counter() - start) / len(commands)
+
+        start = time.perf_counter()
+        manager.execute_batch(commands, prefix)
+        warm = (time.perf_counter() - start) / len(commands)
+        manager.wineserver_pool().shutdown_all()
+
+        report("cold execute", commands=len(commands), ms_per_command=round(cold * 1e3, 1))
+        report("warm execute_batch", commands=len(commands),
+               ms_per_command=round(warm * 1e3, 1), speedup=round(cold / warm, 1))
+
+
+if __name__ == "__main__":
+    main()
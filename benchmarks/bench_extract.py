@@ -0,0 +1,147 @@
+"""Extraction throughput: tarfile.extractall vs the threaded extractor.
+
+Archives hold many small files, like a Wine build. The xz archive is
+written by "xz -T0" in independent blocks so that it can be decompressed
+on several cores; without the xz tool the script falls back to Python's
+lzma and the external decompressor can't be measured.
+"""
+import argparse
+import gzip
+import io
+import os
+import shutil
+import subprocess
+import tarfile
+import tempfile
+import time
+from pathlib import Path
+
+from _common import make_tarball, report
+
+from vodka.extractor import UnsafeArchiveError, extract_archive
+
+
+def legacy_extract(archive_path, dest_dir):
+    with tarfile.open(archive_path) as tar:
+        tar.extractall(dest_dir, filter="data")
+
+
+def build_archives(workdir, size_mb, files):
+    """Return {compression: path} for gz and xz archives of the same content."""
+    tar_path = workdir / "bench.tar"
+    make_tarball(tar_path, "bench-wine", size_mb, files=files, compression="")
+    archives = {"gz": workdir / "bench.tar.gz"}
+    with open(tar_path, "rb") as src, open(archives["gz"], "wb") as raw:
+        with gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=6, mtime=0) as dst:
+            shutil.copyfileobj(src, dst)
+    archives["xz"] = workdir / "bench.tar.xz"
+    if shutil.which("xz"):
+        with open(archives["xz"], "wb") as dst:
+            subprocess.run(["xz", "-T0", "-3", "-c", str(tar_path)], stdout=dst, check=True)
+    else:
+        make_tarball(archives["xz"], "bench-wine", size_mb, files=files, compression="xz")
+    tar_path.unlink()
+    return archives
+
+
+def best_of(func, archive_path, workdir, repeat):
+    best = None
+    for _ in range(repeat):
+        dest = workdir / "out"
+        shutil.rmtree(dest, ignore_errors=True)
+        dest.mkdir()
+        start = time.perf_counter()
+        func(archive_path, dest)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    shutil.rmtree(workdir / "out", ignore_errors=True)
+    return best
+
+
+def _member(name, type=tarfile.REGTYPE, linkname="", data=b""):
+    info = tarfile.TarInfo(name)
+    info.type = type
+    info.linkname = linkname
+    info.size = len(data)
+    return info, io.BytesIO(data)
+
+
+def check_traversal(workdir):
+    """Make sure members escaping the destination are refused.
+
+    Besides plain "../" paths, this covers links that only escape once the
+    symlinks extracted before or after them are followed, although their
+    targets look inside the destination as text.
+    """
+    secret = workdir / "secret.txt"
+    secret.write_bytes(b"secret")
+    cases = {
+        "dot-dot path": [_member("../escaped.txt", data=b"evil")],
+        # up -> a/b/.. is inside, but esc goes through it to dest/..
+        "symlink chain": [
+            _member("a/b", tarfile.DIRTYPE),
+            _member("a/b/up", tarfile.SYMTYPE, ".."),
+            _member("a/b/esc", tarfile.SYMTYPE, "up/../.."),
+            _member("stolen", tarfile.LNKTYPE, "a/b/esc/secret.txt"),
+        ],
+        # d doesn't exist yet when p/q/s is checked
+        "symlink redirected later": [
+            _member("p/q", tarfile.DIRTYPE),
+            _member("p/q/s", tarfile.SYMTYPE, "d/../../secret.txt"),
+            _member("p/q/d", tarfile.SYMTYPE, "../.."),
+        ],
+        "hardlink through symlinks": [
+            _member("p/q", tarfile.DIRTYPE),
+            _member("p/q/s", tarfile.SYMTYPE, "d/../../secret.txt"),
+            _member("p/q/d", tarfile.SYMTYPE, "../.."),
+            _member("stolen", tarfile.LNKTYPE, "p/q/s"),
+        ],
+    }
+    for i, (case, members) in enumerate(cases.items()):
+        archive_path = workdir / f"evil-{i}.tar"
+        with tarfile.open(archive_path, "w") as tar:
+            for info, data in members:
+                tar.addfile(info, data)
+        dest = workdir / f"evil-{i}"
+        dest.mkdir()
+        try:
+            extract_archive(archive_path, dest)
+        except UnsafeArchiveError:
+            pass
+        else:
+            raise SystemExit(f"path traversal was not refused: {case}")
+        if (workdir / "escaped.txt").exists():
+            raise SystemExit(f"path traversal wrote outside the destination: {case}")
+        root = os.path.realpath(dest)
+        for path in dest.rglob("*"):
+            real = os.path.realpath(path)
+            if path.exists() and (path.samefile(secret) or
+                                  not (real == root or real.startswith(root + os.sep))):
+                raise SystemExit(f"{case}: {path} leads outside the destination")
+    report("traversal refused", cases=len(cases))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=int, default=64)
+    parser.add_argument("--files", type=int, default=4000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+        check_traversal(workdir)
+        for compression, archive_path in build_archives(workdir, args.size_mb,
+                                                        args.files).items():
+            size = archive_path.stat().st_size
+            for name, func in (("tarfile.extractall", legacy_extract),
+                               ("extract_archive", extract_archive)):
+                seconds = best_of(func, archive_path, workdir, args.repeat)
+                report(name, compression=compression, files=args.files,
+                       archive_mb=round(size / 2**20, 1), seconds=round(seconds, 3),
+                       mb_per_s=round(args.size_mb / seconds, 1))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""Prefix deletion and garbage collection.
+
+Deletes prefix-shaped trees (many small files under drive_c) with
+shutil.rmtree and with the parallel remove_tree, then fills a Vodka
+directory with versions, components and cached downloads of known ages
+and checks that gc() evicts the least recently used ones, never the
+default version, and that a dry run removes nothing. Also checks that a
+component symlinked into a prefix is kept even when the
+component_deploy setting is "copy".
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+from _common import COMPONENT_DLLS, make_prefix, report, synthetic_components, write_catalog
+
+from vodka.collector import remove_tree
+from vodka.manager import VodkaManager
+
+
+def make_tree(root, files, file_kb):
+    """Write a tree shaped like a Wine prefix."""
+    data = os.urandom(file_kb * 1024)
+    per_dir = 200
+    for i in range(files):
+        directory = root / "drive_c" / ("windows" if i % 2 else "Program Files") / f"d{i // per_dir}"
+        if i % per_dir == 0 or not directory.exists():
+            directory.mkdir(parents=True, exist_ok=True)
+        with open(directory / f"f{i}.dll", "wb") as f:
+            f.write(data)
+    (root / "system.reg").write_text("WINE REGISTRY Version 2\n")
+
+
+def bench_delete(workdir, files, file_kb, repeat):
+    for name, func in (("shutil.rmtree", shutil.rmtree), ("remove_tree", remove_tree)):
+        best = None
+        for _ in range(repeat):
+            tree = workdir / "prefix"
+            make_tree(tree, files, file_kb)
+            os.sync()
+            start = time.perf_counter()
+            func(tree)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        report(name, files=files, seconds=round(best, 3))
+
+
+def check_gc(workdir):
+    base_dir = workdir / "vodka"
+    manager = VodkaManager(base_dir)
+    now = time.time()
+    names = [f"wine-{i}" for i in range(5)]
+    versions = [{"name": name, "uri": f"https://example.invalid/{name}.tar.gz",
+                 "files": {"wine": "bin/wine"}} for name in names]
+    base_dir.mkdir()
+    write_catalog(base_dir / "versions.json", versions)
+    for age_days, version in zip((1, 9, 5, 7, 3), versions):
+        install_dir = base_dir / version["name"] / "bin"
+        install_dir.mkdir(parents=True)
+        (install_dir / "wine").write_bytes(b"\0" * 2**20)
+        manager.manifests.write(version, install_dir.parent)
+        manager.usage.touch("versions", version["name"])
+        used = now - age_days * 86400
+        os.utime(manager.usage_dir / "versions" / version["name"], (used, used))
+    # The oldest version is the default and must survive
+    manager.set_default("wine-1")
+
+    component = manager.components_dir / "dxvk-old"
+    component.mkdir(parents=True)
+    (component / "d3d11.dll").write_bytes(b"\0" * 2**20)
+    old = now - 30 * 86400
+    os.utime(component, (old, old))
+
+    plan = manager.gc("3M", dry_run=True)
+    planned = [item["name"] for item in plan["evicted"]]
+    if planned != ["dxvk-old", "wine-3", "wine-2"] or not component.exists():
+        raise SystemExit(f"unexpected dry run: {planned}")
+    result = manager.gc("3M")
+    remaining = sorted(manager.manifests.names())
+    if remaining != ["wine-0", "wine-1", "wine-4"] or (base_dir / "wine-3").exists():
+        raise SystemExit(f"unexpected eviction, left {remaining}")
+    report("gc", evicted=len(result["evicted"]),
+           freed_mb=round((result["used_before"] - result["used_after"]) / 2**20, 1))
+
+
+def check_gc_symlinked(workdir):
+    base_dir = workdir / "vodka-symlinked"
+    manager = VodkaManager(base_dir)
+    catalog = synthetic_components(2)
+    names = [entry["name"] for entry in catalog["versions"]["dxvk"] + catalog["versions"]["vkd3d-proton"]]
+    base_dir.mkdir()
+    with open(base_dir / "components.json", "w") as f:
+        json.dump(catalog, f)
+    old = time.time() - 30 * 86400
+    for name in names:
+        for arch in ("x32", "x64"):
+            arch_dir = manager.components_dir / name / arch
+            arch_dir.mkdir(parents=True)
+            for dll in COMPONENT_DLLS:
+                (arch_dir / dll).write_bytes(b"\0" * 2**16)
+        os.utime(manager.components_dir / name, (old, old))
+    if manager.config.get("component_deploy", "copy") != "copy":
+        raise SystemExit("component_deploy should default to copy")
+
+    # Only the first component is symlinked, and only by this call
+    prefix = make_prefix(workdir / "prefix-symlinked", 1)
+    results = manager.install_component_many(names[0], [prefix], deploy_mode="symlink")
+    if not results[0]["success"]:
+        raise SystemExit(f"symlink install failed: {results[0]['error']}")
+
+    planned = sorted(item["name"] for item in manager.gc(0, dry_run=True)["evicted"])
+    if planned != sorted(names[1:]):
+        raise SystemExit(f"gc would evict {planned}, expected {names[1:]}")
+    report("gc, symlinked component", protected=names[0], evicted=len(planned))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=20000)
+    parser.add_argument("--file-kb", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+        check_gc(workdir)
+        check_gc_symlinked(workdir)
+        bench_delete(workdir, args.files, args.file_kb, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
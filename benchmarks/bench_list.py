@@ -0,0 +1,96 @@
+"""`vodka list`: the old build-sort-paginate listing vs the streaming one.
+
+For catalogs of growing size, times one page of the listing and measures
+the memory allocated while computing it (tracemalloc peak, with the
+catalog and its search index already loaded), then streams every version
+as NDJSON to /dev/null. The streaming numbers should stay flat as the
+catalog grows.
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from _common import report, synthetic_versions, write_catalog
+
+from vodka.listing import iter_rows, version_page
+from vodka.manager import VodkaManager
+
+
+def old_page(catalog, status, page, page_size=10):
+    """What print_version_list used to do before printing one page."""
+    all_versions = []
+    for category, versions in catalog.iter_categories():
+        for version in versions:
+            all_versions.append({
+                'category': category['name'],
+                'name': version['name'],
+                'title': version['title'],
+                'installed': status.is_installed(version['name']),
+                'default': status.is_default(version['name'])
+            })
+    all_versions.sort(key=lambda x: (x['category'], x['name']))
+    pages = [all_versions[i:i + page_size] for i in range(0, len(all_versions), page_size)]
+    return pages[page - 1]
+
+
+def measure(func):
+    """Return (milliseconds, peak KiB allocated) of one call."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    # A second, untraced run for the time, as tracing slows allocation down
+    start = time.perf_counter()
+    func()
+    elapsed = min(elapsed, time.perf_counter() - start)
+    return round(elapsed * 1e3, 1), peak // 1024
+
+
+def stream_all(catalog, status):
+    with open(os.devnull, "w") as out:
+        for row in iter_rows(catalog, status):
+            out.write(json.dumps(row))
+            out.write("\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,100000")
+    parser.add_argument("--installed", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in map(int, args.sizes.split(",")):
+            base_dir = Path(tmp) / str(size)
+            base_dir.mkdir()
+            data = synthetic_versions(size)
+            versions = [version for entries in data["versions"].values() for version in entries]
+            write_catalog(base_dir / "versions.json", versions)
+            manager = VodkaManager(base_dir)
+            for version in versions[::max(1, size // args.installed)]:
+                manager.manifests.write(version, base_dir / version["name"])
+            catalog = manager.versions_catalog()
+            catalog.search_index()
+            status = manager.get_status()
+
+            cases = {
+                "old listing, page 1": lambda: old_page(catalog, status, 1),
+                "page 1": lambda: version_page(catalog, status),
+                "page 50, filtered": lambda: version_page(catalog, status, "proton", page=50),
+                "--installed": lambda: version_page(catalog, status, installed_only=True),
+                "NDJSON, all versions": lambda: stream_all(catalog, status),
+            }
+            for label, func in cases.items():
+                ms, peak_kib = measure(func)
+                report(label, entries=size, ms=ms, peak_kib=peak_kib)
+
+
+if __name__ == "__main__":
+    main()
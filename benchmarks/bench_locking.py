@@ -0,0 +1,155 @@
+"""Installs from several processes at once.
+
+Starts several processes installing the same version against one base
+directory, from the download cache and streamed, and checks that the
+archive is downloaded once, exactly one process installs it, the others
+wait and report it installed, and the tree verifies. Then kills an install
+halfway and checks that nothing appears under the version's name until
+the next install finishes it, and installs different versions from
+parallel processes to check that none of them is lost from the download
+index and that one of them becomes the default.
+"""
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from _common import ROOT_DIR, RangeRequestHandler, make_tarball, report, serve_directory, write_catalog
+
+from vodka.manager import VodkaManager
+
+INSTALL = """
+import contextlib, io, sys
+from vodka.manager import VodkaManager
+with contextlib.redirect_stdout(io.StringIO()):
+    installed = VodkaManager(sys.argv[1]).install_version(sys.argv[2], stream=sys.argv[3] == "1")
+print(installed)
+"""
+
+
+class CountingHandler(RangeRequestHandler):
+    """Throttled handler that counts the archive bytes it sends."""
+    rate_limit = 64 * 2**20
+    sent = 0
+    lock = threading.Lock()
+
+    def copyfile(self, source, outputfile):
+        start = source.tell()
+        try:
+            super().copyfile(source, outputfile)
+        finally:
+            with CountingHandler.lock:
+                CountingHandler.sent += source.tell() - start
+
+
+def install(base_dir, name, stream=False, **kwargs):
+    env = dict(os.environ, PYTHONPATH=str(ROOT_DIR / "lib"))
+    return subprocess.Popen([sys.executable, "-c", INSTALL, str(base_dir), name,
+                             "1" if stream else "0"], env=env, stdout=subprocess.PIPE,
+                            text=True, **kwargs)
+
+
+def leftovers(base_dir):
+    staging = base_dir / ".staging"
+    return sorted(p.name for p in staging.iterdir()) if staging.exists() else []
+
+
+def bench_same_version(workdir, base_url, archive, processes):
+    for stream in (False, True):
+        base_dir = workdir / f"same-{int(stream)}"
+        base_dir.mkdir()
+        write_catalog(base_dir / "versions.json", [{
+            "name": "bench-wine", "uri": f"{base_url}/{archive.name}",
+            "files": {"wine": "bin/wine"}}])
+        CountingHandler.sent = 0
+        start = time.perf_counter()
+        children = [install(base_dir, "bench-wine", stream) for _ in range(processes)]
+        results = [child.communicate()[0].strip() for child in children]
+        elapsed = time.perf_counter() - start
+        if any(child.returncode for child in children):
+            raise SystemExit(f"an install failed (stream={stream})")
+        if sorted(results) != ["False"] * (processes - 1) + ["True"]:
+            raise SystemExit(f"expected exactly one install, got {results}")
+        report_ = VodkaManager(base_dir).verify("bench-wine")["bench-wine"]
+        if not report_["ok"] or leftovers(base_dir):
+            raise SystemExit(f"bad tree after concurrent installs (stream={stream})")
+        report(f"{processes} processes, same version" + (", streamed" if stream else ""),
+               downloads=round(CountingHandler.sent / archive.stat().st_size, 2),
+               installed=results.count("True"), seconds=round(elapsed, 2))
+
+
+def check_killed_install(workdir, base_url, archive):
+    base_dir = workdir / "killed"
+    base_dir.mkdir()
+    write_catalog(base_dir / "versions.json", [{
+        "name": "bench-wine", "uri": f"{base_url}/{archive.name}",
+        "files": {"wine": "bin/wine"}}])
+    CountingHandler.sent = 0
+    child = install(base_dir, "bench-wine", stream=True)
+    # Kill it once about half the archive is extracted
+    while CountingHandler.sent < archive.stat().st_size // 2:
+        time.sleep(0.01)
+    child.send_signal(signal.SIGKILL)
+    child.wait()
+    if (base_dir / "bench-wine").exists():
+        raise SystemExit("a killed install left a partial tree in place")
+    half = leftovers(base_dir)
+
+    output = install(base_dir, "bench-wine", stream=True).communicate()[0].strip()
+    result = VodkaManager(base_dir).verify("bench-wine")["bench-wine"]
+    if output != "True" or not result["ok"] or leftovers(base_dir):
+        raise SystemExit("install after a killed one failed or left files behind")
+    report("killed install", staged=len(half), partial_tree_visible=False, reinstalled=True)
+
+
+def check_index(workdir, base_url, serve_dir, count):
+    base_dir = workdir / "index"
+    base_dir.mkdir()
+    entries = []
+    for i in range(count):
+        make_tarball(serve_dir / f"wine-{i}.tar.gz", f"wine-{i}", 1, files=8, seed=i)
+        entries.append({"name": f"wine-{i}", "uri": f"{base_url}/wine-{i}.tar.gz",
+                        "files": {"wine": "bin/wine"}})
+    write_catalog(base_dir / "versions.json", entries)
+    children = [install(base_dir, entry["name"]) for entry in entries]
+    if any(child.communicate()[0].strip() != "True" for child in children):
+        raise SystemExit("parallel installs of different versions failed")
+    with open(base_dir / "downloads" / "index.json") as f:
+        indexed = len(json.load(f))
+    if indexed != count:
+        raise SystemExit(f"download index lost entries: {indexed} of {count}")
+    # Every process found no default; exactly one of them must have set it
+    default = os.readlink(base_dir / "default")
+    if Path(default).name not in {entry["name"] for entry in entries}:
+        raise SystemExit(f"default link points at {default}")
+    report(f"{count} processes, different versions", indexed=indexed,
+           default=Path(default).name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=int, default=64)
+    parser.add_argument("--processes", type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+        serve_dir = workdir / "serve"
+        serve_dir.mkdir()
+        archive = serve_dir / "bench-wine.tar.gz"
+        make_tarball(archive, "bench-wine", args.size_mb, files=256)
+        with serve_directory(serve_dir, CountingHandler) as base_url:
+            bench_same_version(workdir, base_url, archive, args.processes)
+            check_killed_install(workdir, base_url, archive)
+            check_index(workdir, base_url, serve_dir, args.processes * 2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Prefix creation: booting every prefix vs cloning a template prefix.
+
+A stub wine stands in for wineboot: it sleeps --boot-ms (a real wineboot
+takes several seconds) and writes a prefix of --files files with registry
+files and dosdevices symlinks. The template is booted once, then --prefixes
+prefixes are cloned from it in every clone mode.
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from _common import report, write_catalog
+
+from vodka.manager import VodkaManager
+
+STUB_WINE = """#!{python}
+import os, sys, time
+if sys.argv[1:] != ["wineboot", "--init"]:
+    sys.exit(0)
+time.sleep(float(os.environ["STUB_BOOT_SECONDS"]))
+prefix = os.environ["WINEPREFIX"]
+files = int(os.environ["STUB_FILES"])
+data = os.urandom(int(os.environ["STUB_FILE_KB"]) * 1024)
+for subdir in ("system32", "syswow64"):
+    path = os.path.join(prefix, "drive_c", "windows", subdir)
+    os.makedirs(path)
+    for i in range(files // 2):
+        with open(os.path.join(path, f"lib{{i:05d}}.dll"), "wb") as f:
+            f.write(data)
+os.makedirs(os.path.join(prefix, "dosdevices"))
+os.symlink("../drive_c", os.path.join(prefix, "dosdevices", "c:"))
+os.symlink("/", os.path.join(prefix, "dosdevices", "z:"))
+for name in ("system.reg", "user.reg", "userdef.reg"):
+    with open(os.path.join(prefix, name), "w") as f:
+        f.write("WINE REGISTRY Version 2\\n" + "[Software\\\\\\\\Stub] 0\\n" * 20000)
+"""
+
+
+def make_version(manager):
+    """Install the stub version and make it the default."""
+    base_dir = manager.base_dir
+    bin_dir = base_dir / "stub-wine" / "bin"
+    bin_dir.mkdir(parents=True)
+    (bin_dir / "wine").write_text(STUB_WINE.format(python=sys.executable))
+    (bin_dir / "wineserver").write_text("#!/bin/sh\nexit 0\n")
+    for name in ("wine", "wineserver"):
+        os.chmod(bin_dir / name, 0o755)
+    version = {"name": "stub-wine", "uri": "https://example.invalid/stub-wine.tar.gz",
+               "files": {"wine": "bin/wine", "wineserver": "bin/wineserver"}}
+    write_catalog(base_dir / "versions.json", [version])
+    manager.manifests.write(version, base_dir / "stub-wine")
+    manager.set_default("stub-wine")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--prefixes", type=int, default=20)
+    parser.add_argument("--files", type=int, default=2000)
+    parser.add_argument("--file-kb", type=int, default=64)
+    parser.add_argument("--boot-ms", type=int, default=5000)
+    args = parser.parse_args()
+    os.environ.update(STUB_BOOT_SECONDS=str(args.boot_ms / 1000), STUB_FILES=str(args.files),
+                      STUB_FILE_KB=str(args.file_kb))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        manager = VodkaManager(Path(tmp) / "vodka")
+        make_version(manager)
+        boot = manager.build_prefix_template()["seconds"]
+        report("wineboot", prefixes=1, seconds=round(boot, 2),
+               seconds_for_all=round(boot * args.prefixes, 1))
+
+        for mode in ("copy", "hardlink", "auto"):
+            manager.config.set("prefix_clone_mode", mode)
+            prefixes_dir = Path(tmp) / f"prefixes-{mode}"
+            start = time.perf_counter()
+            for i in range(args.prefixes):
+                result = manager.create_prefix(prefixes_dir / f"prefix{i}")
+            seconds = time.perf_counter() - start
+            report(f"clone ({mode})", prefixes=args.prefixes, seconds=round(seconds, 2),
+                   ms_each=round(seconds / args.prefixes * 1e3, 1),
+                   shared=result["reflink"] + result["hardlink"], copied=result["copy"],
+                   speedup=round(boot * args.prefixes / seconds, 1))
+            shutil.rmtree(prefixes_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Registry edits on a multi-MB system.reg: line-list rewrite vs RegistryFile."""
+import argparse
+import shutil
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from _common import report, write_registry
+
+from vodka.component_installer import ENVIRONMENT_KEY
+from vodka.registry import RegistryFile
+
+ENVIRONMENT = {"DXVK_HUD": "1", "DXVK_LOG_LEVEL": "none"}
+
+
+def legacy_set_environment(path, environment):
+    """The readlines/insert/writelines approach _set_environment_vars used."""
+    with open(path, 'r', encoding='utf-8') as f:
+        registry_content = f.readlines()
+    env_section = "[System\\\\CurrentControlSet\\\\Control\\\\Session Manager\\\\Environment]"
+    section_index = -1
+    for i, line in enumerate(registry_content):
+        if env_section in line:
+            section_index = i
+            break
+    for name, value in environment.items():
+        registry_content.insert(section_index + 2, f'"{name}"="{value}"\n')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.writelines(registry_content)
+
+
+def registry_set_environment(path, environment):
+    registry = RegistryFile(path)
+    for name, value in environment.items():
+        registry.set_value(ENVIRONMENT_KEY, name, value)
+    registry.save()
+
+
+def measure(func, source, repeat):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "system.reg"
+        best = None
+        for _ in range(repeat):
+            shutil.copy(source, path)
+            start = time.perf_counter()
+            func(path, ENVIRONMENT)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        shutil.copy(source, path)
+        tracemalloc.start()
+        func(path, ENVIRONMENT)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return best, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sections", type=int, default=60000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = Path(tmp) / "system.reg"
+        size = write_registry(source, args.sections)
+        for name, func in (("legacy line list", legacy_set_environment),
+                           ("RegistryFile", registry_set_environment)):
+            seconds, peak = measure(func, source, args.repeat)
+            report(name, reg_mb=round(size / 2**20, 1), ms=round(seconds * 1e3, 1),
+                   peak_mb=round(peak / 2**20, 1))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Catalog search: the old linear substring filter vs the trigram index.
+
+Builds the index for a synthetic catalog, loads it back from its cache as a
+new process would, then times queries of different selectivity, a typo
+that only the fuzzy fallback finds, and checks natural version ordering.
+"""
+import argparse
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from _common import report, synthetic_versions, write_catalog
+
+from vodka import catalog as catalog_module
+from vodka.catalog import Catalog
+
+QUERIES = {
+    "selective": "ge-proton-512.3",
+    "two terms": "lutris 51",
+    "short": "9",
+    "broad": "proton",
+    "typo": "lutirs-512.7",
+}
+
+
+def linear_filter(entries, query):
+    """The filter `vodka list --filter` used to apply."""
+    query = query.lower()
+    return [entry for entry in entries
+            if query in entry['title'].lower() or query in entry['name'].lower()]
+
+
+def median_ms(func, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1e3
+
+
+def check_order(workdir):
+    path = workdir / "order.json"
+    names = ["GE-Proton9-20", "GE-Proton10-1", "GE-Proton9-9", "GE-Proton9-10"]
+    write_catalog(path, [{"name": name, "title": name} for name in names])
+    found = [entry["name"] for entry in Catalog.load(path).search("ge-proton9")]
+    if found != ["GE-Proton9-9", "GE-Proton9-10", "GE-Proton9-20"]:
+        raise SystemExit(f"unexpected order: {found}")
+    report("natural order", ok=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+        check_order(workdir)
+
+        path = workdir / "versions.json"
+        data = synthetic_versions(args.entries)
+        write_catalog(path, [version for versions in data["versions"].values()
+                             for version in versions])
+        catalog = Catalog.load(path)
+        start = time.perf_counter()
+        catalog.search_index()
+        report("build index", entries=args.entries,
+               ms=round((time.perf_counter() - start) * 1e3, 1))
+
+        catalog_module._loaded.clear()
+        catalog = Catalog.load(path)
+        start = time.perf_counter()
+        index = catalog.search_index()
+        report("load index (cache)", ms=round((time.perf_counter() - start) * 1e3, 1))
+
+        entries = catalog.entries()
+        for label, query in QUERIES.items():
+            linear = median_ms(lambda: linear_filter(entries, query), args.repeat)
+            indexed = median_ms(lambda: index.search(query), args.repeat)
+            report(label, query=query, matches=len(index.search(query)),
+                   linear_matches=len(linear_filter(entries, query)),
+                   linear_ms=round(linear, 2), index_ms=round(indexed, 2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Cold-start time of the vodka CLI and library against a time budget.
+
+Each scenario runs in a fresh interpreter; the time of a bare
+"python -c pass" is subtracted so only vodka's own cost is reported.
+Exits with status 1 if a scenario exceeds --budget-ms, and with
+--importtime prints the slowest imports (python -X importtime) of each.
+"""
+import argparse
+import compileall
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from _common import ROOT_DIR, report, synthetic_versions
+
+
+SCENARIOS = {
+    "import vodka": "import vodka",
+    "import vodka_cli.cli": "import vodka_cli.cli",
+    "vodka (usage)": "import sys; sys.argv = ['vodka']; from vodka_cli.cli import main; main()",
+    "VodkaManager().get_versions()":
+        "import sys; from vodka import VodkaManager; VodkaManager(sys.argv[1]).get_versions()",
+}
+
+
+def run(code, env, args=()):
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", code, *args], env=env, check=True,
+                   stdout=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def imports(code, env, args=()):
+    """Return (cumulative ms, module) for each top-level import of code."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code, *args],
+                            env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                            text=True, check=True)
+    found = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Only top-level imports: nested ones are included in their parent
+        if not name.startswith("  "):
+            found.append((int(cumulative) / 1000, name.strip()))
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--budget-ms", type=float, default=50)
+    parser.add_argument("--repeat", type=int, default=15)
+    parser.add_argument("--importtime", action="store_true")
+    args = parser.parse_args()
+
+    source_dirs = [str(ROOT_DIR / "lib"), str(ROOT_DIR / "cli")]
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(source_dirs))
+    # An installed package ships compiled .pyc files; don't time compiling
+    for source_dir in source_dirs:
+        compileall.compile_dir(source_dir, quiet=1)
+    over_budget = False
+    with tempfile.TemporaryDirectory() as tmp:
+        # A base dir with a catalog, so listing versions needs no network
+        base_dir = Path(tmp) / "vodka"
+        base_dir.mkdir()
+        with open(base_dir / "versions.json", "w") as f:
+            json.dump(synthetic_versions(500), f)
+        scenario_args = (str(base_dir),)
+
+        baseline = statistics.median(run("pass", env) for _ in range(args.repeat))
+        # Modules the interpreter loads at startup anyway (site, encodings, ...)
+        startup_modules = {module for _, module in imports("pass", env)}
+        for name, code in SCENARIOS.items():
+            # Warm the page cache first
+            run(code, env, scenario_args)
+            seconds = statistics.median(
+                run(code, env, scenario_args) for _ in range(args.repeat)) - baseline
+            ms = seconds * 1e3
+            over_budget |= ms > args.budget_ms
+            report(name, ms=round(ms, 1), budget_ms=args.budget_ms,
+                   ok=ms <= args.budget_ms)
+            if args.importtime:
+                slowest = sorted((cumulative, module) for cumulative, module
+                                 in imports(code, env, scenario_args)
+                                 if module not in startup_modules)
+                for cumulative, module in reversed(slowest[-8:]):
+                    print(f"    {cumulative:8.1f} ms  {module}")
+
+        # Listing must not have created any directories in base_dir
+        created = sorted(p.name for p in base_dir.iterdir() if p.is_dir())
+        if created:
+            print(f"Read-only commands created directories: {', '.join(created)}")
+            over_budget = True
+
+    return 1 if over_budget else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
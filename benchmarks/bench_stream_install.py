@@ -0,0 +1,52 @@
+"""End-to-end install throughput: download-then-extract vs streaming."""
+import argparse
+import contextlib
+import io
+import tempfile
+import time
+from pathlib import Path
+
+from _common import make_tarball, report, serve_directory, write_catalog
+
+from vodka import VodkaManager
+
+
+def run_install(base_url, archive_name, version_name, stream):
+    with tempfile.TemporaryDirectory() as base_dir:
+        write_catalog(Path(base_dir) / "versions.json", [{
+            "name": version_name,
+            "title": version_name,
+            "uri": f"{base_url}/{archive_name}",
+            "files": {"wine": "bin/wine"},
+        }])
+        manager = VodkaManager(base_dir)
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            manager.install_version(version_name, stream=stream)
+        return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size-mb", type=int, default=64)
+    parser.add_argument("--compression", choices=["gz", "xz"], default="gz")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    version_name = "bench-wine"
+    with tempfile.TemporaryDirectory() as serve_dir:
+        archive_name = f"{version_name}.tar.{args.compression}"
+        size = make_tarball(Path(serve_dir) / archive_name, version_name,
+                            args.size_mb, compression=args.compression)
+        with serve_directory(serve_dir) as base_url:
+            for stream in (False, True):
+                best = min(run_install(base_url, archive_name, version_name, stream)
+                           for _ in range(args.repeat))
+                report("install_version(stream=%s)" % stream,
+                       archive_mb=round(size / 2**20, 1),
+                       seconds=round(best, 3),
+                       mb_per_s=round(size / 2**20 / best, 1))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""Download checksums and `vodka verify`.
+
+Times a download hashed while it arrives against download-then-hash, over
+one connection and in chunks, and checks that a wrong sha256 in the
+catalog fails a cached and a streamed install without leaving files
+behind, and that a malformed sha256 is refused. Then installs a version
+with many files and times verify on an unchanged tree, a tree with a few
+touched files and a full re-hash; a corrupted file must be reported.
+"""
+import argparse
+import contextlib
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+from _common import RangeRequestHandler, make_tarball, report, serve_directory, write_catalog
+
+from vodka.downloader import Downloader
+from vodka.integrity import ChecksumError, file_sha256
+from vodka.manager import VodkaManager
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def bench_download(workdir, base_url, archive, sha256, repeat):
+    uri = f"{base_url}/{archive.name}"
+    for label, chunk_size in (("single", 2**40), ("chunked", 4 * 2**20)):
+        inline = []
+        second_pass = []
+        for _ in range(repeat):
+            downloads = workdir / "downloads"
+            downloader = Downloader(downloads, connections=4, chunk_size=chunk_size)
+            path, elapsed = timed(lambda: downloader.fetch(uri, sha256, archive.stat().st_size))
+            inline.append(elapsed)
+            # What fetch used to do after downloading: hash the file again
+            _, rehash = timed(lambda: file_sha256(path))
+            second_pass.append(elapsed + rehash)
+            shutil.rmtree(downloads)
+        report(f"download ({label})", mb=round(archive.stat().st_size / 2**20, 1),
+               inline_s=round(min(inline), 3), download_then_hash_s=round(min(second_pass), 3))
+
+
+def check_mismatch(workdir, base_url, archive):
+    base_dir = workdir / "mismatch"
+    base_dir.mkdir()
+    write_catalog(base_dir / "versions.json", [{
+        "name": "bench-wine", "uri": f"{base_url}/{archive.name}", "sha256": "0" * 64,
+        "files": {"wine": "bin/wine"}}])
+    manager = VodkaManager(base_dir)
+    for stream in (False, True):
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                manager.install_version("bench-wine", stream=stream)
+        except Exception as e:
+            if "Checksum mismatch" not in str(e):
+                raise
+        else:
+            raise SystemExit(f"install with a wrong sha256 succeeded (stream={stream})")
+        leftovers = [p.name for p in (base_dir / "downloads" / "objects").glob("*")]
+        if (base_dir / "bench-wine").exists() or leftovers or manager.is_installed("bench-wine"):
+            raise SystemExit(f"wrong sha256 left files behind (stream={stream})")
+    report("wrong sha256 rejected", cached=True, streamed=True)
+
+
+def bench_verify(workdir, base_url, archive, sha256, touched):
+    base_dir = workdir / "verify"
+    base_dir.mkdir()
+    write_catalog(base_dir / "versions.json", [{
+        "name": "bench-wine", "uri": f"{base_url}/{archive.name}", "sha256": sha256,
+        "size": archive.stat().st_size, "files": {"wine": "bin/wine"}}])
+    manager = VodkaManager(base_dir)
+    with contextlib.redirect_stdout(io.StringIO()):
+        manager.install_version("bench-wine")
+    install_dir = base_dir / "bench-wine"
+    files = sorted(install_dir.rglob("*.dll"))
+
+    def verify(full=False):
+        result, elapsed = timed(lambda: manager.verify("bench-wine", full)["bench-wine"])
+        if not result["ok"]:
+            raise SystemExit(f"unexpected verify failure: {result}")
+        return result, elapsed
+
+    for label, setup, full in (
+            ("verify, unchanged", None, False),
+            (f"verify, {touched} touched", lambda: [os.utime(f) for f in files[:touched]], False),
+            ("verify --full", None, True)):
+        if setup:
+            setup()
+        result, elapsed = verify(full)
+        report(label, files=result["checked"], hashed=result["hashed"],
+               ms=round(elapsed * 1e3, 1))
+
+    # Same size, content changed, mtime moved: must be caught
+    victim = files[0]
+    data = bytearray(victim.read_bytes())
+    data[0] ^= 0xff
+    victim.write_bytes(bytes(data))
+    result = manager.verify("bench-wine")["bench-wine"]
+    if result["modified"] != [str(victim.relative_to(install_dir))]:
+        raise SystemExit(f"corruption not reported: {result}")
+    report("corrupted file reported", modified=len(result["modified"]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=int, default=64)
+    parser.add_argument("--files", type=int, default=4000)
+    parser.add_argument("--touched", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+        serve_dir = workdir / "serve"
+        serve_dir.mkdir()
+        archive = serve_dir / "bench-wine.tar.gz"
+        make_tarball(archive, "bench-wine", args.size_mb, files=args.files)
+        sha256 = hashlib.sha256(archive.read_bytes()).hexdigest()
+        with serve_directory(serve_dir, RangeRequestHandler) as base_url:
+            bench_download(workdir, base_url, archive, sha256, args.repeat)
+            check_mismatch(workdir, base_url, archive)
+            bench_verify(workdir, base_url, archive, sha256, args.touched)
+        try:
+            Downloader(workdir / "bad").fetch("http://example.invalid/x", "../index.json")
+        except ChecksumError:
+            report("malformed sha256 refused", ok=True)
+        else:
+            raise SystemExit("malformed sha256 accepted")
+
+
+if __name__ == "__main__":
+    main()
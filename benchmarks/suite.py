@@ -0,0 +1,236 @@
+"""Offline benchmark suite for the catalog, list, install, component and registry paths.
+
+Everything runs against synthetic data: catalogs of 100 to 100k entries,
+tarballs served from a local HTTP server and fake prefixes with large
+registry files. Results are printed and, with --output, written as JSON
+so that two runs can be compared:
+
+    python benchmarks/suite.py --output before.json
+    python benchmarks/suite.py --output after.json --compare before.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from _common import (ROOT_DIR, make_component_tarball, make_prefix, make_tarball, report,
+                     serve_directory, synthetic_components, synthetic_versions, write_catalog)
+
+from vodka import VodkaManager
+from vodka import catalog as catalog_module
+from vodka.component_installer import ENVIRONMENT_KEY
+from vodka.registry import RegistryFile
+from vodka_cli.cli import print_version_list
+
+CATALOG_SIZES = (100, 1000, 10000, 100000)
+QUICK_CATALOG_SIZES = (100, 1000)
+
+# Relative change below which a comparison counts as noise
+NOISE = 0.10
+
+
+def measure(func, repeat, setup=None):
+    """Run func repeat times, returning {"median_s", "min_s", "repeat"}.
+
+    setup, if given, runs untimed before every call.
+    """
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return {"median_s": statistics.median(times), "min_s": min(times), "repeat": repeat}
+
+
+def quiet(func, *args, **kwargs):
+    """Call func with its progress output swallowed."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        return func(*args, **kwargs)
+
+
+def catalog_cases(workdir, entries, repeat):
+    """find_version, get_versions and print_version_list on one catalog size."""
+    base_dir = workdir / f"catalog-{entries}"
+    base_dir.mkdir()
+    data = synthetic_versions(entries)
+    with open(base_dir / "versions.json", "w") as f:
+        json.dump(data, f)
+    names = [v["name"] for versions in data["versions"].values() for v in versions]
+    last = names[-1]
+    manager = VodkaManager(base_dir)
+
+    def reset():
+        # What a new CLI process sees: only the compiled cache on disk
+        catalog_module._loaded.clear()
+
+    manager.find_version(last)  # Build the compiled cache
+    params = {"entries": entries}
+    yield "find_version", params, measure(lambda: manager.find_version(last), repeat, reset)
+    yield "find_version (loaded)", params, measure(lambda: manager.find_version(last), repeat)
+    yield "get_versions", params, measure(manager.get_versions, repeat, reset)
+    yield "print_version_list", params, measure(
+        lambda: quiet(print_version_list, manager, filter_str="1.", page=2), repeat, reset)
+
+
+def install_cases(workdir, base_url, archive_name, archive_mb, repeat):
+    """install_version from the local HTTP server, downloading and streaming."""
+    version = {"name": "bench-wine", "title": "Bench Wine",
+               "uri": f"{base_url}/{archive_name}", "files": {"wine": "bin/wine"}}
+    base_dir = workdir / "install"
+
+    def setup():
+        shutil.rmtree(base_dir, ignore_errors=True)
+        base_dir.mkdir()
+        write_catalog(base_dir / "versions.json", [version])
+        catalog_module._loaded.clear()
+
+    for stream in (False, True):
+        yield "install_version", {"archive_mb": archive_mb, "stream": stream}, measure(
+            lambda: quiet(VodkaManager(base_dir).install_version, "bench-wine", stream=stream),
+            repeat, setup)
+
+
+def component_cases(workdir, base_url, archive_name, reg_sections, repeat):
+    """install_component into a fake prefix with large registry files."""
+    name = archive_name.split(".tar")[0]
+    components = synthetic_components(1, uri=f"{base_url}/{archive_name}")
+    # Name the single entry after the served tarball's top-level directory
+    components["versions"]["dxvk"][0]["name"] = name
+    base_dir = workdir / "component"
+    template = make_prefix(workdir / "prefix-template", reg_sections)
+    prefix = workdir / "prefix"
+
+    def fresh_prefix():
+        shutil.rmtree(prefix, ignore_errors=True)
+        shutil.copytree(template, prefix)
+
+    def fresh_install():
+        shutil.rmtree(base_dir, ignore_errors=True)
+        base_dir.mkdir()
+        with open(base_dir / "components.json", "w") as f:
+            json.dump(components, f)
+        catalog_module._loaded.clear()
+        fresh_prefix()
+
+    params = {"reg_sections": reg_sections}
+    yield "install_component (download)", params, measure(
+        lambda: quiet(VodkaManager(base_dir).install_component, name, prefix),
+        repeat, fresh_install)
+    manager = VodkaManager(base_dir)
+    yield "install_component (cached)", params, measure(
+        lambda: quiet(manager.install_component, name, prefix), repeat, fresh_prefix)
+
+
+def registry_cases(workdir, reg_sections, repeat):
+    """Set two values in a large system.reg and save it."""
+    prefix = make_prefix(workdir / "registry-prefix", reg_sections)
+    path = prefix / "system.reg"
+    original = path.read_bytes()
+
+    def edit():
+        registry = RegistryFile(path)
+        registry.set_value(ENVIRONMENT_KEY, "DXVK_HUD", "1")
+        registry.set_value(ENVIRONMENT_KEY, "DXVK_LOG_LEVEL", "none")
+        registry.save()
+
+    yield "registry edit", {"reg_sections": reg_sections, "reg_mb": round(
+        len(original) / 2**20, 1)}, measure(edit, repeat, lambda: path.write_bytes(original))
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR,
+                                capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "commit": commit,
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+
+
+def result_key(result):
+    return result["case"], json.dumps(result["params"], sort_keys=True)
+
+
+def compare(results, baseline_path):
+    """Print each result's change against the same case in a baseline file."""
+    with open(baseline_path) as f:
+        baseline = {result_key(r): r for r in json.load(f)["results"]}
+    print(f"\nCompared with {baseline_path}:")
+    for result in results:
+        old = baseline.get(result_key(result))
+        if old is None:
+            continue
+        ratio = result["median_s"] / old["median_s"]
+        verdict = "slower" if ratio > 1 + NOISE else "faster" if ratio < 1 - NOISE else "same"
+        params = " ".join(f"{k}={v}" for k, v in result["params"].items())
+        print(f"  {result['case']:<30} {params:<28} x{ratio:.2f}  {verdict}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=None,
+                        help=f"catalog sizes (default: {' '.join(map(str, CATALOG_SIZES))})")
+    parser.add_argument("--archive-mb", type=int, default=32)
+    parser.add_argument("--reg-sections", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--quick", action="store_true",
+                        help="small catalogs, archives and registries")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--compare", metavar="BASELINE", help="JSON file of an earlier run")
+    args = parser.parse_args()
+    if args.quick:
+        args.sizes = args.sizes or QUICK_CATALOG_SIZES
+        args.archive_mb = min(args.archive_mb, 4)
+        args.reg_sections = min(args.reg_sections, 2000)
+        args.repeat = min(args.repeat, 3)
+
+    results = []
+
+    def record(cases):
+        for case, params, timing in cases:
+            results.append({"case": case, "params": params, **timing})
+            report(case, **params, ms=round(timing["median_s"] * 1e3, 2))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+        for entries in args.sizes or CATALOG_SIZES:
+            record(catalog_cases(workdir, entries, args.repeat))
+
+        serve_dir = workdir / "serve"
+        serve_dir.mkdir()
+        make_tarball(serve_dir / "bench-wine.tar.gz", "bench-wine", args.archive_mb)
+        make_component_tarball(serve_dir / "dxvk-bench.tar.gz", "dxvk-bench")
+        with serve_directory(serve_dir) as base_url:
+            record(install_cases(workdir, base_url, "bench-wine.tar.gz", args.archive_mb,
+                                 args.repeat))
+            record(component_cases(workdir, base_url, "dxvk-bench.tar.gz",
+                                   args.reg_sections, args.repeat))
+        record(registry_cases(workdir, args.reg_sections, args.repeat))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"environment": environment(), "results": results}, f, indent=2)
+    if args.compare:
+        compare(results, args.compare)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
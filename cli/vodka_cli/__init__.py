@@ -1,3 +1,9 @@
-from vodka import VodkaManager
-
 __version__ = "0.1.0"
+
+
+def __getattr__(name):
+    # Re-exported lazily so that importing the CLI doesn't load the library
+    if name == "VodkaManager":
+        from vodka import VodkaManager
+        return VodkaManager
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
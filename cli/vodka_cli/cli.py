@@ -1,9 +1,6 @@
 import sys
 import os
-import json
-from pathlib import Path
-
-from vodka import VodkaManager, WineInstallVersion
+import time
 
 
 def handle_error(e):
@@ -24,67 +21,84 @@ def handle_error(e):
 
 
 def print_usage():
-    print("Usage: vodka <command> [args]")
+    print("Usage: vodka [--profile <file>] <command> [args]")
+    print("\n  --profile <file>       - Write a Chrome trace (chrome://tracing) of where time went")
     print("\nCommands:")
-    print("  install <version>      - Install a specific version")
+    print("  install <version>...   - Install one or more versions")
     print("  default <version>      - Set default version")
     print("  list [options]         - List available versions")
-    print("  refresh                - Refresh versions list")
+    print("  refresh [--all]        - Refresh versions list (--all: components too)")
     print("  execute <command>      - Execute a command (uses default if version not specified)")
+    print("  execute --batch <file> - Run one command per line against a single warm wineserver")
+    print("  dedup                  - Share identical files between installed versions")
+    print("  verify [version] [--full] - Check installed files against their install-time")
+    print("                           checksums (--full: re-hash unchanged files too)")
+    print("  gc [--quota <size>] [--dry-run] - Evict least recently used versions, components")
+    print("                           and downloads until they fit in the quota (e.g. 50G)")
+    print("  daemon [--socket <path>] - Serve the API over a Unix socket for vodka.client")
+    print("  migrate                - Create install manifests for versions installed by older releases")
+    print("\nPrefix Commands:")
+    print("  prefix create <path>... - Create booted prefixes by cloning a template prefix")
+    print("  prefix template        - Boot the template prefix (--rebuild to boot it again)")
+    print("  prefix delete <path>... - Delete prefixes")
+    print("  --version <version>    - Wine version of the template (default: the default version)")
     print("\nComponent Commands:")
     print("  component install <name> - Install a specific component")
     print("  component list        - List available components")
     print("  component refresh     - Refresh components list")
+    print("\nComponent install options:")
+    print("  --prefix <path>       - Wine prefix to install into (required); repeat it or")
+    print("                          pass a quoted glob to install into several prefixes")
+    print("  --deploy <mode>       - copy, hardlink or symlink the DLLs (default: copy)")
+    print("  --jobs <number>       - Prefixes to install into at once (default: 8)")
+    print("\nInstall options:")
+    print("  --stream              - Extract while downloading instead of saving the archive first")
+    print("  --jobs <number>       - Install up to this many versions at once (default: 4)")
+    print("\nExecute options:")
+    print("  --prefix <path>       - Wine prefix to run in (default: WINEPREFIX or ~/.wine)")
+    print("  --persistent          - Keep the wineserver running between commands")
+    print("  --jobs <number>       - Run this many batch commands at once, prefixing")
+    print("                          each output line with the command's number")
     print("\nList options:")
     print("  --filter <text>       - Filter versions by name")
     print("  --page <number>       - Show specific page")
     print("  --installed           - Show only installed versions")
+    print("  --json                - Print one JSON object per version (all of them")
+    print("                          unless --page is given)")
 
 
-def paginate_list(items, page_size=10):
-    """Split items into pages"""
-    for i in range(0, len(items), page_size):
-        yield items[i:i + page_size]
+def format_size(size):
+    """Format a byte count like 1.5 GiB."""
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if size < 1024 or unit == "GiB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
 
 
-def print_version_list(versions_data, filter_str=None, page=1, page_size=10):
-    """Print versions with pagination and filtering"""
-    try:
-        with open(versions_data.versions_file) as f:
-            data = json.load(f)
-
-        all_versions = []
-
-        # Collect all versions with their category info
-        for category in data['categories']:
-            category_id = category['id']
-            category_name = category['name']
-
-            if category_id in data['versions']:
-                for version in data['versions'][category_id]:
-                    version_info = {
-                        'category': category_name,
-                        'name': version['name'],
-                        'title': version['title'],
-                        'installed': versions_data.is_installed(version['name']),
-                        'default': versions_data.is_default(version['name'])
-                    }
-                    all_versions.append(version_info)
-
-        # Apply filter if specified
-        if filter_str:
-            filter_str = filter_str.lower()
-            all_versions = [v for v in all_versions if filter_str in v['title'].lower()
-                            or filter_str in v['name'].lower()]
+def format_age(seconds):
+    """Format a duration like 3d, 5h or 12m."""
+    for unit, length in (("d", 86400), ("h", 3600), ("m", 60)):
+        if seconds >= length:
+            return f"{int(seconds // length)}{unit}"
+    return f"{int(max(0, seconds))}s"
 
-        # Sort versions by category and name
-        all_versions.sort(key=lambda x: (x['category'], x['name']))
 
-        # Paginate results
-        pages = list(paginate_list(all_versions, page_size))
-        total_pages = len(pages)
+def print_version_list(versions_data, filter_str=None, page=1, page_size=10,
+                       installed_only=False):
+    """Print versions with pagination and filtering"""
+    from vodka.listing import version_page
+    from vodka.search import RANK_FUZZY
+    if page < 1:
+        print(f"Page {page} does not exist. Pages start at 1")
+        return
+    try:
+        catalog = versions_data.versions_catalog()
+        status = versions_data.get_status()
+        current_page, total = version_page(catalog, status, filter_str, installed_only,
+                                           page, page_size)
+        total_pages = (total + page_size - 1) // page_size
 
-        if not all_versions:
+        if not total:
             print("No versions found matching your criteria.")
             return
 
@@ -92,13 +106,16 @@ def print_version_list(versions_data, filter_str=None, page=1, page_size=10):
             print(f"Page {page} does not exist. Maximum page is {total_pages}")
             return
 
-        current_page = pages[page - 1]
         current_category = None
 
         # Print header with page information
         print(f"\nShowing page {page} of {total_pages}")
         if filter_str:
             print(f"Filter: {filter_str}")
+            if current_page[0]['rank'] >= RANK_FUZZY:
+                print("No exact matches, showing similar versions")
+        if installed_only:
+            print("Installed versions only")
         print("-" * 50)
 
         # Print versions
@@ -110,38 +127,101 @@ def print_version_list(versions_data, filter_str=None, page=1, page_size=10):
 
             installed = "✓" if version['installed'] else " "
             default = "*" if version['default'] else " "
-            print(f"[{installed}] [{default}] {
-                  version['title']} ({version['name']})")
+            print(f"[{installed}] [{default}] {version['title']} ({version['name']})")
 
         print("\nLegend: ✓ = installed, * = default")
         print(f"\nUse 'vodka list --page <num>' to see other pages")
         print(f"Use 'vodka list --filter <text>' to search versions")
         print(f"Use 'vodka list --installed' to show only installed versions")
+        print("Use 'vodka list --json' for one JSON object per version")
 
     except Exception as e:
         print(f"Error loading versions: {str(e)}")
 
 
-def main():
+def print_version_json(versions_data, filter_str=None, page=None, page_size=10,
+                       installed_only=False):
+    """Print one JSON object per version, as each is found.
+
+    Without a page every listed version is written, in catalog order;
+    with one, that page in the order `vodka list` shows it.
+    """
+    import json
+    from vodka.listing import iter_rows, version_page
+    if page is not None and page < 1:
+        print(f"Page {page} does not exist. Pages start at 1", file=sys.stderr)
+        return
+    catalog = versions_data.versions_catalog()
+    status = versions_data.get_status()
+    if page is None:
+        rows = iter_rows(catalog, status, filter_str, installed_only)
+    else:
+        rows, _ = version_page(catalog, status, filter_str, installed_only, page, page_size)
+    write = sys.stdout.write
+    for row in rows:
+        write(json.dumps(row))
+        write("\n")
+
+
+def run_command():
+    if len(sys.argv) < 2:
+        print_usage()
+        return 1
+
     try:
+        # Imported here so printing the usage doesn't load the library
+        from vodka import VodkaManager
         vodka = VodkaManager("/home/mvdw/_test_vodka")
 
-        if len(sys.argv) < 2:
-            print_usage()
-            return 1
-
         command = sys.argv[1].lower()
 
         if command == "install" and len(sys.argv) >= 3:
-            version_name = sys.argv[2]
-            try:
-                if vodka.install_version(version_name):
-                    print(f"Successfully installed Wine version {
-                        version_name}")
+            # Parse install command options
+            version_names = []
+            stream = False
+            jobs = 4
+
+            i = 2
+            while i < len(sys.argv):
+                if sys.argv[i] == "--stream":
+                    stream = True
+                    i += 1
+                elif sys.argv[i] == "--jobs" and i + 1 < len(sys.argv):
+                    try:
+                        jobs = int(sys.argv[i + 1])
+                    except ValueError:
+                        print("Invalid number of jobs")
+                        return 1
+                    i += 2
                 else:
-                    print(f"Version {version_name} is already installed")
-            except Exception as e:
-                return handle_error(e)
+                    version_names.append(sys.argv[i])
+                    i += 1
+
+            if len(version_names) == 1:
+                version_name = version_names[0]
+                try:
+                    if vodka.install_version(version_name, stream=stream):
+                        print(f"Successfully installed Wine version {version_name}")
+                    else:
+                        print(f"Version {version_name} is already installed")
+                except Exception as e:
+                    return handle_error(e)
+            else:
+                def progress(version_name, stage):
+                    print(f"[{version_name}] {stage.replace('_', ' ')}")
+
+                results = vodka.install_versions(
+                    version_names, max_workers=jobs, stream=stream, progress=progress)
+                failed = 0
+                print("\nSummary:")
+                for version_name, result in results.items():
+                    if result["status"] == "failed":
+                        failed += 1
+                        print(f"  {version_name}: failed - {result['error']}")
+                    else:
+                        print(f"  {version_name}: {result['status'].replace('_', ' ')}")
+                if failed:
+                    return 1
 
         elif command == "default" and len(sys.argv) == 3:
             version_name = sys.argv[2]
@@ -156,8 +236,9 @@ def main():
 
             # Parse list command options
             filter_str = None
-            page = 1
+            page = None
             show_installed_only = False
+            as_json = False
 
             i = 2
             while i < len(sys.argv):
@@ -174,16 +255,118 @@ def main():
                 elif sys.argv[i] == "--installed":
                     show_installed_only = True
                     i += 1
+                elif sys.argv[i] == "--json":
+                    as_json = True
+                    i += 1
                 else:
                     i += 1
 
-            print_version_list(vodka, filter_str, page)
+            if as_json:
+                print_version_json(vodka, filter_str, page, installed_only=show_installed_only)
+            else:
+                print_version_list(vodka, filter_str, 1 if page is None else page,
+                                   installed_only=show_installed_only)
 
         elif command == "refresh":
+            if "--all" in sys.argv[2:]:
+                print("Refreshing versions and components lists...")
+                report = vodka.refresh_all()
+                for name in ("versions", "components"):
+                    status = report[name]["status"].replace("_", " ")
+                    print(f"  {name}: {status} ({report[name]['bytes_transferred']} bytes)")
+                print(f"Transferred {report['bytes_transferred']} bytes, "
+                      f"saved {report['bytes_saved']} bytes")
+                print(f"Took {report['seconds']:.2f}s, "
+                      f"saved {report['seconds_saved']:.2f}s by fetching concurrently")
+                return 0
+
             print("Downloading Wine versions list...")
             if vodka.download_versions():
                 print("Successfully updated versions list")
 
+        elif command == "dedup":
+            print("Deduplicating installed versions...")
+            report = vodka.dedup_versions()
+            for version_name, saved in report["versions"].items():
+                print(f"  {version_name}: {saved / 2**20:.1f} MiB saved")
+            print(f"Saved {report['bytes_saved'] / 2**20:.1f} MiB in total")
+
+        elif command == "verify":
+            args = sys.argv[2:]
+            full = "--full" in args
+            names = [arg for arg in args if arg != "--full"]
+            if len(names) > 1:
+                print("Usage: vodka verify [version] [--full]")
+                return 1
+            reports = vodka.verify(names[0] if names else None, full)
+            if not reports:
+                print("No versions installed")
+            failed = False
+            for version_name, report in reports.items():
+                if report["recorded"]:
+                    print(f"{version_name}: no file manifest yet, recorded "
+                          f"{report['checked']} files as they are now")
+                    continue
+                status = "OK" if report["ok"] else "FAILED"
+                print(f"{version_name}: {status} ({report['checked']} files, "
+                      f"{report['hashed']} re-hashed, {format_size(report['bytes_hashed'])})")
+                for kind in ("missing", "modified", "added"):
+                    for path in report[kind][:20]:
+                        print(f"  {kind}: {path}")
+                    if len(report[kind]) > 20:
+                        print(f"  ... and {len(report[kind]) - 20} more {kind}")
+                failed = failed or not report["ok"]
+            if failed:
+                print("Reinstall a failed version to repair it")
+                return 1
+
+        elif command == "daemon":
+            from vodka.daemon import VodkaDaemon
+            socket_path = None
+            if sys.argv[2:3] == ["--socket"] and len(sys.argv) > 3:
+                socket_path = sys.argv[3]
+            elif len(sys.argv) > 2:
+                print("Usage: vodka daemon [--socket <path>]")
+                return 1
+            daemon = VodkaDaemon(vodka, socket_path)
+            print(f"Serving the Vodka API on {daemon.socket_path} (Ctrl+C to stop)")
+            daemon.run()
+
+        elif command == "gc":
+            quota = None
+            dry_run = False
+            i = 2
+            while i < len(sys.argv):
+                if sys.argv[i] == "--quota" and i + 1 < len(sys.argv):
+                    quota = sys.argv[i + 1]
+                    i += 2
+                elif sys.argv[i] == "--dry-run":
+                    dry_run = True
+                    i += 1
+                else:
+                    print("Usage: vodka gc [--quota <size>] [--dry-run]")
+                    return 1
+
+            report = vodka.gc(quota, dry_run)
+            now = time.time()
+            for item in report["evicted"]:
+                print(f"  {'Would evict' if dry_run else 'Evicted'} {item['kind']} "
+                      f"{item['name']}: {format_size(item['size'])}, "
+                      f"last used {format_age(now - item['last_used'])} ago")
+            freed = report["used_before"] - report["used_after"]
+            print(f"{'Would free' if dry_run else 'Freed'} {format_size(freed)}; "
+                  f"{format_size(report['used_after'])} of {format_size(report['quota'])} "
+                  f"quota in use")
+
+        elif command == "migrate":
+            print("Creating install manifests for existing versions...")
+            report = vodka.migrate_manifests()
+            for version_name in report["migrated"]:
+                print(f"  {version_name}")
+            for name in report["unknown"]:
+                print(f"  Skipped {name}: not a known version")
+            print(f"Created {len(report['migrated'])} manifests")
+
         elif command == "component":
             if len(sys.argv) < 3:
                 print_usage()
@@ -193,28 +376,67 @@ def main():
 
             if component_command == "install" and len(sys.argv) >= 4:
                 component_name = sys.argv[3]
-                prefix_path = None
+                prefix_paths = []
+                deploy_mode = None
+                jobs = 8
+
+                # Parse component install options
+                i = 4
+                while i < len(sys.argv):
+                    if sys.argv[i] == "--prefix" and i + 1 < len(sys.argv):
+                        prefix_paths.append(sys.argv[i + 1])
+                        i += 2
+                    elif sys.argv[i] == "--jobs" and i + 1 < len(sys.argv):
+                        try:
+                            jobs = int(sys.argv[i + 1])
+                        except ValueError:
+                            print("Invalid number of jobs")
+                            return 1
+                        i += 2
+                    elif sys.argv[i] == "--deploy" and i + 1 < len(sys.argv):
+                        deploy_mode = sys.argv[i + 1]
+                        i += 2
+                    else:
+                        i += 1
 
-                # Check for --prefix option
-                if len(sys.argv) >= 6 and sys.argv[4] == "--prefix":
-                    prefix_path = sys.argv[5]
-                else:
+                if not prefix_paths:
                     print("Error: --prefix option is required")
                     print(
                         "Usage: vodka component install <component> --prefix <prefix_path>")
                     return 1
 
+                from glob import has_magic
+                if len(prefix_paths) > 1 or any(has_magic(p) for p in prefix_paths):
+                    try:
+                        results = vodka.install_component_many(
+                            component_name, prefix_paths, max_workers=jobs,
+                            deploy_mode=deploy_mode)
+                    except Exception as e:
+                        return handle_error(e)
+                    if not results:
+                        print("No prefixes matched")
+                        return 1
+                    failed = 0
+                    for result in results:
+                        if result["success"]:
+                            print(f"  {result['prefix']}: ok ({result['seconds']:.2f}s)")
+                        else:
+                            failed += 1
+                            print(f"  {result['prefix']}: failed - {result['error']}")
+                    print(f"Installed {component_name} into {len(results) - failed} "
+                          f"of {len(results)} prefixes")
+                    return 1 if failed else 0
+
+                prefix_path = prefix_paths[0]
                 try:
-                    print(f"Installing {
-                          component_name} into prefix: {prefix_path}")
-                    if vodka.install_component(component_name, prefix_path):
-                        print(f"Successfully installed component {
-                              component_name}")
+                    print(f"Installing {component_name} into prefix: {prefix_path}")
+                    if vodka.install_component(component_name, prefix_path,
+                                               deploy_mode=deploy_mode):
+                        print(f"Successfully installed component {component_name}")
                         print(
                             "Note: You may need to restart your Wine prefix for changes to take effect")
                     else:
-                        print(f"Component {
-                              component_name} installation failed")
+                        print(f"Component {component_name} installation failed")
                 except Exception as e:
                     return handle_error(e)
 
@@ -240,27 +462,125 @@ def main():
                 print_usage()
                 return 1
 
+        elif command == "prefix" and len(sys.argv) >= 3:
+            prefix_command = sys.argv[2].lower()
+            paths = []
+            version_name = None
+            rebuild = False
+            i = 3
+            while i < len(sys.argv):
+                if sys.argv[i] == "--version" and i + 1 < len(sys.argv):
+                    version_name = sys.argv[i + 1]
+                    i += 2
+                elif sys.argv[i] == "--rebuild":
+                    rebuild = True
+                    i += 1
+                else:
+                    paths.append(sys.argv[i])
+                    i += 1
+
+            if prefix_command == "template":
+                print("Booting template prefix...")
+                result = vodka.build_prefix_template(version_name, rebuild)
+                if result["seconds"]:
+                    print(f"Booted template for {result['version']} "
+                          f"in {result['seconds']:.2f}s")
+                else:
+                    print(f"Template for {result['version']} already exists "
+                          "(use --rebuild to boot it again)")
+
+            elif prefix_command == "delete" and paths:
+                for path in paths:
+                    seconds = vodka.delete_prefix(path)
+                    print(f"Deleted {path} in {seconds:.2f}s")
+
+            elif prefix_command == "create" and paths:
+                start = time.perf_counter()
+                boot_seconds = 0.0
+                for path in paths:
+                    result = vodka.create_prefix(path, version_name)
+                    if result["boot_seconds"]:
+                        boot_seconds = result["boot_seconds"]
+                        print(f"Booted template for {result['version']} "
+                              f"in {boot_seconds:.2f}s")
+                    linked = result["reflink"] + result["hardlink"]
+                    print(f"  {path}: {result['files']} files ({linked} shared) "
+                          f"in {result['seconds']:.2f}s")
+                seconds = time.perf_counter() - start - boot_seconds
+                print(f"Created {len(paths)} prefixes in {seconds:.2f}s "
+                      f"({seconds / len(paths):.2f}s each)")
+                if boot_seconds:
+                    print(f"Booting each with wineboot would have taken about "
+                          f"{boot_seconds * len(paths):.1f}s")
+
+            else:
+                print("Usage: vodka prefix create <path>... [--version <version>]")
+                print("       vodka prefix delete <path>...")
+                print("       vodka prefix template [--version <version>] [--rebuild]")
+                return 1
+
         elif command == "execute":
-            if len(sys.argv) < 3:
+            # Options come before the command; everything after belongs to wine
+            args = sys.argv[2:]
+            batch_file = None
+            prefix = None
+            persistent = None
+            jobs = 1
+            while args and args[0] in ("--batch", "--prefix", "--persistent", "--jobs"):
+                option = args.pop(0)
+                if option == "--persistent":
+                    persistent = True
+                elif not args:
+                    print(f"Error: {option} requires a value")
+                    return 1
+                elif option == "--batch":
+                    batch_file = args.pop(0)
+                elif option == "--jobs":
+                    try:
+                        jobs = max(1, int(args.pop(0)))
+                    except ValueError:
+                        print("Error: --jobs requires a number")
+                        return 1
+                else:
+                    prefix = args.pop(0)
+
+            if batch_file is None and not args:
                 print("Error: Command required")
-                print("Usage: vodka execute <command>")
+                print("Usage: vodka execute [--prefix <path>] [--persistent] <command>")
+                print("       vodka execute [--prefix <path>] [--jobs <number>] --batch <file>")
                 return 1
 
-
             # Use default version if exists, otherwise error
             if not vodka.default_link.exists():
                 print("Error: No default Wine version set")
                 print("Use 'vodka default <version>' to set a default version")
                 return 1
-            command = sys.argv[2:]
 
             try:
-                stdout, stderr = vodka.execute(command)
-                if stdout:
-                    print(stdout)
-                if stderr:
-                    print(stderr, file=sys.stderr)
-                return 0
+                if batch_file is None:
+                    return vodka.execute(args, prefix, persistent)
+
+                import shlex
+                with open(batch_file) as f:
+                    commands = [shlex.split(line) for line in f
+                                if line.strip() and not line.lstrip().startswith("#")]
+                start = time.perf_counter()
+                if jobs > 1:
+                    def print_output(index, stream, line):
+                        out = sys.stdout if stream == "stdout" else sys.stderr
+                        print(f"[{index + 1}] {line}", file=out, flush=True)
+
+                    results = vodka.execute_many(commands, prefix, jobs, print_output,
+                                                 persistent)
+                else:
+                    results = vodka.execute_batch(commands, prefix)
+                failed = [r for r in results if r["returncode"] != 0]
+                for result in failed:
+                    print(f"Exit code {result['returncode']}: {' '.join(result['command'])}",
+                          file=sys.stderr)
+                total = time.perf_counter() - start
+                print(f"\nRan {len(results)} commands in {total:.1f}s, {len(failed)} failed")
+                return 1 if failed else 0
             except Exception as e:
                 return handle_error(e)
 
@@ -274,5 +594,35 @@ def main():
         return handle_error(e)
 
 
+def print_profile(trace, path):
+    """Print where the time went, from the recorded trace spans."""
+    print(f"\nProfile written to {path}", file=sys.stderr)
+    totals = sorted(trace.summary().items(), key=lambda item: -item[1]["seconds"])
+    for name, total in totals:
+        print(f"  {name:<24} {total['count']:>6}x {total['seconds']:>9.3f}s", file=sys.stderr)
+    for name, value in sorted(trace.counters().items()):
+        print(f"  {name:<24} {value:>17,}", file=sys.stderr)
+
+
+def main():
+    # "vodka --profile <file> <command> ..." records a Chrome trace of the run
+    if len(sys.argv) > 1 and sys.argv[1] == "--profile":
+        if len(sys.argv) < 3:
+            print("Error: --profile requires a file name")
+            return 1
+        profile_path = sys.argv[2]
+        del sys.argv[1:3]
+
+        from vodka import trace
+        trace.enable()
+        try:
+            return run_command()
+        finally:
+            trace.write_trace(profile_path)
+            print_profile(trace, profile_path)
+
+    return run_command()
+
+
 if __name__ == "__main__":
     sys.exit(main())
@@ -1,10 +1,33 @@
-from .manager import VodkaManager
-from .api.wine import *
+import importlib
 
 __all__ = [
     'VodkaManager',
 
     # Wine management
-    'WineInstallVersion'
+    'WineInstallVersion',
+    'WineInstallVersions',
 
 ]
+
+# Public names and the modules defining them. They are imported on first
+# access, so "import vodka" stays cheap for callers that need little of it.
+_LAZY_ATTRIBUTES = {
+    'VodkaManager': '.manager',
+    'WineInstallVersion': '.api.wine',
+    'WineInstallVersions': '.api.wine',
+    'WineGetInstalled': '.api.wine',
+    'WineRefreshVersionList': '.api.wine',
+}
+
+
+def __getattr__(name):
+    module_name = _LAZY_ATTRIBUTES.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRIBUTES))
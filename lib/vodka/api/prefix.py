@@ -1,24 +1,37 @@
-import os
 from pathlib import Path
 from ..util import createAPIResponse
+from ..manager import VodkaManager
 
 
 class WinePrefix:
     def __init__(self, path):
         self.path = Path(path)
 
-    def create(self):
+    def create(self, template=False, version=None):
+        """Create the prefix directory, or with template a booted prefix
+        cloned from the template of version (default: the default version)."""
         try:
+            if template:
+                result = VodkaManager().create_prefix(self.path, version)
+                return createAPIResponse(200, {"path": str(self.path), **result})
             self.path.mkdir(parents=True, exist_ok=True)
             return createAPIResponse(200, {"path": str(self.path)})
         except Exception as e:
             return createAPIResponse(500, None, str(e))
 
+    @staticmethod
+    def build_template(version=None, rebuild=False):
+        try:
+            result = VodkaManager().build_prefix_template(version, rebuild)
+            return createAPIResponse(200, result)
+        except Exception as e:
+            return createAPIResponse(500, None, str(e))
+
     def delete(self):
         try:
             if self.path.exists():
-                # todo: delete path
-                os.system(f"echo todo: delete path {self.path}")
+                seconds = VodkaManager().delete_prefix(self.path)
+                return createAPIResponse(200, {"path": str(self.path), "seconds": seconds})
             return createAPIResponse(200)
         except Exception as e:
             return createAPIResponse(500, None, str(e))
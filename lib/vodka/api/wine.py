@@ -1,11 +1,14 @@
 from ..util import createAPIResponse
 from ..manager import VodkaManager
 
+# The functions below build a VodkaManager per call. The _-prefixed helpers
+# take one instead, so the daemon can answer with the same payloads from
+# the manager it keeps.
 
-def WineInstallVersion(version):
+
+def _install_version(manager, version, progress=None):
     try:
-        manager = VodkaManager()
-        success = manager.install_version(version)
+        success = manager.install_version(version, progress=progress)
         if success:
             return createAPIResponse(200, {"version": version})
         else:
@@ -14,19 +17,46 @@ def WineInstallVersion(version):
         return createAPIResponse(500, None, str(e))
 
 
-def WineGetInstalled():
+def _install_versions_response(results):
+    failed = [name for name, result in results.items()
+              if result["status"] == "failed"]
+    if failed:
+        return createAPIResponse(500, {"versions": results},
+                                 f"Failed to install: {', '.join(failed)}")
+    return createAPIResponse(200, {"versions": results})
+
+
+def _get_installed(manager):
     try:
-        manager = VodkaManager()
         versions = manager.get_versions()
         return createAPIResponse(200, {"versions": versions})
     except Exception as e:
         return createAPIResponse(500, None, str(e))
 
 
-def WineRefreshVersionList():
+def _refresh_version_list(manager):
     try:
-        manager = VodkaManager()
         manager.download_versions()
         return createAPIResponse(200)
     except Exception as e:
         return createAPIResponse(500, None, str(e))
+
+
+def WineInstallVersion(version):
+    return _install_version(VodkaManager(), version)
+
+
+def WineInstallVersions(versions, max_workers=4):
+    try:
+        manager = VodkaManager()
+        return _install_versions_response(manager.install_versions(versions, max_workers))
+    except Exception as e:
+        return createAPIResponse(500, None, str(e))
+
+
+def WineGetInstalled():
+    return _get_installed(VodkaManager())
+
+
+def WineRefreshVersionList():
+    return _refresh_version_list(VodkaManager())
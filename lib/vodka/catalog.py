@@ -0,0 +1,202 @@
+import bisect
+import contextlib
+import gc
+import json
+import marshal
+import os
+import sys
+import threading
+from pathlib import Path
+
+from .search import SearchIndex
+
+# Bump when the layout of the compiled cache file changes
+CACHE_FORMAT = 1
+
+# Catalogs already loaded by this process, keyed by file path
+_loaded = {}
+_loaded_lock = threading.Lock()
+
+
+def _cache_path(path):
+    return path.with_name(f".{path.name}.cache")
+
+
+def _index_path(path):
+    return path.with_name(f".{path.name}.index")
+
+
+def _cache_key(stat):
+    # marshal's format is only stable within one Python version
+    return (CACHE_FORMAT, sys.version_info[:2], stat.st_mtime_ns, stat.st_size)
+
+
+@contextlib.contextmanager
+def _gc_paused():
+    """Pause the cyclic GC, which otherwise runs over and over while a large
+    catalog allocates its dicts and roughly doubles the load time."""
+    was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if was_enabled:
+            gc.enable()
+
+
+def _read_compiled(cache_path, key):
+    """Return the data stored in a compiled cache file, or None if it is stale."""
+    try:
+        # marshal.loads on the whole buffer; marshal.load reads the file
+        # object piece by piece and is far slower
+        with open(cache_path, 'rb') as f:
+            cached_key, data = marshal.loads(f.read())
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+    return data if tuple(cached_key) == key else None
+
+
+def _write_compiled(cache_path, key, data):
+    """Store data in a compiled cache file, ignoring write errors."""
+    tmp_path = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.tmp")
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(marshal.dumps((key, data)))
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+
+class Catalog:
+    """Indexed, read-only view of a versions.json or components.json file.
+
+    Entries are indexed by lower-cased name and by category id, so lookups
+    don't scan the whole file. Use Catalog.load() to share one instance per
+    file and process.
+    """
+
+    def __init__(self, data):
+        self._path = None
+        self._key = None
+        self._index = None
+        self._index_lock = threading.Lock()
+        self.categories = data.get('categories', [])
+        self._by_category = data['versions']
+        self._by_name = {}
+        # Position of each category's first entry in entries()
+        self._category_ids = list(self._by_category)
+        self._starts = []
+        start = 0
+        for entries in self._by_category.values():
+            self._starts.append(start)
+            start += len(entries)
+            for entry in entries:
+                # Keep the first match, like the old linear search did
+                self._by_name.setdefault(entry['name'].lower(), entry)
+
+    @classmethod
+    def load(cls, path):
+        """Return the catalog stored at path.
+
+        The parsed catalog is reused for as long as the file's mtime and size
+        are unchanged. A marshal cache next to the file lets other processes
+        skip JSON parsing.
+        """
+        path = Path(path)
+        key = _cache_key(os.stat(path))
+        with _loaded_lock:
+            catalog = _loaded.get(str(path))
+        if catalog is not None and catalog._key == key:
+            return catalog
+
+        with _gc_paused():
+            data = _read_compiled(_cache_path(path), key)
+            if data is None:
+                with open(path) as f:
+                    data = json.load(f)
+                _write_compiled(_cache_path(path), key, data)
+            catalog = cls(data)
+        catalog._path = path
+        catalog._key = key
+        with _loaded_lock:
+            _loaded[str(path)] = catalog
+        return catalog
+
+    def __len__(self):
+        return len(self._by_name)
+
+    def __contains__(self, name):
+        return name.lower() in self._by_name
+
+    def get(self, name):
+        """Return the entry called name (case-insensitive), or None."""
+        return self._by_name.get(name.lower())
+
+    def entries(self):
+        """Return all entries, flattened across categories."""
+        entries = []
+        for category_entries in self._by_category.values():
+            entries.extend(category_entries)
+        return entries
+
+    def iter_entries(self):
+        """Yield (category id, entry) in the order of entries()."""
+        for category_id, category_entries in self._by_category.items():
+            for entry in category_entries:
+                yield category_id, entry
+
+    def entry_at(self, position):
+        """Return (category id, entry) for a position in entries()."""
+        # Empty categories share their start with the next one; bisect_right
+        # picks the last of them
+        i = bisect.bisect_right(self._starts, position) - 1
+        if position < 0 or i < 0:
+            raise IndexError(position)
+        category_id = self._category_ids[i]
+        return category_id, self._by_category[category_id][position - self._starts[i]]
+
+    def search_index(self):
+        """Return the SearchIndex over entries(), built on first use.
+
+        Catalogs loaded from a file keep the index in a compiled cache next
+        to it, rebuilt when the file changes.
+        """
+        with self._index_lock:
+            if self._index is None:
+                with _gc_paused():
+                    self._index = self._load_index()
+            return self._index
+
+    def _load_index(self):
+        if self._path is not None:
+            data = _read_compiled(_index_path(self._path), self._key)
+            index = SearchIndex.from_data(data) if data is not None else None
+            if index is not None:
+                return index
+        index = SearchIndex.build(self.entries())
+        if self._path is not None:
+            _write_compiled(_index_path(self._path), self._key, index.to_data())
+        return index
+
+    def search(self, query):
+        """Return the entries matching query, best match first.
+
+        See SearchIndex.search(); entries that match equally well are in
+        natural version order.
+        """
+        index = self.search_index()
+        entries = self.entries()
+        matches = sorted(index.search(query),
+                         key=lambda match: (match[0], index.order[match[1]]))
+        return [entries[position] for _, position in matches]
+
+    def category(self, category_id):
+        """Return the entries of one category."""
+        return self._by_category.get(category_id, [])
+
+    def iter_categories(self):
+        """Yield (category, entries) for every listed category that has entries."""
+        for category in self.categories:
+            if category['id'] in self._by_category:
+                yield category, self._by_category[category['id']]
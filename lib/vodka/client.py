@@ -0,0 +1,129 @@
+"""Client for the vodka daemon, with the signatures of the vodka.api functions.
+
+    from vodka.client import WineGetInstalled
+    WineGetInstalled()  # same payload as vodka.WineGetInstalled()
+
+The socket is taken from VODKA_SOCKET, or ~/.vodka/daemon.sock. When no
+daemon is reachable the functions return a 503 response.
+"""
+import itertools
+import json
+import os
+import socket
+import threading
+from pathlib import Path
+
+from .util import createAPIResponse
+
+SOCKET_ENV = "VODKA_SOCKET"
+
+
+def default_socket_path():
+    return Path(os.environ.get(SOCKET_ENV) or Path.home() / ".vodka" / "daemon.sock")
+
+
+class VodkaClient:
+    """Connection to a running vodka daemon.
+
+    Each thread gets its own connection, kept open between calls, so a
+    client can be shared by threads that call concurrently.
+    """
+
+    def __init__(self, socket_path=None, timeout=None):
+        self.socket_path = Path(socket_path or default_socket_path())
+        self.timeout = timeout
+        self._local = threading.local()
+        self._ids = itertools.count(1)
+
+    def _connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(str(self.socket_path))
+        except OSError:
+            sock.close()
+            raise
+        return sock, sock.makefile('rwb')
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._local.connection = self._connect()
+        return connection
+
+    def _request(self, stream, call, args=(), kwargs=None):
+        request_id = next(self._ids)
+        stream.write(json.dumps({"id": request_id, "call": call, "args": list(args),
+                                 "kwargs": kwargs or {}}).encode() + b"\n")
+        stream.flush()
+        return request_id
+
+    def call(self, name, *args, **kwargs):
+        """Call an API function in the daemon and return its response."""
+        try:
+            _, stream = self._connection()
+            request_id = self._request(stream, name, args, kwargs)
+            for line in stream:
+                message = json.loads(line)
+                if message.get("id") == request_id:
+                    return message["response"]
+            raise ConnectionError("Daemon closed the connection")
+        except (OSError, ValueError) as e:
+            self.close()
+            return createAPIResponse(503, None, f"Vodka daemon not reachable: {e}")
+
+    def subscribe(self):
+        """Yield {"event", "data"} dicts pushed by the daemon, forever.
+
+        Uses a connection of its own; close the generator to drop it.
+        """
+        sock, stream = self._connect()
+        try:
+            self._request(stream, "subscribe")
+            for line in stream:
+                message = json.loads(line)
+                if "event" in message:
+                    yield message
+        finally:
+            stream.close()
+            sock.close()
+
+    def close(self):
+        """Close this thread's connection."""
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            self._local.connection = None
+            sock, stream = connection
+            try:
+                stream.close()
+            except OSError:
+                pass
+            sock.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def _default_client():
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = VodkaClient()
+        return _client
+
+
+def WineInstallVersion(version):
+    return _default_client().call("WineInstallVersion", version)
+
+
+def WineInstallVersions(versions, max_workers=4):
+    return _default_client().call("WineInstallVersions", list(versions), max_workers)
+
+
+def WineGetInstalled():
+    return _default_client().call("WineGetInstalled")
+
+
+def WineRefreshVersionList():
+    return _default_client().call("WineRefreshVersionList")
@@ -0,0 +1,124 @@
+import os
+import re
+import shutil
+import stat
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from . import trace
+
+_SIZE_RE = re.compile(r'^\s*(\d+(?:\.\d+)?)\s*([kmgt]?)i?b?\s*$', re.IGNORECASE)
+_SIZE_UNITS = {"": 1, "k": 2**10, "m": 2**20, "g": 2**30, "t": 2**40}
+
+
+def parse_size(value):
+    """Return a size like 50G, "512 MiB" or 1048576 in bytes, or None for None."""
+    if value is None or isinstance(value, int):
+        return value
+    match = _SIZE_RE.match(str(value))
+    if match is None:
+        raise ValueError(f"Invalid size: {value}")
+    return int(float(match.group(1)) * _SIZE_UNITS[match.group(2).lower()])
+
+
+def _retry_writable(func, path, exc):
+    """rmtree error handler: make the parent writable and try again."""
+    if not isinstance(exc, PermissionError):
+        raise exc
+    parent = os.path.dirname(path)
+    os.chmod(parent, stat.S_IMODE(os.lstat(parent).st_mode) | stat.S_IRWXU)
+    func(path)
+
+
+def _rmtree(path):
+    # onerror is deprecated from Python 3.12 on in favour of onexc
+    if sys.version_info >= (3, 12):
+        shutil.rmtree(path, onexc=_retry_writable)
+    else:
+        shutil.rmtree(path, onerror=lambda func, path, exc_info:
+                      _retry_writable(func, path, exc_info[1]))
+
+
+def remove_tree(path, workers=None):
+    """Delete a directory tree, removing its subtrees on a thread pool.
+
+    The tree is first renamed to a hidden name next to it, so it disappears
+    at once and an interrupted removal leaves no half-deleted tree under
+    the original name. A symlink is removed, not followed.
+    """
+    path = Path(path)
+    if path.is_symlink() or not path.is_dir():
+        path.unlink()
+        return
+    doomed = path.with_name(f".{path.name}.{os.getpid()}.deleting")
+    os.rename(path, doomed)
+
+    # A prefix has almost everything under drive_c, so split two levels down
+    subtrees = []
+    with os.scandir(doomed) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                with os.scandir(entry.path) as children:
+                    subtrees.extend(child.path for child in children
+                                    if child.is_dir(follow_symlinks=False))
+    with trace.span("remove_tree", path=str(path), subtrees=len(subtrees)), \
+            ThreadPoolExecutor(max_workers=workers or min(8, os.cpu_count() or 1)) as pool:
+        for _ in pool.map(_rmtree, subtrees):
+            pass
+        _rmtree(doomed)
+
+
+class UsageLog:
+    """Last-used times of versions, components and downloads.
+
+    Each item has an empty marker file, usage/<kind>/<name>, whose mtime
+    is the time it was last used. Touching a marker is a single utime call
+    and safe to do from several processes at once. The "symlinked" kind
+    marks components that some prefix has DLLs symlinked into.
+    """
+
+    def __init__(self, usage_dir):
+        self.usage_dir = Path(usage_dir)
+
+    def touch(self, kind, name):
+        marker = self.usage_dir / kind / name
+        try:
+            os.utime(marker)
+        except FileNotFoundError:
+            marker.parent.mkdir(parents=True, exist_ok=True)
+            marker.touch()
+
+    def last_used(self, kind, name, default=None):
+        """Return the time name was last used, or default if never recorded."""
+        try:
+            return os.stat(self.usage_dir / kind / name).st_mtime
+        except FileNotFoundError:
+            return default
+
+    def forget(self, kind, name):
+        try:
+            (self.usage_dir / kind / name).unlink()
+        except FileNotFoundError:
+            pass
+
+
+def plan_eviction(items, quota):
+    """Pick the least recently used items to remove to get under quota.
+
+    items are dicts with "size", "last_used" and "protected"; protected
+    items are never picked. Returns (items to evict, bytes used before,
+    bytes used after).
+    """
+    used = sum(item["size"] for item in items)
+    remaining = used
+    evict = []
+    for item in sorted(items, key=lambda item: item["last_used"]):
+        if remaining <= quota:
+            break
+        if item["protected"]:
+            continue
+        evict.append(item)
+        remaining -= item["size"]
+    return evict, used, remaining
+
@@ -1,26 +1,54 @@
 import os
+import errno
 import glob
 import shutil
 import time
 from pathlib import Path
 
+from . import trace
+from .registry import RegistryFile
+
+DEPLOY_MODES = ("copy", "hardlink", "symlink")
+
+DLL_OVERRIDES_KEY = "Software\\Wine\\DllOverrides"
+ENVIRONMENT_KEY = "System\\CurrentControlSet\\Control\\Session Manager\\Environment"
+
 
 class ComponentInstaller:
-    def __init__(self, prefix_path):
+    """Installs extracted components into one Wine prefix.
+
+    If usage is a UsageLog, a symlink deployment is recorded there as
+    usage/symlinked/<component>, so gc knows prefixes depend on the
+    component's directory.
+    """
+
+    def __init__(self, prefix_path, deploy_mode="copy", verbose=True, usage=None):
+        if deploy_mode not in DEPLOY_MODES:
+            raise ValueError(f"Unknown deploy mode: {deploy_mode}")
         self.prefix_path = Path(prefix_path)
+        self.deploy_mode = deploy_mode
+        self.verbose = verbose
+        self.usage = usage
         self.drive_c = self.prefix_path / "drive_c"
         self.system32_path = self.drive_c / "windows/system32"
         self.system64_path = self.drive_c / "windows/system64"
         self.user_reg_path = self.prefix_path / "user.reg"
         self.system_reg_path = self.prefix_path / "system.reg"
 
-    def install_component(self, component_path, installation_info):
-        """Install a component according to its installation instructions"""
+    def install_component(self, component_path, installation_info, raise_errors=False):
+        """Install a component according to its installation instructions
+
+        Errors are printed and reported as False unless raise_errors is set.
+        """
         try:
             if installation_info["type"] == "dll_override":
                 # Ensure prefix structure exists
                 self._ensure_prefix_structure()
 
+                if self.deploy_mode == "symlink" and self.usage is not None:
+                    # Recorded first: a partial install may already link to it
+                    self.usage.touch("symlinked", Path(component_path).name)
+
                 # Install DLLs
                 self._install_dlls(component_path, installation_info["files"])
 
@@ -35,6 +63,8 @@ class ComponentInstaller:
                 return True
             return False
         except Exception as e:
+            if raise_errors:
+                raise
             print(f"Installation error: {str(e)}")
             return False
 
@@ -61,21 +91,66 @@ class ComponentInstaller:
         """Install DLLs for a specific architecture"""
         source_pattern = component_path / arch_info["source"]
 
-        # Remove existing DLLs first
+        # Deploy new DLLs, replacing whatever is installed under that name
+        installed = set()
+        for dll_path in glob.glob(str(source_pattern)):
+            dll_name = os.path.basename(dll_path)
+            target_dll = target_path / dll_name
+            if self.verbose:
+                print(f"Installing {dll_name} to {target_dll}")
+            self._deploy_dll(Path(dll_path).resolve(), target_dll)
+            installed.add(dll_name)
+
+        # Remove existing DLLs the new version doesn't provide
         if "dlls" in arch_info:
             for dll in arch_info["dlls"]:
                 target_dll = target_path / dll
-                if target_dll.exists():
+                if dll not in installed and (target_dll.exists() or target_dll.is_symlink()):
                     target_dll.unlink()
 
-        # Copy new DLLs
-        for dll_path in glob.glob(str(source_pattern)):
-            dll_name = os.path.basename(dll_path)
-            target_dll = target_path / dll_name
-            print(f"Installing {dll_name} to {target_dll}")
-            shutil.copy2(dll_path, target_dll)
-            # Ensure DLL is executable
-            os.chmod(target_dll, 0o755)
+    def _deploy_dll(self, source_dll, target_dll):
+        """Copy or link one DLL into the prefix.
+
+        The new file is created under a temporary name and renamed over the
+        old one, so switching component versions never leaves a DLL missing.
+        Hardlinks fall back to copying when the prefix is on another
+        filesystem.
+        """
+        tmp_dll = target_dll.with_name(f".{target_dll.name}.vodka-tmp")
+        if tmp_dll.exists() or tmp_dll.is_symlink():
+            tmp_dll.unlink()
+
+        if self.deploy_mode != "copy" and os.stat(source_dll).st_mode & 0o777 != 0o755:
+            # Linked DLLs share the source's permissions
+            os.chmod(source_dll, 0o755)
+
+        with trace.span("component.deploy_dll", dll=target_dll.name) as span:
+            linked = False
+            if self.deploy_mode == "symlink":
+                os.symlink(source_dll, tmp_dll)
+                linked = True
+            elif self.deploy_mode == "hardlink":
+                linked = self._try_hardlink(source_dll, tmp_dll)
+
+            if not linked:
+                shutil.copy2(source_dll, tmp_dll)
+                # Ensure DLL is executable
+                os.chmod(tmp_dll, 0o755)
+            os.replace(tmp_dll, target_dll)
+            span.set(mode=self.deploy_mode if linked else "copy")
+        if not linked and trace.enabled():
+            trace.count("component.copied_bytes", os.stat(target_dll).st_size)
+        trace.count("component.dlls")
+
+    def _try_hardlink(self, source_dll, target_dll):
+        """Hardlink source_dll to target_dll, returning False if unsupported."""
+        try:
+            os.link(source_dll, target_dll)
+            return True
+        except OSError as e:
+            if e.errno in (errno.EXDEV, errno.EPERM, errno.EMLINK):
+                return False
+            raise
 
     def _set_dll_overrides(self, overrides):
         """Set DLL overrides in the registry"""
@@ -83,79 +158,21 @@ class ComponentInstaller:
             # Create basic registry structure if it doesn't exist
             self._create_basic_registry()
 
-        with open(self.user_reg_path, 'r', encoding='utf-8') as f:
-            registry_content = f.readlines()
-
-        dll_section = "[Software\\\\Wine\\\\DllOverrides]"
-        section_index = -1
-
-        # Find or create DllOverrides section
-        for i, line in enumerate(registry_content):
-            if dll_section in line:
-                section_index = i
-                break
-
-        if section_index == -1:
-            current_time = int(time.time())
-            registry_content.extend([
-                "\n",
-                f"{dll_section}\n",
-                f"#time={current_time:x}\n"
-            ])
-            section_index = len(registry_content) - 3
-
-        # Remove existing overrides
-        i = section_index + 1
-        while i < len(registry_content):
-            if i >= len(registry_content) or registry_content[i].startswith("["):
-                break
-            if any(override.split('=')[0].strip('"') in registry_content[i] for override in overrides):
-                registry_content.pop(i)
-            else:
-                i += 1
-
-        # Add new overrides
-        new_content = []
+        registry = RegistryFile(self.user_reg_path)
         for override in overrides:
             dll_name, value = override.split('=')
-            new_content.append(f'"{dll_name}"="{value}"\n')
-
-        registry_content[section_index + 2:section_index + 2] = new_content
-
-        with open(self.user_reg_path, 'w', encoding='utf-8') as f:
-            f.writelines(registry_content)
+            registry.set_value(DLL_OVERRIDES_KEY, dll_name, value)
+        registry.save()
 
     def _set_environment_vars(self, environment):
         """Set environment variables in the registry"""
         if not self.system_reg_path.exists():
             return
 
-        with open(self.system_reg_path, 'r', encoding='utf-8') as f:
-            registry_content = f.readlines()
-
-        env_section = "[System\\\\CurrentControlSet\\\\Control\\\\Session Manager\\\\Environment]"
-        section_index = -1
-
-        for i, line in enumerate(registry_content):
-            if env_section in line:
-                section_index = i
-                break
-
-        if section_index == -1:
-            current_time = int(time.time())
-            registry_content.extend([
-                "\n",
-                f"{env_section}\n",
-                f"#time={current_time:x}\n"
-            ])
-            section_index = len(registry_content) - 3
-
-        # Add environment variables
+        registry = RegistryFile(self.system_reg_path)
         for name, value in environment.items():
-            registry_content.insert(section_index + 2, f'"{name}"="{value}"\n')
-
-        with open(self.system_reg_path, 'w', encoding='utf-8') as f:
-            f.writelines(registry_content)
+            registry.set_value(ENVIRONMENT_KEY, name, value)
+        registry.save()
 
     def _create_basic_registry(self):
         """Create basic registry structure if it doesn't exist"""
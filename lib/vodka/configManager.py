@@ -7,12 +7,21 @@ class ConfigManager:
     def __init__(self, base_dir=None):
         self.base_dir = Path(base_dir) if base_dir else Path.home() / ".vodka"
         self.config_file = self.base_dir / "config.json"
+        # ((mtime_ns, size), config) of the last file read
+        self._loaded = None
         self.default_config = {
             "wine_default": None,
             "prefixes_dir": str(self.base_dir / "prefixes"),
-            "downloads_dir": str(self.base_dir / "downloads")
+            "downloads_dir": str(self.base_dir / "downloads"),
+            "download_connections": 4,
+            "dedup": False,
+            "dedup_mode": "auto",
+            "component_deploy": "copy",
+            "prefix_clone_mode": "auto",
+            "persistent_wineserver": False,
+            "wineserver_idle_timeout": 300,
+            "gc_quota": None
         }
-        self.ensure_dirs()
 
     def ensure_dirs(self):
         """Ensure all required directories exist."""
@@ -21,19 +30,33 @@ class ConfigManager:
         Path(self.default_config["downloads_dir"]).mkdir(exist_ok=True)
 
     def load(self):
-        """Load configuration from file."""
-        if not self.config_file.exists():
-            return self.save(self.default_config)
+        """Load configuration from file.
+
+        The parsed file is kept until its mtime or size changes, so
+        long-running processes can call get() freely. Without a file the
+        defaults are returned; config.json is only written by set() and
+        save(), so reading settings never touches the disk.
+        """
+        try:
+            st = os.stat(self.config_file)
+        except FileNotFoundError:
+            return dict(self.default_config)
 
+        key = (st.st_mtime_ns, st.st_size)
+        if self._loaded is not None and self._loaded[0] == key:
+            return dict(self._loaded[1])
         try:
             with open(self.config_file) as f:
-                config = json.load(f)
-                return {**self.default_config, **config}
+                config = {**self.default_config, **json.load(f)}
         except Exception:
-            return self.default_config
+            return dict(self.default_config)
+        self._loaded = (key, config)
+        return dict(config)
 
     def save(self, config):
         """Save configuration to file."""
+        self.ensure_dirs()
+        self._loaded = None
         with open(self.config_file, 'w') as f:
             json.dump(config, f, indent=4)
         return config
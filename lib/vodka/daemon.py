@@ -0,0 +1,231 @@
+"""A long-lived process serving the vodka.api calls over a Unix socket.
+
+The protocol is one JSON object per line. A request names an API function
+and its arguments:
+
+    {"id": 1, "call": "WineGetInstalled", "args": [], "kwargs": {}}
+
+and is answered with the createAPIResponse payload the function returns:
+
+    {"id": 1, "response": {"response_code": 200, "data": {...}}}
+
+Requests on one connection are handled concurrently and answered in
+completion order. After {"id": 2, "call": "subscribe"} a connection also
+receives events as they happen:
+
+    {"event": "install_progress", "data": {"version": "...", "stage": "extracting"}}
+
+vodka.client implements the other side.
+"""
+import asyncio
+import json
+import os
+import socket
+from pathlib import Path
+
+from . import trace
+from .api import wine
+from .util import createAPIResponse
+
+SOCKET_NAME = "daemon.sock"
+
+# Longest request line accepted from a client
+LINE_LIMIT = 1024 * 1024
+
+
+class VodkaDaemon:
+    """Serves API calls from one VodkaManager kept for the daemon's lifetime.
+
+    The manager's catalogs and config are parsed once and re-read only when
+    their files change. The installed-versions answer is cached, encoded,
+    until the catalog, the manifests directory or the default link change,
+    so it stays correct when another process installs a version. Installs
+    of the same version are serialized: the second waits for the first and
+    then reports that the version is already installed.
+    """
+
+    def __init__(self, manager, socket_path=None):
+        self.manager = manager
+        self.socket_path = Path(socket_path or manager.base_dir / SOCKET_NAME)
+        self._subscribers = set()
+        self._install_locks = {}
+        # (status stamp, encoded WineGetInstalled response)
+        self._installed = None
+        self._loop = None
+        self._handlers = {
+            "WineInstallVersion": self._install_version,
+            "WineInstallVersions": self._install_versions,
+            "WineGetInstalled": self._get_installed,
+            "WineRefreshVersionList": self._refresh_version_list,
+            "ping": self._ping,
+        }
+
+    def _status_stamp(self):
+        stamp = []
+        for path in (self.manager.versions_file, self.manager.manifests.manifests_dir):
+            try:
+                st = os.stat(path)
+                stamp.append((st.st_mtime_ns, st.st_size))
+            except FileNotFoundError:
+                stamp.append(None)
+        try:
+            stamp.append(os.readlink(self.manager.default_link))
+        except OSError:
+            stamp.append(None)
+        return tuple(stamp)
+
+    async def _in_thread(self, func, *args):
+        return await self._loop.run_in_executor(None, func, *args)
+
+    def _notify(self, event, data=None):
+        line = json.dumps({"event": event, "data": data or {}}).encode() + b"\n"
+        for writer in list(self._subscribers):
+            if writer.is_closing():
+                self._subscribers.discard(writer)
+            else:
+                writer.write(line)
+
+    async def _ping(self):
+        return createAPIResponse(200, {"pid": os.getpid()})
+
+    async def _get_installed(self):
+        stamp = self._status_stamp()
+        if self._installed is None or self._installed[0] != stamp:
+            response = await self._in_thread(wine._get_installed, self.manager)
+            if response["response_code"] != 200:
+                return response
+            self._installed = (stamp, json.dumps(response).encode())
+        return self._installed[1]
+
+    async def _install_version(self, version):
+        def progress(version_name, stage):
+            self._loop.call_soon_threadsafe(
+                self._notify, "install_progress", {"version": version_name, "stage": stage})
+
+        lock = self._install_locks.setdefault(version.lower(), asyncio.Lock())
+        async with lock:
+            self._notify("install_started", {"version": version})
+            response = await self._in_thread(wine._install_version, self.manager, version,
+                                             progress)
+            code = response["response_code"]
+            if code == 200:
+                self._notify("version_installed", {"version": version})
+            elif code != 409:
+                self._notify("install_failed",
+                             {"version": version, "reason": response.get("reason")})
+        return response
+
+    async def _install_versions(self, versions, max_workers=4):
+        semaphore = asyncio.Semaphore(max(1, max_workers))
+
+        async def install(version):
+            async with semaphore:
+                response = await self._install_version(version)
+            code = response["response_code"]
+            if code == 200:
+                return {"status": "installed", "error": None}
+            if code == 409:
+                return {"status": "already_installed", "error": None}
+            return {"status": "failed", "error": response.get("reason")}
+
+        versions = list(dict.fromkeys(versions))
+        results = await asyncio.gather(*(install(version) for version in versions))
+        return wine._install_versions_response(dict(zip(versions, results)))
+
+    async def _refresh_version_list(self):
+        response = await self._in_thread(wine._refresh_version_list, self.manager)
+        if response["response_code"] == 200:
+            self._notify("versions_refreshed")
+        return response
+
+    async def _answer(self, request, writer):
+        request_id = request.get("id")
+        call = request.get("call")
+        with trace.span("daemon.request", call=call):
+            if call == "subscribe":
+                self._subscribers.add(writer)
+                response = createAPIResponse(200)
+            elif call in self._handlers:
+                try:
+                    response = await self._handlers[call](*request.get("args", []),
+                                                          **request.get("kwargs", {}))
+                except TypeError as e:
+                    response = createAPIResponse(400, None, f"Bad arguments for {call}: {e}")
+                except Exception as e:
+                    response = createAPIResponse(500, None, str(e))
+            else:
+                response = createAPIResponse(404, None, f"Unknown call: {call}")
+        if not isinstance(response, bytes):
+            response = json.dumps(response).encode()
+        # Cached responses are already encoded; splice them in as they are
+        writer.write(b'{"id": ' + json.dumps(request_id).encode() + b', "response": '
+                     + response + b'}\n')
+        await writer.drain()
+
+    async def _handle_client(self, reader, writer):
+        tasks = set()
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    break  # Line longer than LINE_LIMIT
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                except ValueError:
+                    continue
+                task = asyncio.ensure_future(self._answer(request, writer))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+        except ConnectionError:
+            pass
+        finally:
+            self._subscribers.discard(writer)
+            writer.close()
+
+    def _remove_socket(self):
+        try:
+            self.socket_path.unlink()
+        except FileNotFoundError:
+            pass
+
+    def _claim_socket(self):
+        """Remove a stale socket file, refusing if a daemon still listens on it."""
+        if not self.socket_path.exists():
+            return
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(str(self.socket_path))
+        except (ConnectionRefusedError, FileNotFoundError):
+            self._remove_socket()
+        else:
+            raise Exception(f"A vodka daemon is already listening on {self.socket_path}")
+        finally:
+            probe.close()
+
+    async def serve(self, ready=None):
+        """Serve until cancelled. ready, if given, is called once listening."""
+        self._loop = asyncio.get_running_loop()
+        self.socket_path.parent.mkdir(parents=True, exist_ok=True)
+        self._claim_socket()
+        server = await asyncio.start_unix_server(self._handle_client, path=str(self.socket_path),
+                                                 limit=LINE_LIMIT)
+        os.chmod(self.socket_path, 0o600)
+        try:
+            async with server:
+                if ready is not None:
+                    ready()
+                await server.serve_forever()
+        finally:
+            self._remove_socket()
+
+    def run(self):
+        """Serve in the foreground until interrupted."""
+        try:
+            asyncio.run(self.serve())
+        except KeyboardInterrupt:
+            pass
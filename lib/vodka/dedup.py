@@ -0,0 +1,154 @@
+import errno
+import fcntl
+import os
+import stat
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from . import trace
+from .integrity import file_sha256
+
+# ioctl(FICLONE) shares a file's extents with another file (btrfs, xfs, ...)
+FICLONE = 0x40049409
+
+# errno values meaning "this filesystem can't do that", not a real failure
+UNSUPPORTED_ERRNOS = {errno.EXDEV, errno.EPERM, errno.EINVAL, errno.ENOTTY,
+                      errno.EOPNOTSUPP, errno.EMLINK}
+
+
+def reflink(src, dst):
+    """Create dst, which must not exist yet, as a copy-on-write clone of src."""
+    with open(src, 'rb') as src_file, open(dst, 'xb') as dst_file:
+        try:
+            fcntl.ioctl(dst_file.fileno(), FICLONE, src_file.fileno())
+        except OSError:
+            os.unlink(dst)
+            raise
+
+
+class DedupStore:
+    """Content-addressed store shared by installed Wine versions.
+
+    Every regular file of a version tree is hashed. The first copy of some
+    content is linked into objects/, and later identical files are replaced
+    by a link to that object. With mode "hardlink" the files share one
+    inode. With "reflink" they stay separate files that share extents on
+    filesystems with copy-on-write support. "auto" tries reflinks and falls
+    back to hardlinks.
+
+    Hardlinked files also share permissions, so the executable bit is part
+    of the object name.
+    """
+
+    def __init__(self, store_dir, mode="auto", workers=None):
+        if mode not in ("auto", "hardlink", "reflink"):
+            raise ValueError(f"Unknown dedup mode: {mode}")
+        self.store_dir = Path(store_dir)
+        self.objects_dir = self.store_dir / "objects"
+        self.mode = mode
+        self.workers = workers or os.cpu_count() or 1
+        self._reflink_works = mode != "hardlink"
+
+    def _object_path(self, digest, mode):
+        suffix = "x" if mode & stat.S_IXUSR else ""
+        return self.objects_dir / digest[:2] / f"{digest}{suffix}"
+
+    @staticmethod
+    def _tmp_path(path):
+        return path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.dedup")
+
+    def _link(self, src, dst):
+        """Create dst sharing src's data, by reflink or hardlink depending on mode.
+
+        dst appears complete or not at all: a reflink is made under a
+        temporary name and hardlinked into place. Raises FileExistsError if
+        dst already exists, which is never opened for writing.
+        """
+        if self._reflink_works:
+            tmp_path = self._tmp_path(dst)
+            try:
+                reflink(src, tmp_path)
+                os.chmod(tmp_path, stat.S_IMODE(os.stat(src).st_mode))
+                os.link(tmp_path, dst)
+                return
+            except OSError as e:
+                if e.errno not in UNSUPPORTED_ERRNOS or self.mode == "reflink":
+                    raise
+                self._reflink_works = False
+            finally:
+                try:
+                    os.unlink(tmp_path)
+                except FileNotFoundError:
+                    pass
+        os.link(src, dst)
+
+    def add_file(self, path):
+        """Deduplicate one file against the store, returning the bytes saved."""
+        path = Path(path)
+        st = os.lstat(path)
+        if not stat.S_ISREG(st.st_mode) or st.st_size == 0:
+            return 0
+
+        obj = self._object_path(file_sha256(path), st.st_mode)
+        try:
+            obj_st = os.stat(obj)
+        except FileNotFoundError:
+            obj.parent.mkdir(parents=True, exist_ok=True)
+            try:
+                self._link(path, obj)
+                return 0
+            except FileExistsError:
+                obj_st = os.stat(obj)  # Added concurrently by another file
+
+        if (obj_st.st_dev, obj_st.st_ino) == (st.st_dev, st.st_ino):
+            return 0  # Already linked
+
+        tmp_path = self._tmp_path(path)
+        self._link(obj, tmp_path)
+        os.replace(tmp_path, path)
+        return st.st_size
+
+    def dedup_tree(self, root):
+        """Deduplicate every regular file below root.
+
+        Files are hashed on a thread pool. Returns {"files": n,
+        "bytes_saved": n}. Reflinked files can't be told apart from plain
+        copies, so running this again over a reflinked tree counts its
+        files as saved again.
+        """
+        paths = []
+        for dirpath, _, filenames in os.walk(root):
+            paths.extend(os.path.join(dirpath, name) for name in filenames)
+
+        def add(path):
+            try:
+                return self.add_file(path)
+            except OSError as e:
+                if e.errno in UNSUPPORTED_ERRNOS:
+                    return 0  # e.g. store on another filesystem
+                raise
+
+        with trace.span("dedup", root=str(root), files=len(paths)) as span, \
+                ThreadPoolExecutor(max_workers=self.workers) as pool:
+            saved = sum(pool.map(add, paths))
+            span.set(bytes_saved=saved)
+        return {"files": len(paths), "bytes_saved": saved}
+
+    def prune(self):
+        """Remove objects no installed version links to, returning bytes freed.
+
+        Reflinked objects always have a link count of one and are removed
+        too, which is harmless: the versions keep their own extents.
+        """
+        freed = 0
+        if not self.objects_dir.exists():
+            return freed
+        for dirpath, _, filenames in os.walk(self.objects_dir):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                st = os.stat(path)
+                if st.st_nlink == 1:
+                    os.unlink(path)
+                    freed += st.st_size
+        return freed
@@ -0,0 +1,205 @@
+"""Delta patches between revisions of a catalog file.
+
+Catalogs carry a top-level "revision" number that is bumped on every
+change. Next to the catalog the server keeps a static directory of deltas,
+one per older revision, each leading straight to the current one:
+
+    data/wine.json
+    data/deltas/wine/41.json       41 -> current
+    data/deltas/wine/42.json       42 -> current (the current revision: empty)
+    data/deltas/wine/snapshots/    full copies used to regenerate deltas
+
+A delta looks like
+
+    {"format": 1, "from": 41, "to": 42,
+     "set": {"revision": 42}, "unset": [],
+     "versions": {"ge-proton": {"edits": [["insert", ["GE-Proton9-21"]],
+                                          ["keep", 53]],
+                                "entries": [{"name": "GE-Proton9-21", ...}]}},
+     "sha256": "..."}
+
+"set"/"unset" replace top-level keys other than "versions". Each changed
+category lists the edits that turn its old list of entry names into the new
+one and the entries that are new or changed; a category mapped to null was
+removed. sha256 is the digest of the resulting catalog, so a client whose
+copy differs in any way notices and downloads the full file instead.
+
+Run "python -m vodka.delta data/wine.json data/deltas" after bumping the
+revision to publish the deltas for a new catalog.
+"""
+import difflib
+import hashlib
+import json
+import sys
+from pathlib import Path
+
+from .util import atomic_write
+
+DELTA_FORMAT = 1
+
+# Number of older revisions that get a delta; clients further behind
+# download the full catalog
+KEEP_REVISIONS = 50
+
+
+class DeltaError(Exception):
+    """A delta doesn't apply to the catalog at hand."""
+
+
+def catalog_digest(data):
+    """Return the sha256 of a catalog's canonical JSON encoding."""
+    encoded = json.dumps(data, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+def delta_url(url, revision):
+    """Return the URL of the delta from revision for the catalog at url."""
+    base, name = url.rsplit("/", 1)
+    return f"{base}/deltas/{name.rsplit('.', 1)[0]}/{revision}.json"
+
+
+def _name_edits(old_names, new_names):
+    edits = []
+    matcher = difflib.SequenceMatcher(None, old_names, new_names, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            edits.append(["keep", i2 - i1])
+            continue
+        if i2 > i1:
+            edits.append(["delete", i2 - i1])
+        if j2 > j1:
+            edits.append(["insert", new_names[j1:j2]])
+    return edits
+
+
+def make_delta(old, new):
+    """Return the delta that turns catalog old into catalog new."""
+    old_versions = old["versions"]
+    versions = {}
+    for category, entries in new["versions"].items():
+        old_entries = old_versions.get(category, [])
+        old_by_name = {entry["name"]: entry for entry in old_entries}
+        changed = [entry for entry in entries if old_by_name.get(entry["name"]) != entry]
+        old_names = [entry["name"] for entry in old_entries]
+        new_names = [entry["name"] for entry in entries]
+        if changed or old_names != new_names:
+            versions[category] = {"edits": _name_edits(old_names, new_names),
+                                  "entries": changed}
+    for category in old_versions:
+        if category not in new["versions"]:
+            versions[category] = None
+
+    return {
+        "format": DELTA_FORMAT,
+        "from": old.get("revision"),
+        "to": new.get("revision"),
+        "set": {key: value for key, value in new.items()
+                if key != "versions" and old.get(key) != value},
+        "unset": [key for key in old if key not in new],
+        "versions": versions,
+        "sha256": catalog_digest(new),
+    }
+
+
+def _apply_edits(old_entries, edits, changed):
+    entries = []
+    position = 0
+    for op, arg in edits:
+        if op == "keep":
+            if position + arg > len(old_entries):
+                raise DeltaError("Delta keeps more entries than the catalog has")
+            for entry in old_entries[position:position + arg]:
+                entries.append(changed.get(entry["name"], entry))
+            position += arg
+        elif op == "delete":
+            position += arg
+        elif op == "insert":
+            for name in arg:
+                if name not in changed:
+                    raise DeltaError(f"Delta inserts {name} without its entry")
+                entries.append(changed[name])
+        else:
+            raise DeltaError(f"Unknown delta operation: {op}")
+    if position != len(old_entries):
+        raise DeltaError("Delta doesn't cover the whole category")
+    return entries
+
+
+def apply_delta(data, delta):
+    """Return the catalog that results from applying delta to data.
+
+    Raises DeltaError if the delta is for another revision or the result
+    isn't the catalog the delta was made for.
+    """
+    if delta.get("format") != DELTA_FORMAT:
+        raise DeltaError(f"Unsupported delta format: {delta.get('format')}")
+    if delta["from"] != data.get("revision"):
+        raise DeltaError(f"Delta is for revision {delta['from']}, "
+                         f"not {data.get('revision')}")
+
+    result = {key: value for key, value in data.items() if key not in delta["unset"]}
+    result.update(delta["set"])
+    versions = dict(data["versions"])
+    for category, change in delta["versions"].items():
+        if change is None:
+            versions.pop(category, None)
+            continue
+        changed = {entry["name"]: entry for entry in change["entries"]}
+        versions[category] = _apply_edits(versions.get(category, []), change["edits"], changed)
+    result["versions"] = versions
+
+    if catalog_digest(result) != delta["sha256"]:
+        raise DeltaError("Patched catalog doesn't match the published revision")
+    return result
+
+
+def _write_json(path, data):
+    atomic_write(path, json.dumps(data, separators=(",", ":")).encode())
+
+
+def publish_deltas(catalog_path, deltas_dir, keep=KEEP_REVISIONS):
+    """Write the deltas from the last keep revisions to the current catalog.
+
+    Stores a snapshot of the current revision, regenerates every delta and
+    removes deltas and snapshots that fell out of the window. Returns the
+    revisions that now have a delta.
+    """
+    catalog_path = Path(catalog_path)
+    with open(catalog_path) as f:
+        catalog = json.load(f)
+    revision = catalog.get("revision")
+    if not isinstance(revision, int):
+        raise Exception(f"{catalog_path} has no integer \"revision\"")
+
+    out_dir = Path(deltas_dir) / catalog_path.stem
+    snapshots_dir = out_dir / "snapshots"
+    snapshots_dir.mkdir(parents=True, exist_ok=True)
+    snapshot_path = snapshots_dir / f"{revision}.json"
+    if snapshot_path.exists():
+        with open(snapshot_path) as f:
+            if json.load(f) != catalog:
+                raise Exception(f"{catalog_path} changed but is still revision {revision}")
+    else:
+        _write_json(snapshot_path, catalog)
+
+    revisions = sorted(int(path.stem) for path in snapshots_dir.glob("*.json")
+                       if path.stem.isdigit() and int(path.stem) <= revision)
+    published = revisions[-keep:]
+    for old_revision in published:
+        with open(snapshots_dir / f"{old_revision}.json") as f:
+            _write_json(out_dir / f"{old_revision}.json", make_delta(json.load(f), catalog))
+    for old_revision in revisions[:-keep]:
+        try:
+            (out_dir / f"{old_revision}.json").unlink()
+        except FileNotFoundError:
+            pass
+        (snapshots_dir / f"{old_revision}.json").unlink()
+    return published
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("Usage: python -m vodka.delta <catalog.json> <deltas directory>")
+        sys.exit(1)
+    revisions = publish_deltas(sys.argv[1], sys.argv[2])
+    print(f"Published deltas from {len(revisions)} revision(s) of {sys.argv[1]}")
@@ -0,0 +1,353 @@
+import hashlib
+import json
+import os
+import threading
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from . import trace
+from .integrity import check_artifact, file_sha256, normalize_sha256
+from .util import file_lock
+
+# Size of one HTTP Range request when downloading in parallel
+CHUNK_SIZE = 8 * 1024 * 1024
+# Block size used for socket reads and file copies
+COPY_BUFSIZE = 1024 * 1024
+
+
+def _atomic_write_json(path, data):
+    """Write JSON to path through a temporary file and a rename."""
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+class _OrderedHasher:
+    """Hashes the chunks of a file in order while they download out of order.
+
+    Whenever the chunks finished so far extend the hashed run from the start
+    of the file, the new ones are read back while still in the page cache,
+    so the digest is ready shortly after the last chunk arrives rather than
+    after another pass over the whole file. One thread hashes at a time; the
+    others only record their chunk and return to downloading.
+    """
+
+    def __init__(self, fd, size, chunk_size, done):
+        self.fd = fd
+        self.size = size
+        self.chunk_size = chunk_size
+        self.digest = hashlib.sha256()
+        self.position = 0
+        self.done = set(done)
+        self.hashing = False
+        self.lock = threading.Lock()
+
+    def chunk_done(self, offset=None):
+        with self.lock:
+            if offset is not None:
+                self.done.add(offset)
+            if self.hashing:
+                return  # The hashing thread will pick this chunk up
+            self.hashing = True
+        try:
+            while True:
+                with self.lock:
+                    if self.position >= self.size or self.position not in self.done:
+                        self.hashing = False
+                        return
+                    position = self.position
+                end = min(position + self.chunk_size, self.size)
+                while position < end:
+                    block = os.pread(self.fd, min(COPY_BUFSIZE, end - position), position)
+                    if not block:
+                        raise Exception("Chunk shorter than recorded")
+                    self.digest.update(block)
+                    position += len(block)
+                with self.lock:
+                    self.position = end
+        except BaseException:
+            with self.lock:
+                self.hashing = False
+            raise
+
+    def hexdigest(self):
+        if self.position != self.size:
+            raise Exception("Not every chunk was hashed")
+        return self.digest.hexdigest()
+
+
+class Downloader:
+    """Download artifacts into a content-addressed cache.
+
+    Layout of downloads_dir:
+        objects/<sha256>   finished artifacts, named by their content hash
+        partial/<key>.part in-progress download of one URI
+        partial/<key>.json which chunks of the .part file are complete
+        partial/<key>.lock held by the thread or process downloading the URI
+        index.json         maps each URI to the sha256 and size it produced
+
+    Large artifacts on servers that support Range requests are split into
+    chunks fetched over several connections, and an interrupted download
+    resumes from the chunks already on disk. Artifacts are hashed as they
+    download, and checked against the sha256 and size the catalog lists
+    for them, if any. A second process or thread asking for a URI that is
+    already downloading waits for the first and reuses its result.
+    """
+
+    def __init__(self, downloads_dir, connections=4, chunk_size=CHUNK_SIZE):
+        self.downloads_dir = Path(downloads_dir)
+        self.objects_dir = self.downloads_dir / "objects"
+        self.partial_dir = self.downloads_dir / "partial"
+        self.index_file = self.downloads_dir / "index.json"
+        self.index_lock = self.downloads_dir / "index.lock"
+        self.connections = max(1, connections)
+        self.chunk_size = chunk_size
+
+    def _load_index(self):
+        try:
+            with open(self.index_file) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _update_index(self, uri, entry):
+        with file_lock(self.index_lock):
+            index = self._load_index()
+            if entry is None:
+                index.pop(uri, None)
+            else:
+                index[uri] = entry
+            _atomic_write_json(self.index_file, index)
+
+    def cached_path(self, uri, sha256=None, size=None):
+        """Return the cached artifact for uri, or None if it is not cached.
+
+        With an expected sha256 (lower-case hex) or size, an artifact that
+        doesn't match them doesn't count, and an artifact with that sha256
+        downloaded from another URI does.
+        """
+        if sha256 is not None:
+            sha256 = normalize_sha256(uri, sha256)
+        entry = self._load_index().get(uri)
+        if sha256 is not None and (entry is None or entry["sha256"] != sha256):
+            entry = None
+            try:
+                found = (self.objects_dir / sha256).stat().st_size
+            except FileNotFoundError:
+                return None
+            if size is None or found == size:
+                self._update_index(uri, {"sha256": sha256, "size": found})
+                return self.objects_dir / sha256
+        if entry is None or (size is not None and entry["size"] != size):
+            return None
+        path = self.objects_dir / entry["sha256"]
+        try:
+            if path.stat().st_size == entry["size"]:
+                return path
+        except FileNotFoundError:
+            pass
+        return None
+
+    def evict(self, uri):
+        """Drop the cached artifact for uri, e.g. after it failed to extract."""
+        entry = self._load_index().get(uri)
+        if entry is None:
+            return
+        self._update_index(uri, None)
+        # Another URI may have produced the same content
+        if not any(e["sha256"] == entry["sha256"] for e in self._load_index().values()):
+            try:
+                (self.objects_dir / entry["sha256"]).unlink()
+            except FileNotFoundError:
+                pass
+
+    def artifacts(self):
+        """Return {sha256: {"size", "uris"}} for every cached artifact."""
+        artifacts = {}
+        for uri, entry in self._load_index().items():
+            try:
+                size = (self.objects_dir / entry["sha256"]).stat().st_size
+            except FileNotFoundError:
+                continue
+            artifact = artifacts.setdefault(entry["sha256"], {"size": size, "uris": []})
+            artifact["uris"].append(uri)
+        return artifacts
+
+    def remove(self, sha256):
+        """Delete a cached artifact and every index entry that points at it."""
+        with file_lock(self.index_lock):
+            index = self._load_index()
+            index = {uri: entry for uri, entry in index.items() if entry["sha256"] != sha256}
+            _atomic_write_json(self.index_file, index)
+        try:
+            (self.objects_dir / sha256).unlink()
+        except FileNotFoundError:
+            pass
+
+    def fetch(self, uri, sha256=None, size=None):
+        """Return a local path to the artifact at uri, downloading it if needed.
+
+        If sha256 or size are given, a download that doesn't match them is
+        discarded and raises ChecksumError.
+        """
+        if sha256 is not None:
+            sha256 = normalize_sha256(uri, sha256)
+        cached = self.cached_path(uri, sha256, size)
+        if cached is not None:
+            trace.count("download.cache_hits")
+            return cached
+
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+        self.partial_dir.mkdir(parents=True, exist_ok=True)
+
+        key = hashlib.sha256(uri.encode()).hexdigest()
+        with file_lock(self.partial_dir / f"{key}.lock",
+                       on_wait=lambda: trace.count("download.waits")):
+            # Whoever held the lock may have just downloaded it
+            cached = self.cached_path(uri, sha256, size)
+            if cached is not None:
+                trace.count("download.cache_hits")
+                return cached
+            return self._download(uri, key, sha256, size)
+
+    def _download(self, uri, key, expected_sha256, expected_size):
+        """Download uri into objects/, holding the lock for its key."""
+        part_path = self.partial_dir / f"{key}.part"
+        state_path = self.partial_dir / f"{key}.json"
+
+        with trace.span("download", uri=uri) as span:
+            url, size, ranges, validator = self._probe(uri)
+            if size is not None:
+                # Don't download what can't be right
+                check_artifact(uri, None, size, None, expected_size)
+            state = self._load_state(state_path, uri, size, validator)
+
+            chunked = ranges and size is not None and size > self.chunk_size
+            if chunked:
+                sha256 = self._fetch_chunked(url, part_path, state_path, state, size)
+            else:
+                sha256 = self._fetch_single(url, part_path, state_path, state, ranges)
+            size = part_path.stat().st_size
+            span.set(bytes=size, chunked=chunked)
+        trace.count("download.bytes", size)
+
+        try:
+            check_artifact(uri, sha256, size, expected_sha256, expected_size)
+        except Exception:
+            # Resuming a corrupt download would only reproduce it
+            part_path.unlink()
+            state_path.unlink()
+            raise
+        os.replace(part_path, self.objects_dir / sha256)
+        self._update_index(uri, {"sha256": sha256, "size": size})
+        state_path.unlink()
+        return self.objects_dir / sha256
+
+    def _probe(self, uri):
+        """Resolve redirects and find out whether the server supports ranges."""
+        request = urllib.request.Request(uri, method="HEAD")
+        try:
+            with urllib.request.urlopen(request) as response:
+                length = response.headers.get("Content-Length")
+                ranges = response.headers.get("Accept-Ranges", "").lower() == "bytes"
+                validator = response.headers.get("ETag") or response.headers.get("Last-Modified")
+                return response.geturl(), int(length) if length else None, ranges, validator
+        except urllib.error.HTTPError as e:
+            if e.code not in (403, 405, 501):
+                raise
+            # Server refuses HEAD; fall back to a plain single-connection GET
+            return uri, None, False, None
+
+    def _load_state(self, state_path, uri, size, validator):
+        """Load resume state, discarding it if the remote file has changed."""
+        try:
+            with open(state_path) as f:
+                state = json.load(f)
+            if (state["uri"], state["size"], state["validator"], state["chunk_size"]) == \
+                    (uri, size, validator, self.chunk_size):
+                return state
+        except (FileNotFoundError, ValueError, KeyError):
+            pass
+        state = {"uri": uri, "size": size, "validator": validator,
+                 "chunk_size": self.chunk_size, "done": []}
+        part_path = state_path.with_suffix(".part")
+        if part_path.exists():
+            part_path.unlink()
+        _atomic_write_json(state_path, state)
+        return state
+
+    def _fetch_chunked(self, url, part_path, state_path, state, size):
+        """Download the missing chunks of part_path in parallel.
+
+        Returns the hex sha256 of the whole file.
+        """
+        with open(part_path, 'ab') as f:
+            f.truncate(size)
+
+        done = set(state["done"])
+        pending = [offset for offset in range(0, size, self.chunk_size)
+                   if offset not in done]
+        state_lock = threading.Lock()
+        fd = os.open(part_path, os.O_RDWR)
+        hasher = _OrderedHasher(fd, size, self.chunk_size, done)
+        try:
+            def fetch_chunk(offset):
+                end = min(offset + self.chunk_size, size) - 1
+                request = urllib.request.Request(
+                    url, headers={"Range": f"bytes={offset}-{end}"})
+                with trace.span("download.chunk", offset=offset, bytes=end + 1 - offset), \
+                        urllib.request.urlopen(request) as response:
+                    if response.status != 206:
+                        raise Exception(f"Server ignored range request for {url}")
+                    position = offset
+                    for block in iter(lambda: response.read(COPY_BUFSIZE), b""):
+                        os.pwrite(fd, block, position)
+                        position += len(block)
+                if position != end + 1:
+                    raise Exception(f"Short read for bytes {offset}-{end} of {url}")
+                with state_lock:
+                    state["done"].append(offset)
+                    _atomic_write_json(state_path, state)
+                hasher.chunk_done(offset)
+
+            # Chunks kept from an interrupted download
+            hasher.chunk_done()
+            with ThreadPoolExecutor(max_workers=self.connections) as pool:
+                # list() re-raises the first failed chunk; finished chunks
+                # stay recorded in the state file for the next attempt
+                list(pool.map(fetch_chunk, pending))
+            with trace.span("download.hash"):
+                hasher.chunk_done()
+            return hasher.hexdigest()
+        finally:
+            os.close(fd)
+
+    def _fetch_single(self, url, part_path, state_path, state, ranges):
+        """Download over one connection, resuming from the end of part_path.
+
+        Returns the hex sha256 of the whole file.
+        """
+        offset = part_path.stat().st_size if ranges and part_path.exists() else 0
+        if offset and offset == state["size"]:
+            # Finished before the previous run could move it into place
+            return file_sha256(part_path)
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+        request = urllib.request.Request(url, headers=headers)
+        with urllib.request.urlopen(request) as response:
+            resumed = offset and response.status == 206
+            digest = hashlib.sha256()
+            if resumed:
+                # The part kept from the interrupted download
+                with open(part_path, 'rb') as f:
+                    for block in iter(lambda: f.read(COPY_BUFSIZE), b""):
+                        digest.update(block)
+            with open(part_path, 'ab' if resumed else 'wb') as f:
+                for block in iter(lambda: response.read(COPY_BUFSIZE), b""):
+                    f.write(block)
+                    digest.update(block)
+        if state["size"] is not None and part_path.stat().st_size != state["size"]:
+            raise Exception(f"Incomplete download of {url}")
+        return digest.hexdigest()
@@ -0,0 +1,129 @@
+import asyncio
+import inspect
+import time
+
+from . import trace
+
+READ_SIZE = 64 * 1024
+# Longest line a command may print before it is cut into several lines
+LINE_LIMIT = 1024 * 1024
+
+
+async def _call(callback, *args):
+    """Call a plain or async callback."""
+    result = callback(*args)
+    if inspect.isawaitable(result):
+        await result
+
+
+async def _pump(reader, name, queue):
+    """Put every line read from reader on queue, then a None marker."""
+    try:
+        pending = b''
+        while True:
+            chunk = await reader.read(READ_SIZE)
+            if not chunk:
+                break
+            lines = (pending + chunk).split(b'\n')
+            pending = lines.pop()
+            if len(pending) >= LINE_LIMIT:
+                # Hand over very long lines in pieces instead of buffering them
+                lines.append(pending)
+                pending = b''
+            for line in lines:
+                await queue.put((name, line.decode('utf-8', 'replace').rstrip('\r')))
+        if pending:
+            await queue.put((name, pending.decode('utf-8', 'replace').rstrip('\r')))
+    finally:
+        await queue.put(None)
+
+
+class AsyncExecutor:
+    """Runs Wine commands as asyncio subprocesses and streams their output.
+
+    At most max_concurrent commands run at once; the others wait for a
+    slot. With a WineServerPool, commands attach to a persistent
+    wineserver for the prefix. An executor belongs to the event loop it
+    is first used in.
+    """
+
+    def __init__(self, command_list, env, max_concurrent=4, pool=None, wineserver=None):
+        self.command_list = command_list
+        self.env = env
+        self.max_concurrent = max_concurrent
+        self.pool = pool
+        self.wineserver = wineserver
+        self._semaphore = None
+
+    async def stream(self, command):
+        """Run command, yielding ("stdout" | "stderr", line) as lines arrive.
+
+        The last item is ("exit", returncode). Closing the generator early
+        kills the process.
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        async with self._semaphore:
+            if self.pool is not None:
+                await asyncio.get_running_loop().run_in_executor(
+                    None, self.pool.ensure, self.wineserver, self.env)
+            trace.count("process.launches")
+            process = await asyncio.create_subprocess_exec(
+                *self.command_list(command), env=self.env,
+                stdin=asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+            queue = asyncio.Queue()
+            pumps = [asyncio.ensure_future(_pump(process.stdout, "stdout", queue)),
+                     asyncio.ensure_future(_pump(process.stderr, "stderr", queue))]
+            open_streams = len(pumps)
+            try:
+                while open_streams:
+                    item = await queue.get()
+                    if item is None:
+                        open_streams -= 1
+                    else:
+                        yield item
+                yield "exit", await process.wait()
+            finally:
+                if process.returncode is None:
+                    process.kill()
+                    await process.wait()
+                for pump in pumps:
+                    pump.cancel()
+                await asyncio.gather(*pumps, return_exceptions=True)
+
+    async def run(self, command, on_stdout=None, on_stderr=None):
+        """Run command, passing each output line to the callbacks.
+
+        Callbacks may be plain functions or coroutines. Returns the exit code.
+        """
+        returncode = None
+        async for name, value in self.stream(command):
+            if name == "exit":
+                returncode = value
+            elif name == "stdout" and on_stdout is not None:
+                await _call(on_stdout, value)
+            elif name == "stderr" and on_stderr is not None:
+                await _call(on_stderr, value)
+        return returncode
+
+    async def run_many(self, commands, on_output=None):
+        """Run commands concurrently, at most max_concurrent at a time.
+
+        on_output(index, stream, line) receives every line, tagged with the
+        position of its command. Returns a list of {"command",
+        "returncode", "seconds"} in the order of commands.
+        """
+        async def run_one(index, command):
+            start = time.perf_counter()
+            returncode = None
+            async for name, value in self.stream(command):
+                if name == "exit":
+                    returncode = value
+                elif on_output is not None:
+                    await _call(on_output, index, name, value)
+            return {"command": command, "returncode": returncode,
+                    "seconds": time.perf_counter() - start}
+
+        return await asyncio.gather(*(run_one(i, command)
+                                      for i, command in enumerate(commands)))
@@ -0,0 +1,366 @@
+import bz2
+import gzip
+import hashlib
+import io
+import lzma
+import os
+import shutil
+import subprocess
+import tarfile
+import threading
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from . import trace
+from .integrity import HashingReader, check_artifact
+
+# Read size used when pulling bytes off the network into the decompressor.
+# tarfile's stream buffer re-slices its pending data on every read, so larger
+# values make extraction slower rather than faster.
+STREAM_BUFSIZE = 64 * 1024
+
+# Files up to this size are read into memory and written by the worker pool;
+# larger ones are copied straight from the archive by the reading thread
+POOLED_FILE_MAX = 8 * 1024 * 1024
+# Upper bound on file data read from the archive but not yet written
+PENDING_BYTES_MAX = 64 * 1024 * 1024
+
+# Magic bytes of the compression formats used by Wine and component builds,
+# with external tools that decompress faster than the Python modules (xz
+# decompresses multi-block archives on all cores) and the module fallback
+_DECOMPRESSORS = (
+    (b"\x1f\x8b", (("pigz", "-dc"), ("gzip", "-dc")), lambda f: gzip.GzipFile(fileobj=f)),
+    (b"\xfd7zXZ\x00", (("xz", "-dc", "-T0"),), lzma.LZMAFile),
+    (b"BZh", (("lbzip2", "-dc"), ("pbzip2", "-dc")), bz2.BZ2File),
+)
+
+
+class UnsafeArchiveError(Exception):
+    """An archive member would be written outside the destination."""
+
+
+def _decompressor(head, external=True):
+    """Return (command or None, module fallback) for the magic bytes in head."""
+    for magic, commands, fallback in _DECOMPRESSORS:
+        if head.startswith(magic):
+            if external:
+                for command in commands:
+                    if shutil.which(command[0]):
+                        return list(command), fallback
+            return None, fallback
+    return None, None
+
+
+class _ExternalDecompressor:
+    """Pipes a compressed stream through an external tool such as xz -T0.
+
+    source is either a file on disk, handed to the tool as its stdin, or any
+    readable stream, which a thread copies into the tool.
+    """
+
+    def __init__(self, command, source):
+        stdin = subprocess.PIPE
+        if source.seekable():
+            # The descriptor is past what was buffered for peek(); rewind it.
+            # source itself isn't read from again.
+            os.lseek(source.fileno(), source.tell(), os.SEEK_SET)
+            stdin = source
+        self.process = subprocess.Popen(command, stdin=stdin, stdout=subprocess.PIPE,
+                                        stderr=subprocess.PIPE)
+        self.stdout = self.process.stdout
+        self._feed_error = None
+        self._feeder = None
+        if stdin is subprocess.PIPE:
+            self._feeder = threading.Thread(target=self._feed, args=(source,), daemon=True)
+            self._feeder.start()
+
+    def _feed(self, source):
+        try:
+            with self.process.stdin as pipe:
+                for block in iter(lambda: source.read(STREAM_BUFSIZE), b""):
+                    pipe.write(block)
+        except BrokenPipeError:
+            pass  # The tool exited early; wait() reports why
+        except Exception as e:
+            self._feed_error = e
+
+    def read(self, size=-1):
+        return self.stdout.read(size)
+
+    def close(self):
+        """Wait for the tool, raising if it or the feeding thread failed."""
+        # Drain the output so a truncated stream is reported by the tool
+        while self.stdout.read(STREAM_BUFSIZE):
+            pass
+        self.stdout.close()
+        stderr = self.process.stderr.read().decode(errors="replace").strip()
+        self.process.stderr.close()
+        returncode = self.process.wait()
+        if self._feeder is not None:
+            self._feeder.join()
+        if self._feed_error is not None:
+            raise self._feed_error
+        if returncode != 0:
+            raise Exception(f"{self.process.args[0]} failed: {stderr or returncode}")
+
+    def kill(self):
+        if self.process.poll() is None:
+            self.process.kill()
+        self.process.wait()
+        for pipe in (self.process.stdout, self.process.stderr):
+            pipe.close()
+
+
+def _safe_mode(mode):
+    """Drop setuid/setgid/sticky and group/other write bits, like tarfile's data filter."""
+    return mode & 0o755
+
+
+class _TarWriter:
+    """Writes the members of a tar stream below dest_dir on a thread pool.
+
+    The archive is read sequentially by the calling thread. Small regular
+    files are handed to the pool with their data; directories are created
+    up front and links once every file is in place, so an archive can't
+    plant a symlink and then write through it. Every member path, link
+    target and parent directory is checked to stay inside dest_dir.
+
+    If digests is a dict, the sha256 of every regular file is stored in it
+    by path, hashed from the data as it is written.
+    """
+
+    def __init__(self, dest_dir, workers, digests=None):
+        self.dest = os.path.realpath(dest_dir)
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        self.futures = []
+        self.links = []
+        self.dirs = []
+        self.known_dirs = {self.dest}
+        self.pending_bytes = 0
+        self.pending = threading.Condition()
+        self.files = 0
+        self.bytes = 0
+        self.digests = digests
+
+    def _inside(self, path):
+        return path == self.dest or path.startswith(self.dest + os.sep)
+
+    def _target(self, name):
+        """Return the absolute path for a member name, refusing escapes."""
+        path = os.path.normpath(os.path.join(self.dest, name))
+        if os.path.isabs(name) or not self._inside(path) or path == self.dest:
+            raise UnsafeArchiveError(f"Refusing to extract {name!r} outside {self.dest}")
+        return path
+
+    def _ensure_dir(self, path):
+        if path in self.known_dirs:
+            return
+        os.makedirs(path, exist_ok=True)
+        # A directory reached through a symlink that existed beforehand
+        if not self._inside(os.path.realpath(path)):
+            raise UnsafeArchiveError(f"Refusing to extract into {path}: it leads outside "
+                                     f"{self.dest}")
+        self.known_dirs.add(path)
+
+    def _write(self, path, data, mode, mtime):
+        try:
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_NOFOLLOW, 0o600)
+            with open(fd, 'wb') as f:
+                f.write(data)
+            if self.digests is not None:
+                # hashlib releases the GIL, so workers hash in parallel
+                self.digests[path] = hashlib.sha256(data).hexdigest()
+            os.chmod(path, _safe_mode(mode))
+            os.utime(path, (mtime, mtime))
+        finally:
+            with self.pending:
+                self.pending_bytes -= len(data)
+                self.pending.notify_all()
+
+    def add(self, tar, member):
+        path = self._target(member.name)
+        if member.isdir():
+            self._ensure_dir(path)
+            self.dirs.append((path, member))
+            return
+        if member.issym() or member.islnk():
+            if member.issym():
+                if os.path.isabs(member.linkname):
+                    raise UnsafeArchiveError(
+                        f"Refusing absolute symlink {member.name} -> {member.linkname}")
+                target = os.path.join(os.path.dirname(path), member.linkname)
+            else:
+                target = os.path.join(self.dest, member.linkname)
+            if not self._inside(os.path.normpath(target)):
+                raise UnsafeArchiveError(
+                    f"Refusing link {member.name} -> {member.linkname} outside {self.dest}")
+            self.links.append((path, member))
+            return
+        if not member.isreg():
+            return  # Devices and fifos have no business in a Wine build
+
+        self._ensure_dir(os.path.dirname(path))
+        source = tar.extractfile(member)
+        self.files += 1
+        self.bytes += member.size
+        if member.size > POOLED_FILE_MAX:
+            with self.pending:
+                self.pending_bytes += member.size
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_NOFOLLOW, 0o600)
+            try:
+                with open(fd, 'wb') as f:
+                    if self.digests is None:
+                        shutil.copyfileobj(source, f, 1024 * 1024)
+                    else:
+                        digest = hashlib.sha256()
+                        for block in iter(lambda: source.read(1024 * 1024), b""):
+                            f.write(block)
+                            digest.update(block)
+                        self.digests[path] = digest.hexdigest()
+            finally:
+                with self.pending:
+                    self.pending_bytes -= member.size
+            os.chmod(path, _safe_mode(member.mode))
+            os.utime(path, (member.mtime, member.mtime))
+            return
+
+        data = source.read()
+        with self.pending:
+            while self.pending_bytes and self.pending_bytes + len(data) > PENDING_BYTES_MAX:
+                self.pending.wait()
+            self.pending_bytes += len(data)
+        self.futures.append(self.pool.submit(self._write, path, data, member.mode, member.mtime))
+
+    def finish(self):
+        """Wait for the pool, then create links and apply directory metadata."""
+        self.pool.shutdown(wait=True)
+        for future in self.futures:
+            future.result()
+
+        symlinks = []
+        for path, member in self.links:
+            self._ensure_dir(os.path.dirname(path))
+            if os.path.lexists(path):
+                os.unlink(path)
+            if member.issym():
+                os.symlink(member.linkname, path)
+                symlinks.append((path, member))
+                self._check_link(path, member, os.path.realpath(path))
+            else:
+                # Resolved through the symlinks already extracted, so a chain
+                # of them can't lead the hardlink to a file outside dest
+                target = os.path.realpath(os.path.join(self.dest, member.linkname))
+                self._check_link(path, member, target)
+                os.link(target, path, follow_symlinks=False)
+                if self.digests is not None:
+                    digest = self.digests.get(target)
+                    if digest is not None:
+                        self.digests[path] = digest
+
+        # A symlink extracted later can redirect one checked earlier
+        for path, member in symlinks:
+            self._check_link(path, member, os.path.realpath(path))
+
+        # Deepest first, so setting a parent's mtime isn't undone by its children
+        for path, member in reversed(self.dirs):
+            os.chmod(path, _safe_mode(member.mode) | 0o700)
+            os.utime(path, (member.mtime, member.mtime))
+
+    def _check_link(self, path, member, target):
+        """Refuse a link whose resolved target lies outside dest, removing it if created."""
+        if not self._inside(target):
+            if os.path.lexists(path):
+                os.unlink(path)
+            raise UnsafeArchiveError(
+                f"Refusing link {member.name} -> {member.linkname}: it leads outside {self.dest}")
+
+    def abort(self):
+        # shutdown(cancel_futures=True) needs Python 3.9
+        for future in self.futures:
+            future.cancel()
+        self.pool.shutdown(wait=True)
+
+
+def extract_tar(fileobj, dest_dir, workers=None, bufsize=STREAM_BUFSIZE, digests=None):
+    """Extract an uncompressed tar stream below dest_dir on a thread pool.
+
+    Returns {"files": n, "bytes": n}. Raises UnsafeArchiveError for members
+    or links that point outside dest_dir. digests, if a dict, receives the
+    sha256 of every extracted regular file, keyed by absolute path.
+    """
+    workers = workers or min(8, os.cpu_count() or 1)
+    writer = _TarWriter(dest_dir, workers, digests)
+    try:
+        with tarfile.open(fileobj=fileobj, mode="r|", bufsize=bufsize) as tar:
+            for member in tar:
+                writer.add(tar, member)
+            # The member list isn't needed; don't keep tens of thousands around
+            tar.members = []
+        writer.finish()
+    except BaseException:
+        writer.abort()
+        raise
+    return {"files": writer.files, "bytes": writer.bytes}
+
+
+def _extract_compressed(source, dest_dir, workers, digests=None):
+    """Sniff the compression of source and extract it with the fastest decompressor."""
+    source = source if hasattr(source, "peek") else io.BufferedReader(source, STREAM_BUFSIZE)
+    command, fallback = _decompressor(source.peek(6))
+    if command is not None:
+        data = _ExternalDecompressor(command, source)
+        try:
+            result = extract_tar(data, dest_dir, workers, digests=digests)
+        except BaseException:
+            data.kill()
+            raise
+        data.close()
+        return result
+
+    data = fallback(source) if fallback else source
+    with data:
+        result = extract_tar(data, dest_dir, workers, digests=digests)
+        # tarfile stops at the end-of-archive marker and treats a truncated
+        # header as the end of the archive, so drain the rest to let the
+        # decompressor verify that the stream really is complete.
+        while data.read(STREAM_BUFSIZE):
+            pass
+    return result
+
+
+def _trace_result(span, result):
+    if trace.enabled():
+        span.set(**result)
+        trace.count("extract.files", result["files"])
+        trace.count("extract.bytes", result["bytes"])
+
+
+def extract_archive(archive_path, dest_dir, workers=None, digests=None):
+    """Extract a tarball that is already on disk into dest_dir."""
+    with trace.span("extract", archive=str(archive_path)) as span, \
+            open(archive_path, 'rb') as f:
+        _trace_result(span, _extract_compressed(f, dest_dir, workers, digests))
+
+
+def extract_stream(fileobj, dest_dir, workers=None, digests=None):
+    """Extract a (possibly compressed) tar stream without seeking."""
+    with trace.span("extract.stream") as span:
+        _trace_result(span, _extract_compressed(fileobj, dest_dir, workers, digests))
+
+
+def stream_extract(uri, dest_dir, workers=None, digests=None, sha256=None, size=None):
+    """Download a tarball and extract it in a single pass.
+
+    The HTTP response is fed straight through the decompressor into
+    tarfile's stream mode, so the archive never touches the disk and
+    memory stays bounded. The archive is hashed as it arrives; if sha256
+    or size are given and don't match, ChecksumError is raised once the
+    stream ends and the caller must discard what was extracted.
+    """
+    with urllib.request.urlopen(uri) as response:
+        reader = HashingReader(response)
+        extract_stream(reader, dest_dir, workers, digests)
+        # Whatever the extractor left unread still counts
+        while reader.read(STREAM_BUFSIZE):
+            pass
+    check_artifact(uri, reader.hexdigest(), reader.bytes, sha256, size)
@@ -0,0 +1,67 @@
+"""Checksums of downloaded artifacts and files on disk.
+
+Catalog entries may carry the "sha256" and "size" of their archive. The
+digest is computed while the bytes arrive, by HashingReader for streamed
+installs and by the Downloader for cached ones, and checked with
+check_artifact().
+"""
+import hashlib
+import io
+import re
+
+_SHA256 = re.compile(r'[0-9a-f]{64}')
+
+# Read size for hashing files on disk
+HASH_BUFSIZE = 1024 * 1024
+
+
+def file_sha256(path):
+    """Return the hex sha256 digest of a file."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BUFSIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ChecksumError(Exception):
+    """A downloaded artifact doesn't match the sha256 or size in the catalog."""
+
+
+def normalize_sha256(uri, sha256):
+    """Return a catalog sha256 in lower case, raising ChecksumError if it is malformed."""
+    if not isinstance(sha256, str) or not _SHA256.fullmatch(sha256.lower()):
+        raise ChecksumError(f"Invalid sha256 for {uri} in the catalog: {sha256!r}")
+    return sha256.lower()
+
+
+def check_artifact(uri, sha256, size, expected_sha256=None, expected_size=None):
+    """Raise ChecksumError if sha256/size differ from the expected values given."""
+    if expected_size is not None and size != expected_size:
+        raise ChecksumError(f"Size mismatch for {uri}: expected {expected_size} bytes, "
+                            f"got {size}")
+    if expected_sha256 is not None and sha256 != expected_sha256.lower():
+        raise ChecksumError(f"Checksum mismatch for {uri}: expected sha256 "
+                            f"{expected_sha256}, got {sha256}")
+
+
+class HashingReader(io.RawIOBase):
+    """Passes a binary stream through, hashing every byte read from it."""
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.digest = hashlib.sha256()
+        self.bytes = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        n = self.raw.readinto(buffer)
+        if n:
+            self.digest.update(memoryview(buffer)[:n])
+            self.bytes += n
+        return n
+
+    def hexdigest(self):
+        return self.digest.hexdigest()
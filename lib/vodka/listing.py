@@ -0,0 +1,74 @@
+"""The version listing behind `vodka list`.
+
+Each stage is a generator: catalog entries (or search matches) are joined
+with their install status and filtered one at a time, and only the
+requested page is kept, so listing a large catalog doesn't build a row for
+every version.
+"""
+import heapq
+
+
+def iter_versions(catalog, status, query=None, installed_only=False):
+    """Yield (rank, position, category id, entry) for every listed version.
+
+    Versions come in catalog order. Without a query every version has rank
+    0; with one, only matches are yielded, ranked as by SearchIndex.search().
+    Versions in categories the catalog doesn't list are skipped.
+    """
+    listed = {category['id'] for category in catalog.categories}
+    if query:
+        matches = ((rank, position, *catalog.entry_at(position))
+                   for rank, position in catalog.search_index().search(query))
+    else:
+        matches = ((0, position, category_id, entry)
+                   for position, (category_id, entry) in enumerate(catalog.iter_entries()))
+    for rank, position, category_id, entry in matches:
+        if category_id not in listed:
+            continue
+        if installed_only and not status.is_installed(entry['name']):
+            continue
+        yield rank, position, category_id, entry
+
+
+def _row(status, category_name, entry, rank):
+    return {
+        'category': category_name,
+        'name': entry['name'],
+        'title': entry.get('title', entry['name']),
+        'installed': status.is_installed(entry['name']),
+        'default': status.is_default(entry['name']),
+        'rank': rank,
+    }
+
+
+def iter_rows(catalog, status, query=None, installed_only=False):
+    """Yield the listing row of every listed version, in catalog order."""
+    category_names = {category['id']: category['name'] for category in catalog.categories}
+    for rank, _, category_id, entry in iter_versions(catalog, status, query, installed_only):
+        yield _row(status, category_names[category_id], entry, rank)
+
+
+def version_page(catalog, status, query=None, installed_only=False, page=1, page_size=10):
+    """Return (rows, total) for one page of the listing.
+
+    Rows are ordered best match first, then by category name and natural
+    version order. Only the first page * page_size versions are held while
+    the others stream past; total counts all listed versions.
+    """
+    index = catalog.search_index()
+    category_names = {category['id']: category['name'] for category in catalog.categories}
+    total = 0
+
+    def keyed():
+        nonlocal total
+        for rank, position, category_id, _ in iter_versions(catalog, status, query,
+                                                            installed_only):
+            total += 1
+            yield rank, category_names[category_id], index.order[position], position
+
+    top = heapq.nsmallest(page * page_size, keyed())
+    rows = []
+    for rank, _, _, position in top[(page - 1) * page_size:]:
+        category_id, entry = catalog.entry_at(position)
+        rows.append(_row(status, category_names[category_id], entry, rank))
+    return rows, total
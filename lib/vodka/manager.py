@@ -1,82 +1,190 @@
-import json
 import os
-import tarfile
-import urllib.request
 from pathlib import Path
-import subprocess
+import threading
+import time
+
+from . import trace
+from .catalog import Catalog
+from .configManager import ConfigManager
+from .manifest import ManifestStore
+from .status import StatusSnapshot, default_version_name
+
+# Downloading, extracting and running Wine pull in urllib, tarfile,
+# subprocess and asyncio. Those modules are imported by the methods that
+# need them, so that read-only commands like "vodka list" start quickly.
 
 class VodkaManager:
+    VERSIONS_URL = "https://raw.githubusercontent.com/MVDW-Java/vodka/main/data/wine.json"
+    COMPONENTS_URL = "https://raw.githubusercontent.com/MVDW-Java/vodka/main/data/components.json"
+
     def __init__(self, base_dir=None):
         self.base_dir = Path(base_dir) if base_dir else Path.home() / ".vodka"
         self.versions_file = self.base_dir / "versions.json"
         self.components_file = self.base_dir / "components.json"
         self.default_link = self.base_dir / "default"
         self.components_dir = self.base_dir / "components"
+        self.store_dir = self.base_dir / "store"
+        self.templates_dir = self.base_dir / "templates"
+        self.usage_dir = self.base_dir / "usage"
+        self.locks_dir = self.base_dir / "locks"
+        self.staging_dir = self.base_dir / ".staging"
+        self.manifests = ManifestStore(self.base_dir / "manifests")
+        self.config = ConfigManager(self.base_dir)
+        self._downloads_dir = None
+        self._downloader = None
+        self._usage = None
+        self._wineserver_pool = None
+
+    def _ensure_dirs(self):
+        """Create base_dir and components_dir before writing to them."""
         self.base_dir.mkdir(exist_ok=True)
         self.components_dir.mkdir(exist_ok=True)
 
+    @property
+    def downloads_dir(self):
+        if self._downloads_dir is None:
+            self._downloads_dir = Path(self.config.get("downloads_dir"))
+        return self._downloads_dir
+
+    @property
+    def downloader(self):
+        if self._downloader is None:
+            from .downloader import Downloader
+            self._downloader = Downloader(
+                self.downloads_dir, self.config.get("download_connections", 4))
+        return self._downloader
+
+    @property
+    def usage(self):
+        """Last-used times of versions, components and downloads, for gc()."""
+        if self._usage is None:
+            from .collector import UsageLog
+            self._usage = UsageLog(self.usage_dir)
+        return self._usage
+
+    def _fetch(self, uri, sha256=None, size=None):
+        """Download uri into the download cache, recording the artifact as used."""
+        archive_path = self.downloader.fetch(uri, sha256, size)
+        self.usage.touch("downloads", archive_path.name)
+        return archive_path
+
     def download_versions(self):
-        """Download the versions list from the repository."""
-        versions_url = "https://raw.githubusercontent.com/MVDW-Java/vodka/main/data/wine.json"
+        """Download the versions list from the repository if it changed."""
+        from .refresh import fetch_catalog
+        self._ensure_dirs()
         try:
-            urllib.request.urlretrieve(versions_url, self.versions_file)
+            result = fetch_catalog(self.VERSIONS_URL, self.versions_file)
+            self._index_versions(result)
             return True
         except Exception as e:
             raise Exception(f"Error downloading versions: {e}")
 
-    def load_versions(self):
-        """Load and return the versions list."""
+    def _index_versions(self, result):
+        # Build the search index now rather than on the next `vodka list`
+        if result["status"] != "not_modified":
+            Catalog.load(self.versions_file).search_index()
+
+    def versions_catalog(self):
+        """Return the indexed versions catalog, downloading it if missing."""
         if not self.versions_file.exists():
             self.download_versions()
-        with open(self.versions_file) as f:
-            data = json.load(f)
-            # Flatten versions from all categories into a single list
-            versions = []
-            for category_versions in data['versions'].values():
-                versions.extend(category_versions)
-            return versions
-    # Add these new methods
+        return Catalog.load(self.versions_file)
+
+    def load_versions(self):
+        """Load and return the versions list."""
+        # Flatten versions from all categories into a single list
+        return self.versions_catalog().entries()
 
     def download_components(self):
-        """Download the components list from the repository."""
-        components_url = "https://raw.githubusercontent.com/MVDW-Java/vodka/main/data/components.json"
+        """Download the components list from the repository if it changed."""
+        from .refresh import fetch_catalog
+        self._ensure_dirs()
         try:
-            urllib.request.urlretrieve(components_url, self.components_file)
+            fetch_catalog(self.COMPONENTS_URL, self.components_file)
             return True
         except Exception as e:
             raise Exception(f"Error downloading components: {e}")
 
-    def load_components(self):
-        """Load and return the components list."""
+    def refresh_all(self):
+        """Refresh the versions and components lists at the same time.
+
+        Returns per-catalog results from fetch_catalog plus totals: bytes
+        transferred, bytes saved by 304 responses and gzip, and seconds
+        saved by fetching both catalogs concurrently.
+        """
+        from concurrent.futures import ThreadPoolExecutor
+        from .refresh import fetch_catalog
+        self._ensure_dirs()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            versions = pool.submit(fetch_catalog, self.VERSIONS_URL, self.versions_file)
+            components = pool.submit(fetch_catalog, self.COMPONENTS_URL, self.components_file)
+            try:
+                results = {"versions": versions.result(), "components": components.result()}
+            except Exception as e:
+                raise Exception(f"Error refreshing lists: {e}")
+        seconds = time.perf_counter() - start
+        self._index_versions(results["versions"])
+
+        transferred = sum(r["bytes_transferred"] for r in results.values())
+        return {
+            **results,
+            "bytes_transferred": transferred,
+            "bytes_saved": sum(r["bytes_full"] for r in results.values()) - transferred,
+            "seconds": seconds,
+            "seconds_saved": max(0.0, sum(r["seconds"] for r in results.values()) - seconds),
+        }
+
+    def components_catalog(self):
+        """Return the indexed components catalog, downloading it if missing."""
         if not self.components_file.exists():
             self.download_components()
-        with open(self.components_file) as f:
-            data = json.load(f)
-            components = []
-            for category_components in data['versions'].values():
-                components.extend(category_components)
-            return components
+        return Catalog.load(self.components_file)
+
+    def load_components(self):
+        """Load and return the components list."""
+        return self.components_catalog().entries()
 
     def find_component(self, component_name):
         """Find a component in any category by name"""
         try:
-            with open(self.components_file) as f:
-                data = json.load(f)
-
-            for category_components in data['versions'].values():
-                for component in category_components:
-                    if component['name'].lower() == component_name.lower():
-                        return component
-            return None
+            return Catalog.load(self.components_file).get(component_name)
         except Exception as e:
             raise Exception(f"Error finding component: {e}")
 
+    def _install_lock(self, kind, name, progress=None):
+        """Lock installing a version or component against other threads and processes."""
+        from .util import file_lock
+        return file_lock(self.locks_dir / f"{kind}-{name}.lock", lambda: self._report(
+            progress, name, "waiting", f"Waiting for another install of {name}..."))
+
+    def _staging(self, kind, name):
+        """Return an empty directory to extract an archive into before it is moved into place.
+
+        Call with the install lock held: anything already there was left
+        behind by an install that crashed.
+        """
+        staging = self.staging_dir / f"{kind}-{name}"
+        if staging.exists():
+            import shutil
+            shutil.rmtree(staging)
+        staging.mkdir(parents=True)
+        return staging
+
+    @staticmethod
+    def _staged_tree(staging, name):
+        """Return the directory an archive extracted into staging unpacked name into."""
+        staged_dir = staging / name
+        if not staged_dir.is_dir():
+            raise Exception(f"Archive has no top-level directory {name}")
+        return staged_dir
+
     def is_component_installed(self, component_name):
         """Check if a specific component is installed."""
         return (self.components_dir / component_name).exists()
 
-    def install_component(self, component_name, prefix_path=None):
-        """Install a specific component into a Wine prefix"""
+    def _prepare_component(self, component_name, stream=False):
+        """Find a component and make sure it is downloaded and extracted."""
         component = self.find_component(component_name)
         if not component:
             raise Exception(f"Component {component_name} not found")
@@ -84,45 +192,157 @@ class VodkaManager:
         install_dir = self.components_dir / component["name"]
         if not install_dir.exists():
             # Download and extract if not already done
-            self._download_and_extract_component(component)
+            with self._install_lock("component", component["name"]):
+                if not install_dir.exists():
+                    self._download_and_extract_component(component, stream)
+        self.usage.touch("components", component["name"])
+        return component, install_dir
+
+    def install_component(self, component_name, prefix_path=None, stream=False,
+                          deploy_mode=None):
+        """Install a specific component into a Wine prefix
+
+        deploy_mode is "copy", "hardlink" or "symlink" and controls how the
+        component's DLLs get into the prefix; it defaults to the
+        "component_deploy" config setting. prefix_path may also be a list
+        of paths or a glob pattern, see install_component_many(); the
+        result is False if it matched no prefix.
+        """
+        from glob import has_magic
+        if isinstance(prefix_path, (list, tuple)) or \
+                (prefix_path and has_magic(str(prefix_path))):
+            results = self.install_component_many(
+                component_name, prefix_path, stream=stream, deploy_mode=deploy_mode)
+            # A pattern that matched no prefix installed nothing
+            return bool(results) and all(result["success"] for result in results)
+
+        with trace.span("component.prepare", component=component_name):
+            component, install_dir = self._prepare_component(component_name, stream)
 
         if prefix_path:
             # Install into specified prefix
             from .component_installer import ComponentInstaller
-            installer = ComponentInstaller(prefix_path)
-            return installer.install_component(install_dir, component["installation"])
+            if deploy_mode is None:
+                deploy_mode = self.config.get("component_deploy", "copy")
+            installer = ComponentInstaller(prefix_path, deploy_mode, usage=self.usage)
+            with trace.span("component.install", component=component_name,
+                            prefix=str(prefix_path)):
+                return installer.install_component(install_dir, component["installation"])
 
         return True
 
-    def _download_and_extract_component(self, component):
-        """Helper method to download and extract component"""
-        tar_path = self.components_dir / f"{component['name']}.tar.gz"
+    def install_component_many(self, component_name, prefixes, max_workers=8,
+                               stream=False, deploy_mode=None):
+        """Install a component into many Wine prefixes in parallel.
+
+        prefixes is a path, a glob pattern or a list of either. The
+        component is downloaded and extracted once and then applied to every
+        prefix on a worker pool; a failing prefix doesn't stop the others.
+        Returns one {"prefix", "success", "error", "seconds"} dict per prefix.
+        """
+        import glob
+        if isinstance(prefixes, (str, os.PathLike)):
+            prefixes = [prefixes]
+        prefix_paths = []
+        for prefix in prefixes:
+            prefix = str(prefix)
+            if glob.has_magic(prefix):
+                prefix_paths.extend(sorted(glob.glob(prefix)))
+            else:
+                prefix_paths.append(prefix)
+        prefix_paths = list(dict.fromkeys(prefix_paths))
+        if not prefix_paths:
+            # Nothing to install into, so don't download the component
+            if not self.find_component(component_name):
+                raise Exception(f"Component {component_name} not found")
+            return []
+
+        component, install_dir = self._prepare_component(component_name, stream)
+        if deploy_mode is None:
+            deploy_mode = self.config.get("component_deploy", "copy")
+
+        from concurrent.futures import ThreadPoolExecutor
+        from .component_installer import ComponentInstaller
+
+        def apply(prefix_path):
+            start = time.perf_counter()
+            error = None
+            try:
+                installer = ComponentInstaller(prefix_path, deploy_mode, verbose=False,
+                                               usage=self.usage)
+                with trace.span("component.install", component=component_name,
+                                prefix=prefix_path):
+                    installed = installer.install_component(
+                        install_dir, component["installation"], raise_errors=True)
+                if not installed:
+                    error = f"Unsupported installation type {component['installation']['type']}"
+            except Exception as e:
+                error = str(e)
+            return {
+                "prefix": prefix_path,
+                "success": error is None,
+                "error": error,
+                "seconds": time.perf_counter() - start,
+            }
+
+        workers = max(1, min(max_workers, len(prefix_paths)))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(apply, prefix_paths))
+
+    def _download_and_extract_component(self, component, stream=False):
+        """Helper method to download and extract component
+
+        The archive is extracted into a staging directory and renamed into
+        components_dir when complete. Call with the component's install
+        lock held.
+        """
+        from .extractor import extract_archive, stream_extract
+        self._ensure_dirs()
+        install_dir = self.components_dir / component["name"]
+        staging = self._staging("component", component["name"])
         try:
-            print(f"Downloading component {component['name']}...")
-            urllib.request.urlretrieve(component["uri"], tar_path)
-
-            print(f"Extracting component {component['name']}...")
-            with tarfile.open(tar_path) as tar:
-                tar.extractall(self.components_dir)
-            tar_path.unlink()
+            if stream and self.downloader.cached_path(
+                    component["uri"], component.get("sha256"), component.get("size")) is None:
+                print(f"Downloading and extracting component {component['name']}...")
+                stream_extract(component["uri"], staging,
+                               sha256=component.get("sha256"), size=component.get("size"))
+                staged_dir = self._staged_tree(staging, component["name"])
+            else:
+                print(f"Downloading component {component['name']}...")
+                archive_path = self._fetch(component["uri"], component.get("sha256"),
+                                           component.get("size"))
+
+                print(f"Extracting component {component['name']}...")
+                try:
+                    extract_archive(archive_path, staging)
+                    staged_dir = self._staged_tree(staging, component["name"])
+                except Exception:
+                    # Don't keep serving a cached artifact that can't be installed
+                    self.downloader.evict(component["uri"])
+                    raise
+            # One rename, so the component appears complete or not at all
+            os.rename(staged_dir, install_dir)
             return True
 
         except Exception as e:
-            if tar_path.exists():
-                tar_path.unlink()
             raise Exception(f"Component installation failed: {e}")
+        finally:
+            # Whatever else the archive contained, or a partial tree
+            import shutil
+            shutil.rmtree(staging, ignore_errors=True)
 
     def get_components(self):
         """Get a list of all components with their status."""
-        components = self.load_components()
-        return [{
-            "name": component["name"],
-            "installed": self.is_component_installed(component["name"])
-        } for component in components]
+        return self.get_status().components_status(self.load_components())
+
+    def get_status(self):
+        """Return a snapshot of installed and default versions and components."""
+        return StatusSnapshot(self.base_dir, self.default_link, self.components_dir,
+                              self.manifests)
 
     def is_installed(self, version_name):
         """Check if a specific version is installed."""
-        return (self.base_dir / version_name).exists()
+        return self.manifests.exists(version_name)
 
     def is_default(self, version_name):
         """Check if a specific version is set as default."""
@@ -138,13 +358,49 @@ class VodkaManager:
         if not self.is_installed(version_name):
             raise Exception(f"Version {version_name} is not installed")
 
-        if self.default_link.exists():
-            self.default_link.unlink()
-        self.default_link.symlink_to(self.base_dir / version_name)
+        from .util import file_lock
+        with file_lock(self.locks_dir / "default.lock"):
+            self._link_default(version_name)
         return True
 
-    def install_version(self, version_name):
-        """Install a specific version."""
+    def _link_default(self, version_name):
+        """Point the default link at version_name, replacing it in one step."""
+        tmp_link = self.default_link.with_name(
+            f".{self.default_link.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        if tmp_link.is_symlink():
+            tmp_link.unlink()
+        tmp_link.symlink_to(self.base_dir / version_name)
+        os.replace(tmp_link, self.default_link)
+
+    def _set_initial_default(self, version_name):
+        """Make version_name the default if no default version is set yet."""
+        from .util import file_lock
+        # Held across processes, so two first installs don't both set it
+        with file_lock(self.locks_dir / "default.lock"):
+            if not self.default_link.exists():
+                self._link_default(version_name)
+
+    def _report(self, progress, version_name, stage, message):
+        """Send an install stage to the progress callback, or print it."""
+        if progress is None:
+            print(message)
+        else:
+            progress(version_name, stage)
+
+    def dedup_store(self):
+        """Return the store used to share identical files between versions."""
+        from .dedup import DedupStore
+        return DedupStore(self.store_dir, self.config.get("dedup_mode", "auto"))
+
+    def install_version(self, version_name, stream=False, progress=None, dedup=None):
+        """Install a specific version.
+
+        With stream=True the archive is extracted while it downloads instead
+        of being written to disk first. If given, progress is called as
+        progress(version_name, stage) instead of printing status messages.
+        dedup links files shared with other versions into the dedup store;
+        it defaults to the "dedup" config setting.
+        """
         version = self.find_version(version_name)
         if not version:
             raise Exception(f"Version {version_name} not found")
@@ -153,90 +409,473 @@ class VodkaManager:
         if install_dir.exists():
             return False  # Already installed
 
-        # Download and extract
-        tar_path = self.base_dir / f"{version['name']}.tar.gz"
-        try:
-            print(f"Downloading {version['name']}...")
-            urllib.request.urlretrieve(version["uri"], tar_path)
-
-            print(f"Extracting {version['name']}...")
-            with tarfile.open(tar_path) as tar:
-                tar.extractall(self.base_dir)
-            tar_path.unlink()
-
-            # Set as default if it's the only version
-            installed_versions = [
-                d for d in self.base_dir.iterdir() if d.is_dir()]
-            if len(installed_versions) == 1:
-                self.set_default(version["name"])
+        if dedup is None:
+            dedup = self.config.get("dedup", False)
 
-            return True
-        except Exception as e:
-            # Clean up on failure
-            if tar_path.exists():
-                tar_path.unlink()
+        # Another process installing the same version finishes first, and
+        # this one then finds it installed
+        with self._install_lock("version", version["name"], progress):
             if install_dir.exists():
+                return False
+            return self._install_version(version, install_dir, stream, progress, dedup)
+
+    def _install_version(self, version, install_dir, stream, progress, dedup):
+        """Download and extract a version into staging, then move it into place."""
+        from .extractor import extract_archive, stream_extract
+        from .verify import build_file_manifest
+        self._ensure_dirs()
+        sha256, size = version.get("sha256"), version.get("size")
+        # sha256 of every extracted file, for the file manifest
+        digests = {}
+        staging = self._staging("version", version["name"])
+        moved = False
+
+        # Download and extract; archives already in the download cache are
+        # extracted from disk even in stream mode
+        with trace.span("install_version", version=version["name"], stream=stream):
+            try:
+                if stream and self.downloader.cached_path(version["uri"], sha256, size) is None:
+                    self._report(progress, version["name"], "downloading",
+                                 f"Downloading and extracting {version['name']}...")
+                    stream_extract(version["uri"], staging, digests=digests,
+                                   sha256=sha256, size=size)
+                    staged_dir = self._staged_tree(staging, version["name"])
+                else:
+                    self._report(progress, version["name"], "downloading",
+                                 f"Downloading {version['name']}...")
+                    archive_path = self._fetch(version["uri"], sha256, size)
+
+                    self._report(progress, version["name"], "extracting",
+                                 f"Extracting {version['name']}...")
+                    try:
+                        extract_archive(archive_path, staging, digests=digests)
+                        staged_dir = self._staged_tree(staging, version["name"])
+                    except Exception:
+                        # Don't keep serving a cached artifact that can't be installed
+                        self.downloader.evict(version["uri"])
+                        raise
+
+                if dedup:
+                    self._report(progress, version["name"], "deduplicating",
+                                 f"Deduplicating {version['name']}...")
+                    self.dedup_store().dedup_tree(staged_dir)
+
+                # Paths in it are relative, so it holds after the rename
+                files_manifest, tree_size = build_file_manifest(staged_dir, digests)
+                os.rename(staged_dir, install_dir)
+                moved = True
+                self.manifests.write_files(version["name"], files_manifest)
+                # Written last: a manifest means the version is fully installed
+                self.manifests.write(version, install_dir, size=tree_size)
+
+                # Set as default if it's the first version to be installed.
+                # The version is installed either way, so a failure here
+                # is reported rather than undoing the install
+                try:
+                    self._set_initial_default(version["name"])
+                except Exception as e:
+                    self._report(progress, version["name"], "default_failed",
+                                 f"Could not make {version['name']} the default version: {e}")
+
+                return True
+            except Exception as e:
+                # Clean up on failure; the install lock makes install_dir ours
+                self.manifests.remove(version["name"])
+                if moved:
+                    import shutil
+                    shutil.rmtree(install_dir)
+                raise Exception(f"Installation failed: {e}")
+            finally:
                 import shutil
-                shutil.rmtree(install_dir)
-            raise Exception(f"Installation failed: {e}")
+                shutil.rmtree(staging, ignore_errors=True)
+
+    def verify(self, version_name=None, full=False):
+        """Check installed versions against their per-file manifests.
+
+        Returns {version name: report} for version_name or every installed
+        version; see vodka.verify.verify_tree() for the report. Only files
+        whose size or mtime changed since the last check are hashed, unless
+        full is true. A version installed before file manifests existed has
+        one recorded from its current files and is reported with
+        "recorded": True.
+        """
+        from .verify import build_file_manifest, verify_tree
+        if version_name is not None and not self.manifests.exists(version_name):
+            raise Exception(f"Version {version_name} is not installed")
+        names = [version_name] if version_name is not None else sorted(self.manifests.names())
+        reports = {}
+        for name in names:
+            install_dir = self.base_dir / name
+            files_manifest = self.manifests.read_files(name)
+            recorded = files_manifest is None
+            if recorded:
+                files_manifest, _ = build_file_manifest(install_dir)
+            with trace.span("verify", version=name, full=full):
+                report, updated = verify_tree(install_dir, files_manifest, full)
+            if recorded or updated != files_manifest:
+                self.manifests.write_files(name, updated)
+            report["recorded"] = recorded
+            reports[name] = report
+        return reports
+
+    def dedup_versions(self):
+        """Deduplicate all installed versions against the dedup store.
+
+        Returns {"versions": {name: bytes_saved}, "bytes_saved": total}.
+        """
+        store = self.dedup_store()
+        saved = {}
+        for version_name in sorted(self.manifests.names()):
+            saved[version_name] = store.dedup_tree(self.base_dir / version_name)["bytes_saved"]
+        return {"versions": saved, "bytes_saved": sum(saved.values())}
+
+    def install_versions(self, version_names, max_workers=4, stream=False, progress=None):
+        """Install several versions concurrently on a bounded worker pool.
+
+        Each version succeeds or fails on its own. Returns a dict mapping
+        every requested name to {"status": "installed" | "already_installed"
+        | "failed", "error": message or None}.
+        """
+        version_names = list(dict.fromkeys(version_names))
+        if not version_names:
+            return {}
+
+        def install(version_name):
+            try:
+                if self.install_version(version_name, stream, progress):
+                    status = "installed"
+                else:
+                    status = "already_installed"
+                self._report(progress, version_name, status,
+                             f"{version_name}: {status.replace('_', ' ')}")
+                return {"status": status, "error": None}
+            except Exception as e:
+                self._report(progress, version_name, "failed",
+                             f"{version_name}: failed")
+                return {"status": "failed", "error": str(e)}
+
+        from concurrent.futures import ThreadPoolExecutor
+        workers = max(1, min(max_workers, len(version_names)))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return dict(zip(version_names, pool.map(install, version_names)))
 
     def get_versions(self):
         """Get a list of all versions with their status."""
-        versions = self.load_versions()
-        return [{
-            "name": version["name"],
-            "installed": self.is_installed(version["name"]),
-            "is_default": self.is_default(version["name"])
-        } for version in versions]
+        return self.get_status().versions(self.load_versions())
 
     def find_version(self, version_name):
         """Find a version in any category by name"""
         try:
-            with open(self.versions_file) as f:
-                data = json.load(f)
-
-            # Search through all categories
-            for category_versions in data['versions'].values():
-                for version in category_versions:
-                    # Case insensitive comparison of the full version string
-                    if version['name'].lower() == version_name.lower():
-                        return version
-            return None
+            # Case insensitive lookup of the full version string
+            return Catalog.load(self.versions_file).get(version_name)
         except Exception as e:
             raise Exception(f"Error finding version: {e}")
 
-    def execute(self, command):
-        """Execute a command in a specific version"""
+    def _wine_paths(self, version_name=None):
+        """Return the wine and wineserver binaries of a version (default: the default one)."""
+        if version_name is None:
+            version_name = default_version_name(str(self.base_dir), str(self.default_link))
+        if version_name is None:
+            raise Exception("No default version set")
+
+        manifest = self.manifests.read(version_name)
+        if manifest is None:
+            raise Exception(f"No install manifest for {version_name}; "
+                            "run 'vodka migrate' to create manifests for existing installs")
+        # Every caller is about to run this version
+        self.usage.touch("versions", version_name)
+        files = manifest.get('files', {})
+        wine_file = files.get('wine')
+        if wine_file is None:
+            raise Exception(f"No 'wine' file entry found for version {version_name}")
+        version_dir = self.base_dir / version_name
+        wine_path = version_dir / wine_file
+        wineserver_file = files.get('wineserver')
+        if wineserver_file is not None:
+            return wine_path, version_dir / wineserver_file
+        return wine_path, wine_path.with_name("wineserver")
+
+    def prefix_templates(self):
+        """Return the store of booted template prefixes."""
+        from .prefix_template import PrefixTemplates
+        return PrefixTemplates(self.templates_dir, self.config.get("prefix_clone_mode", "auto"))
+
+    def build_prefix_template(self, version_name=None, rebuild=False):
+        """Boot the template prefix of a version (default: the default one).
+
+        Returns {"version", "seconds"}; seconds is 0 if the template existed.
+        """
+        if version_name is None:
+            version_name = default_version_name(str(self.base_dir), str(self.default_link))
         try:
-            # version is default version
-            if not self.default_link.exists():
-                raise Exception("No default version set")
-
-            default_version_dir = self.default_link.resolve()
-
-            with open(self.versions_file) as f:
-                data = json.load(f)
-            wine_dir = None
-            for category_versions in data['versions'].values():
-                for v in category_versions:
-                    candidate_dir = self.base_dir / v['name']
-                    if candidate_dir.resolve() == default_version_dir:
-                        wine_file = v.get('files', {}).get('wine')
-                        if wine_file is None:
-                            raise Exception(f"No 'wine' file entry found for version {v['name']}")
-                        wine_dir = candidate_dir / wine_file
-                        break
-                if wine_dir is not None:
-                    break
-            if wine_dir is None:
-                raise Exception("Default version does not match any known version")
-
-            # Ensure wine_dir is a string and build the command as a list for subprocess
-            if isinstance(command, str):
-                command_list = [str(wine_dir)] + command.split()
-            else:
-                command_list = [str(wine_dir)] + list(command)
-            subprocess.run(command_list, text=True)
+            wine_path, wineserver_path = self._wine_paths(version_name)
+            seconds = self.prefix_templates().build(version_name, wine_path, wineserver_path,
+                                                    rebuild)
+            return {"version": version_name, "seconds": seconds}
+        except Exception as e:
+            raise Exception(f"Error building prefix template: {e}")
+
+    def create_prefix(self, prefix_path, version_name=None):
+        """Create a prefix by cloning the template of a version.
+
+        The template is booted first if it doesn't exist yet. Returns the
+        clone statistics of PrefixTemplates.clone() plus "version" and
+        "boot_seconds", the time spent booting the template in this call.
+        """
+        template = self.build_prefix_template(version_name)
+        try:
+            result = self.prefix_templates().clone(template["version"], prefix_path)
+        except Exception as e:
+            raise Exception(f"Error creating prefix: {e}")
+        return {**result, "version": template["version"], "boot_seconds": template["seconds"]}
+
+    def delete_prefix(self, prefix_path):
+        """Delete a Wine prefix, removing its directory tree in parallel.
+
+        Refuses directories that are neither empty nor look like a prefix.
+        Returns the seconds it took.
+        """
+        from .collector import remove_tree
+        prefix_path = Path(prefix_path)
+        if not prefix_path.is_dir() or prefix_path.is_symlink():
+            raise Exception(f"{prefix_path} is not a directory")
+        if any(prefix_path.iterdir()) and not any(
+                (prefix_path / name).exists() for name in ("system.reg", "user.reg", "drive_c")):
+            raise Exception(f"{prefix_path} doesn't look like a Wine prefix")
+        start = time.perf_counter()
+        try:
+            remove_tree(prefix_path)
+        except OSError as e:
+            raise Exception(f"Error deleting prefix: {e}")
+        return time.perf_counter() - start
+
+    def _gc_items(self):
+        """Return everything gc() may evict, with its size and last use."""
+        from .manifest import tree_size
+        default = default_version_name(str(self.base_dir), str(self.default_link))
+        items = []
+        for version_name in self.manifests.names():
+            manifest = self.manifests.read(version_name) or {}
+            template = self.templates_dir / version_name
+            size = manifest.get("size", 0)
+            if template.exists():
+                size += tree_size(template)
+            items.append({
+                "kind": "version", "name": version_name, "size": size,
+                "last_used": self.usage.last_used("versions", version_name,
+                                                  manifest.get("installed_at", 0)),
+                "protected": version_name == default,
+            })
+
+        # Symlinked DLLs point into the component directory; removing it
+        # would break every prefix the component was installed into. That
+        # is every component if symlinks are the default, otherwise those
+        # installed with deploy_mode="symlink", which the installer records
+        all_symlinked = self.config.get("component_deploy", "copy") == "symlink"
+        if self.components_dir.exists():
+            with os.scandir(self.components_dir) as entries:
+                for entry in entries:
+                    if not entry.is_dir(follow_symlinks=False):
+                        continue
+                    items.append({
+                        "kind": "component", "name": entry.name,
+                        "size": tree_size(entry.path),
+                        "last_used": self.usage.last_used("components", entry.name,
+                                                          entry.stat().st_mtime),
+                        "protected": all_symlinked or self.usage.last_used(
+                            "symlinked", entry.name) is not None,
+                    })
+
+        for sha256, artifact in self.downloader.artifacts().items():
+            items.append({
+                "kind": "download", "name": sha256, "size": artifact["size"],
+                "uris": artifact["uris"],
+                "last_used": self.usage.last_used(
+                    "downloads", sha256,
+                    os.stat(self.downloader.objects_dir / sha256).st_mtime),
+                "protected": False,
+            })
+        return items
+
+    def _evict(self, item):
+        from .collector import remove_tree
+        name = item["name"]
+        if item["kind"] == "version":
+            with self._install_lock("version", name):
+                # Uninstalled first, so a failed removal doesn't leave a
+                # half-deleted version that still looks installed
+                self.manifests.remove(name)
+                for path in (self.base_dir / name, self.templates_dir / name):
+                    if path.exists():
+                        remove_tree(path)
+            self.usage.forget("versions", name)
+        elif item["kind"] == "component":
+            with self._install_lock("component", name):
+                remove_tree(self.components_dir / name)
+            self.usage.forget("components", name)
+        else:
+            self.downloader.remove(name)
+            self.usage.forget("downloads", name)
+
+    def gc(self, quota=None, dry_run=False):
+        """Evict least recently used versions, components and downloads.
+
+        Items are removed, oldest use first, until everything together fits
+        in quota (a byte count or a size like "50G"; default: the
+        "gc_quota" setting). The default version is never evicted. With
+        dry_run nothing is removed. Returns {"quota", "used_before",
+        "used_after", "evicted": [{"kind", "name", "size", "last_used"}],
+        "dry_run"}.
+        """
+        from .collector import parse_size, plan_eviction
+        try:
+            quota = parse_size(quota if quota is not None else self.config.get("gc_quota"))
+        except ValueError as e:
+            raise Exception(f"Error collecting garbage: {e}")
+        if quota is None:
+            raise Exception("No quota given; pass one or set \"gc_quota\" in config.json")
+
+        with trace.span("gc", dry_run=dry_run) as span:
+            evict, used_before, used_after = plan_eviction(self._gc_items(), quota)
+            if not dry_run:
+                for item in evict:
+                    try:
+                        self._evict(item)
+                    except OSError as e:
+                        raise Exception(f"Error evicting {item['kind']} {item['name']}: {e}")
+                if evict and self.store_dir.exists():
+                    # Files of evicted versions may still be held by the store
+                    self.dedup_store().prune()
+            span.set(evicted=len(evict), bytes=used_before - used_after)
+        return {
+            "quota": quota,
+            "used_before": used_before,
+            "used_after": used_after,
+            "evicted": [{key: item[key] for key in ("kind", "name", "size", "last_used")}
+                        for item in evict],
+            "dry_run": dry_run,
+        }
+
+    def migrate_manifests(self):
+        """Write manifests for versions installed before manifests existed.
+
+        Directories in base_dir named after a catalog version are taken as
+        installs of it. Returns {"migrated": [names], "unknown": [names]},
+        unknown being directories without manifest the catalog doesn't know.
+        """
+        catalog = self.versions_catalog()
+        own_dirs = {self.components_dir, self.store_dir, self.manifests.manifests_dir,
+                    self.templates_dir, self.usage_dir, self.downloads_dir,
+                    self.locks_dir, self.staging_dir, Path(self.config.get("prefixes_dir"))}
+        migrated = []
+        unknown = []
+        with os.scandir(self.base_dir) as entries:
+            for entry in entries:
+                if (not entry.is_dir(follow_symlinks=False) or Path(entry.path) in own_dirs
+                        or self.manifests.exists(entry.name)):
+                    continue
+                version = catalog.get(entry.name)
+                if version is None or version["name"] != entry.name:
+                    unknown.append(entry.name)
+                    continue
+                self.manifests.write(version, entry.path, entry.stat().st_mtime)
+                migrated.append(entry.name)
+        return {"migrated": sorted(migrated), "unknown": sorted(unknown)}
+
+    def _command_list(self, wine_path, command):
+        """Build the argument list for running command with wine_path."""
+        if isinstance(command, str):
+            return [str(wine_path)] + command.split()
+        return [str(wine_path)] + list(command)
+
+    def wineserver_pool(self):
+        """Return the pool of persistent wineservers used by execute()."""
+        if self._wineserver_pool is None:
+            from .wineserver import WineServerPool
+            self._wineserver_pool = WineServerPool(
+                self.config.get("wineserver_idle_timeout", 300))
+        return self._wineserver_pool
+
+    def execute(self, command, prefix=None, persistent=None):
+        """Execute a command in the default version, returning its exit code.
+
+        With persistent (default: the "persistent_wineserver" setting) the
+        command runs against a wineserver that stays up between calls.
+        """
+        import subprocess
+        from .wineserver import prefix_env
+        try:
+            wine_path, wineserver_path = self._wine_paths()
+            env = prefix_env(prefix)
+            if persistent is None:
+                persistent = self.config.get("persistent_wineserver", False)
+            if persistent:
+                self.wineserver_pool().ensure(wineserver_path, env)
+
+            with trace.span("process.wine") as span:
+                returncode = subprocess.run(self._command_list(wine_path, command), env=env,
+                                            text=True).returncode
+                span.set(returncode=returncode)
+            return returncode
 
         except Exception as e:
             raise Exception(f"Error executing command: {e}")
+
+    def async_executor(self, prefix=None, max_concurrent=4, persistent=None):
+        """Return an AsyncExecutor for streaming commands in the default version."""
+        import functools
+        from .executor import AsyncExecutor
+        from .wineserver import prefix_env
+        try:
+            wine_path, wineserver_path = self._wine_paths()
+        except Exception as e:
+            raise Exception(f"Error executing command: {e}")
+        if persistent is None:
+            persistent = self.config.get("persistent_wineserver", False)
+        return AsyncExecutor(functools.partial(self._command_list, wine_path),
+                             prefix_env(prefix), max_concurrent,
+                             self.wineserver_pool() if persistent else None,
+                             wineserver_path)
+
+    def execute_many(self, commands, prefix=None, max_concurrent=4, on_output=None,
+                     persistent=None):
+        """Run commands concurrently, streaming their output to on_output.
+
+        Blocking wrapper around AsyncExecutor.run_many(); see there for the
+        callback and the returned list.
+        """
+        import asyncio
+        executor = self.async_executor(prefix, max_concurrent, persistent)
+        return asyncio.run(executor.run_many(commands, on_output))
+
+    def execute_batch(self, commands, prefix=None, stop_on_error=False):
+        """Run many commands one after another against one warm wineserver.
+
+        Returns a list of {"command", "returncode", "seconds"}.
+        """
+        import subprocess
+        from .wineserver import prefix_env
+        try:
+            wine_path, wineserver_path = self._wine_paths()
+            env = prefix_env(prefix)
+            pool = self.wineserver_pool()
+        except Exception as e:
+            raise Exception(f"Error executing commands: {e}")
+
+        results = []
+        for command in commands:
+            # Refreshes the server if it shut down while idle between commands
+            pool.ensure(wineserver_path, env)
+            start = time.perf_counter()
+            try:
+                with trace.span("process.wine") as span:
+                    returncode = subprocess.run(self._command_list(wine_path, command),
+                                                env=env).returncode
+                    span.set(returncode=returncode)
+            except OSError as e:
+                raise Exception(f"Error executing command: {e}")
+            results.append({"command": command, "returncode": returncode,
+                            "seconds": time.perf_counter() - start})
+            if returncode != 0 and stop_on_error:
+                break
+        return results
@@ -0,0 +1,100 @@
+import json
+import os
+import stat
+import time
+from pathlib import Path
+
+from .util import atomic_write
+
+MANIFEST_FORMAT = 1
+
+
+def tree_size(root):
+    """Return the total size of the regular files below root."""
+    total = 0
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            st = os.lstat(os.path.join(dirpath, name))
+            if stat.S_ISREG(st.st_mode):
+                total += st.st_size
+    return total
+
+
+class ManifestStore:
+    """Install manifests, one JSON file per installed version.
+
+    A manifest records what was installed: the version name, its binaries
+    map ("files"), the source URI, the size on disk and the install time.
+    It is written last, so an existing manifest also means the install
+    completed. Reading it is all execute() and the installed status need;
+    neither has to consult the catalog.
+
+    Next to it, <name>.files holds the per-file manifest `vodka verify`
+    checks the installed tree against (see vodka.verify).
+    """
+
+    def __init__(self, manifests_dir):
+        self.manifests_dir = Path(manifests_dir)
+
+    def path(self, version_name):
+        return self.manifests_dir / f"{version_name}.json"
+
+    def files_path(self, version_name):
+        return self.manifests_dir / f"{version_name}.files"
+
+    def read(self, version_name):
+        """Return the manifest of an installed version, or None."""
+        try:
+            with open(self.path(version_name)) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def exists(self, version_name):
+        return self.path(version_name).exists()
+
+    def names(self):
+        """Return the names of all versions that have a manifest."""
+        try:
+            with os.scandir(self.manifests_dir) as entries:
+                return {entry.name[:-5] for entry in entries
+                        if entry.name.endswith(".json")}
+        except FileNotFoundError:
+            return set()
+
+    def read_files(self, version_name):
+        """Return the per-file manifest of an installed version, or None."""
+        try:
+            with open(self.files_path(version_name)) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def write_files(self, version_name, files_manifest):
+        self.manifests_dir.mkdir(exist_ok=True)
+        atomic_write(self.files_path(version_name),
+                     json.dumps(files_manifest, separators=(",", ":")).encode())
+
+    def write(self, version, install_dir, installed_at=None, size=None):
+        """Write the manifest for a catalog entry installed in install_dir.
+
+        size, if known, saves walking install_dir to add it up.
+        """
+        manifest = {
+            "format": MANIFEST_FORMAT,
+            "name": version["name"],
+            "files": version.get("files", {}),
+            "uri": version.get("uri"),
+            "size": size if size is not None else tree_size(install_dir),
+            "installed_at": installed_at if installed_at is not None else time.time(),
+        }
+        self.manifests_dir.mkdir(exist_ok=True)
+        atomic_write(self.path(version["name"]), json.dumps(manifest, indent=4).encode())
+        return manifest
+
+    def remove(self, version_name):
+        for path in (self.path(version_name), self.files_path(version_name)):
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
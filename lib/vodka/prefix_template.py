@@ -0,0 +1,148 @@
+import errno
+import fnmatch
+import os
+import shutil
+import stat
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from . import trace
+from .dedup import UNSUPPORTED_ERRNOS, reflink
+from .wineserver import prefix_env
+
+# Files Wine rewrites in place while a prefix is in use. They are always
+# copied, never shared with the template.
+MUTABLE_PATTERNS = ("*.reg", ".update-timestamp")
+
+
+def _is_mutable(name):
+    return any(fnmatch.fnmatchcase(name, pattern) for pattern in MUTABLE_PATTERNS)
+
+
+class PrefixTemplates:
+    """Booted Wine prefixes, one per Wine version, to clone new prefixes from.
+
+    Booting a prefix with wineboot takes many seconds; cloning the result is
+    a tree walk. How the files of a clone relate to the template's depends
+    on mode:
+
+    - "auto": copy-on-write reflinks where the filesystem supports them
+      (btrfs, xfs, ...). Elsewhere files without write permission are
+      hardlinked and the rest copied.
+    - "hardlink": hardlink every file. Fast on any filesystem, but a
+      program that modifies a shared file in place changes it for the
+      template and every clone.
+    - "copy": plain copies.
+
+    Registry files are copied in every mode.
+    """
+
+    def __init__(self, templates_dir, mode="auto", workers=None):
+        if mode not in ("auto", "hardlink", "copy"):
+            raise ValueError(f"Unknown prefix clone mode: {mode}")
+        self.templates_dir = Path(templates_dir)
+        self.mode = mode
+        self.workers = workers or min(8, os.cpu_count() or 1)
+        self._reflink_works = mode == "auto"
+
+    def path(self, version_name):
+        return self.templates_dir / version_name
+
+    def exists(self, version_name):
+        return (self.path(version_name) / "system.reg").exists()
+
+    def build(self, version_name, wine_path, wineserver_path, rebuild=False):
+        """Boot the template prefix of a version, returning the seconds it took.
+
+        The prefix is booted in a temporary directory and renamed into
+        place once wineboot and the wineserver have finished.
+        """
+        template = self.path(version_name)
+        if self.exists(version_name) and not rebuild:
+            return 0.0
+        self.templates_dir.mkdir(parents=True, exist_ok=True)
+        tmp_dir = self.templates_dir / f".{version_name}.{os.getpid()}.tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        env = prefix_env(tmp_dir)
+        start = time.perf_counter()
+        try:
+            with trace.span("prefix.boot", version=version_name):
+                result = subprocess.run([str(wine_path), "wineboot", "--init"], env=env,
+                                        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                                        text=True)
+                if result.returncode != 0:
+                    raise Exception(f"wineboot failed: {result.stderr.strip()}")
+                # The registry is written when the wineserver exits
+                subprocess.run([str(wineserver_path), "-w"], env=env)
+            if not (tmp_dir / "system.reg").exists():
+                raise Exception("wineboot didn't create a prefix")
+            if template.exists():
+                shutil.rmtree(template)
+            os.replace(tmp_dir, template)
+        except BaseException:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+        return time.perf_counter() - start
+
+    def _clone_file(self, src, dst, st):
+        """Create dst from src, returning how: "reflink", "hardlink" or "copy"."""
+        if not _is_mutable(os.path.basename(src)):
+            if self._reflink_works:
+                try:
+                    reflink(src, dst)
+                    shutil.copystat(src, dst)
+                    return "reflink"
+                except OSError as e:
+                    if e.errno not in UNSUPPORTED_ERRNOS:
+                        raise
+                    self._reflink_works = False
+            if self.mode == "hardlink" or (self.mode == "auto"
+                                           and not st.st_mode & 0o222):
+                try:
+                    os.link(src, dst)
+                    return "hardlink"
+                except OSError as e:
+                    if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK):
+                        raise
+        shutil.copy2(src, dst)
+        return "copy"
+
+    def clone(self, version_name, dest):
+        """Create the prefix dest as a clone of a version's template.
+
+        dest must not exist or be empty. Returns {"files", "reflink",
+        "hardlink", "copy", "seconds"}.
+        """
+        template = self.path(version_name)
+        if not self.exists(version_name):
+            raise Exception(f"No prefix template for {version_name}")
+        dest = Path(dest)
+        if dest.exists() and any(dest.iterdir()):
+            raise Exception(f"{dest} already exists and is not empty")
+
+        start = time.perf_counter()
+        files = []
+        with trace.span("prefix.clone", version=version_name, prefix=str(dest)) as span:
+            for dirpath, dirnames, filenames in os.walk(template):
+                target_dir = os.path.join(dest, os.path.relpath(dirpath, template))
+                os.makedirs(target_dir, exist_ok=True)
+                # os.walk lists symlinks to directories as directories but
+                # doesn't descend into them
+                for name in dirnames + filenames:
+                    src = os.path.join(dirpath, name)
+                    st = os.lstat(src)
+                    dst = os.path.join(target_dir, name)
+                    if stat.S_ISLNK(st.st_mode):
+                        # dosdevices/c: -> ../drive_c, z: -> / and the like
+                        os.symlink(os.readlink(src), dst)
+                    elif stat.S_ISREG(st.st_mode):
+                        files.append((src, dst, st))
+
+            counts = {"reflink": 0, "hardlink": 0, "copy": 0}
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                for how in pool.map(lambda args: self._clone_file(*args), files):
+                    counts[how] += 1
+            span.set(files=len(files), **counts)
+        return {"files": len(files), **counts, "seconds": time.perf_counter() - start}
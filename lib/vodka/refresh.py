@@ -0,0 +1,109 @@
+import gzip
+import json
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+from .delta import DeltaError, apply_delta, delta_url
+from .util import atomic_write
+
+
+def _meta_path(dest):
+    return dest.with_name(f".{dest.name}.meta")
+
+
+def _load_meta(dest, url):
+    """Return the cache validators saved for dest, if they belong to url."""
+    try:
+        with open(_meta_path(dest)) as f:
+            meta = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+    return meta if meta.get("url") == url and dest.exists() else {}
+
+
+def _save_meta(dest, url, etag, last_modified, revision):
+    atomic_write(_meta_path(dest), json.dumps({
+        "url": url, "etag": etag, "last_modified": last_modified,
+        "revision": revision}).encode())
+
+
+def _read(request, timeout):
+    """Return (body, headers, bytes transferred) of request, gunzipped."""
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        body = response.read()
+        headers = response.headers
+    transferred = len(body)
+    if headers.get("Content-Encoding", "").lower() == "gzip":
+        body = gzip.decompress(body)
+    return body, headers, transferred
+
+
+def _fetch_delta(url, dest, meta, timeout):
+    """Bring dest up to date by applying the delta from its revision.
+
+    Returns None when there is no usable delta, so that the caller falls
+    back to downloading the full catalog.
+    """
+    request = urllib.request.Request(delta_url(url, meta["revision"]),
+                                     headers={"Accept-Encoding": "gzip"})
+    try:
+        body, _, transferred = _read(request, timeout)
+        delta = json.loads(body)
+        if delta["from"] == delta["to"] == meta["revision"]:
+            return {"status": "not_modified", "bytes_transferred": transferred,
+                    "bytes_full": dest.stat().st_size}
+        with open(dest, 'rb') as f:
+            data = apply_delta(json.load(f), delta)
+    except (urllib.error.URLError, OSError, ValueError, KeyError, TypeError, DeltaError):
+        return None
+
+    body = json.dumps(data).encode()
+    atomic_write(dest, body)
+    # The saved validators belong to the old file
+    _save_meta(dest, url, None, None, delta["to"])
+    return {"status": "patched", "bytes_transferred": transferred, "bytes_full": len(body)}
+
+
+def fetch_catalog(url, dest, timeout=30):
+    """Download a catalog file to dest unless the server says it is unchanged.
+
+    A catalog that was downloaded with a revision number is updated with
+    the delta from that revision when the server has one. Otherwise sends
+    the ETag/Last-Modified of the previous download, accepts gzip and only
+    replaces dest, atomically, once the new body parsed as JSON. Returns a
+    dict describing what was transferred.
+    """
+    dest = Path(dest)
+    meta = _load_meta(dest, url)
+    start = time.perf_counter()
+    if meta.get("revision") is not None:
+        result = _fetch_delta(url, dest, meta, timeout)
+        if result is not None:
+            result["seconds"] = time.perf_counter() - start
+            return result
+
+    headers = {"Accept-Encoding": "gzip"}
+    if meta.get("etag"):
+        headers["If-None-Match"] = meta["etag"]
+    if meta.get("last_modified"):
+        headers["If-Modified-Since"] = meta["last_modified"]
+    try:
+        body, response_headers, transferred = _read(
+            urllib.request.Request(url, headers=headers), timeout)
+    except urllib.error.HTTPError as e:
+        if e.code != 304:
+            raise
+        size = dest.stat().st_size
+        return {"status": "not_modified", "bytes_transferred": 0,
+                "bytes_full": size, "seconds": time.perf_counter() - start}
+
+    data = json.loads(body)  # Never replace a good catalog with a broken one
+    revision = data.get("revision") if isinstance(data, dict) else None
+
+    atomic_write(dest, body)
+    _save_meta(dest, url, response_headers.get("ETag"),
+               response_headers.get("Last-Modified"), revision)
+    return {"status": "updated", "bytes_transferred": transferred,
+            "bytes_full": len(body), "seconds": time.perf_counter() - start}
@@ -0,0 +1,285 @@
+import os
+import re
+import time
+from pathlib import Path
+
+from . import trace
+
+# Section headers are the only lines that start with "["; values and their
+# hex continuation lines never do. Matching the preceding newline instead of
+# using re.MULTILINE's "^" keeps the scan an order of magnitude faster.
+_HEADER_RE = re.compile(rb'\n\[([^\n]*)\]')
+
+# Seconds between the Windows FILETIME epoch (1601) and the Unix epoch
+_FILETIME_EPOCH_OFFSET = 11644473600
+
+# Wine writes .reg files as ASCII with escapes; surrogateescape round-trips
+# anything else byte for byte
+_ENCODING = 'utf-8'
+_ERRORS = 'surrogateescape'
+
+
+def _escape(text):
+    return text.replace('\\', '\\\\').replace('"', '\\"')
+
+
+def _unescape(text):
+    return re.sub(r'\\(.)', r'\1', text)
+
+
+def _escape_path(section):
+    return section.replace('\\', '\\\\')
+
+
+def _filetime(now):
+    """Return now as the hex FILETIME Wine writes in #time= lines."""
+    return f"{int((now + _FILETIME_EPOCH_OFFSET) * 10**7):x}"
+
+
+def _split_value(line):
+    """Split a value line into its lower-cased escaped name and data offset."""
+    if line.startswith('@'):
+        return '@', 2
+    i = 1
+    while i < len(line) and line[i] != '"':
+        i += 2 if line[i] == '\\' else 1
+    return line[1:i].lower(), i + 2
+
+
+def _header_name(header):
+    """Return the escaped key path from a "[path] timestamp" header line."""
+    return header[1:header.rfind(']')]
+
+
+class RegistrySection:
+    """One parsed key of a registry file: meta lines plus an index of values."""
+
+    def __init__(self, name, lines=()):
+        self.name = name
+        # [value name or None for "#..." meta lines, text, offset of the data]
+        self.entries = []
+        self.index = {}
+        i = 0
+        while i < len(lines):
+            line = lines[i]
+            if line.startswith('"') or line.startswith('@'):
+                text = [line]
+                # hex values continue on following lines after a trailing "\"
+                while text[-1].endswith('\\') and i + 1 < len(lines):
+                    i += 1
+                    text.append(lines[i])
+                key, offset = _split_value(line)
+                self.index[key] = len(self.entries)
+                self.entries.append([key, '\n'.join(text), offset])
+            elif line:
+                self.entries.append([None, line, 0])
+            i += 1
+
+    def get(self, key):
+        """Return the raw data of a value ("text" quoted, dword:..., hex:...)."""
+        position = self.index.get(key.lower())
+        if position is None:
+            return None
+        _, text, offset = self.entries[position]
+        return text[offset:]
+
+    def set(self, key, data):
+        line = f'"{key}"={data}'
+        entry = [key.lower(), line, len(key) + 3]
+        position = self.index.get(key.lower())
+        if position is None:
+            self.index[key.lower()] = len(self.entries)
+            self.entries.append(entry)
+        else:
+            self.entries[position] = entry
+
+    def delete(self, key):
+        position = self.index.pop(key.lower(), None)
+        if position is None:
+            return False
+        self.entries[position] = None
+        return True
+
+    def serialize(self, now):
+        lines = [f"[{self.name}] {int(now)}", f"#time={_filetime(now)}"]
+        for entry in self.entries:
+            if entry is None or (entry[0] is None and entry[1].startswith('#time=')):
+                continue
+            lines.append(entry[1])
+        return '\n'.join(lines) + '\n\n'
+
+
+class RegistryFile:
+    """A Wine registry file (user.reg, system.reg) opened for editing.
+
+    The file is read lazily and kept as raw bytes. Finding a section is a
+    search for its header as Wine spells it; only when that misses is a
+    case-insensitive index of all headers built. A section is parsed into
+    its values the first time it is read or changed. save() writes the
+    untouched byte ranges straight from the buffer, re-serializes changed
+    sections with a fresh timestamp, and replaces the file atomically.
+
+    Section names are registry paths with single backslashes, for example
+    r"Software\\Wine\\DllOverrides". Value names are case-insensitive, as
+    in Windows.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._data = None
+
+    def _load(self):
+        if self._data is not None:
+            return
+        with trace.span("registry.read", path=str(self.path)) as span:
+            with open(self.path, 'rb') as f:
+                self._data = f.read()
+            span.set(bytes=len(self._data))
+        # section key -> (start, end) of the sections located so far
+        self._spans = {}
+        # [(section key, start, end)] of every section, once fully indexed
+        self._order = None
+        self._sections = {}
+        # [(section key, span or None for new sections)] in change order
+        self._dirty = []
+
+    def _index_all(self):
+        """Record the span of every section without parsing any of them."""
+        if self._order is not None:
+            return
+        data = self._data
+        # The leading newline lets a header on the very first line match too;
+        # it shifts every match by one, so m.start() is the "[" in data
+        headers = [(m.start(), m.group(1)) for m in _HEADER_RE.finditer(b'\n' + data)]
+        ends = [start for start, _ in headers[1:]] + [len(data)]
+        self._order = []
+        for (start, name), end in zip(headers, ends):
+            key = name.decode(_ENCODING, _ERRORS).lower()
+            self._order.append((key, start, end))
+            # Wine never writes a key twice; if it happens, edit the first
+            self._spans.setdefault(key, (start, end))
+
+    def _find(self, escaped):
+        """Return the (start, end) span of a section, or None."""
+        key = escaped.lower()
+        if key in self._spans or self._order is not None:
+            return self._spans.get(key)
+
+        header = b'[' + escaped.encode(_ENCODING, _ERRORS) + b']'
+        if self._data.startswith(header):
+            start = 0
+        else:
+            start = self._data.find(b'\n' + header) + 1
+        if start == 0 and not self._data.startswith(header):
+            # Not spelled the way it was asked for; compare case-insensitively
+            self._index_all()
+            return self._spans.get(key)
+
+        end = self._data.find(b'\n[', start + 1) + 1
+        self._spans[key] = (start, end or len(self._data))
+        return self._spans[key]
+
+    def __contains__(self, section):
+        self._load()
+        escaped = _escape_path(section)
+        return escaped.lower() in self._sections or self._find(escaped) is not None
+
+    def sections(self):
+        """Return the names of all sections, in file order."""
+        self._load()
+        self._index_all()
+        names = []
+        for _, start, end in self._order:
+            header_end = self._data.find(b'\n', start, end)
+            header = self._data[start:end if header_end == -1 else header_end]
+            names.append(_header_name(header.decode(_ENCODING, _ERRORS)))
+        names.extend(self._sections[key].name for key, span in self._dirty if span is None)
+        return [name.replace('\\\\', '\\') for name in names]
+
+    def section(self, section, create=False):
+        """Return the parsed RegistrySection for section, or None."""
+        self._load()
+        escaped = _escape_path(section)
+        key = escaped.lower()
+        if key in self._sections:
+            return self._sections[key]
+        span = self._find(escaped)
+        if span is not None:
+            text = self._data[span[0]:span[1]].decode(_ENCODING, _ERRORS)
+            lines = text.split('\n')
+            parsed = RegistrySection(_header_name(lines[0]), lines[1:])
+        elif create:
+            parsed = RegistrySection(escaped)
+        else:
+            return None
+        self._sections[key] = parsed
+        return parsed
+
+    def _mark_dirty(self, section):
+        key = _escape_path(section).lower()
+        if all(dirty_key != key for dirty_key, _ in self._dirty):
+            self._dirty.append((key, self._spans.get(key)))
+
+    def get_value(self, section, name):
+        """Return a string value unquoted, other types as raw data, or None."""
+        parsed = self.section(section)
+        data = parsed.get(_escape(name)) if parsed else None
+        if data is not None and data.startswith('"') and data.endswith('"'):
+            return _unescape(data[1:-1])
+        return data
+
+    def set_value(self, section, name, value):
+        """Set a string value, creating the section if needed."""
+        parsed = self.section(section, create=True)
+        parsed.set(_escape(name), f'"{_escape(value)}"')
+        self._mark_dirty(section)
+
+    def delete_value(self, section, name):
+        """Remove a value, returning whether it existed."""
+        parsed = self.section(section)
+        if parsed is None or not parsed.delete(_escape(name)):
+            return False
+        self._mark_dirty(section)
+        return True
+
+    def save(self):
+        """Write pending changes, if any, through a temp file and a rename."""
+        if self._data is None or not self._dirty:
+            return False
+        now = time.time()
+        size = len(self._data)
+        # Changed sections in file order, then new ones at the end
+        changes = sorted((span[0], span[1], key) for key, span in self._dirty if span)
+        changes += [(size, size, key) for key, span in self._dirty if not span]
+
+        tmp_path = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+        data = memoryview(self._data)
+        try:
+            with trace.span("registry.write", path=str(self.path),
+                            sections=len(changes)), open(tmp_path, 'wb') as f:
+                position = 0
+                written = b''
+                for start, end, key in changes:
+                    if start > position:
+                        f.write(data[position:start])
+                        written = self._data[start - 2:start]
+                    # New sections need a blank line after whatever precedes them
+                    if start == size and written and not written.endswith(b'\n\n'):
+                        f.write(b'\n' if written.endswith(b'\n') else b'\n\n')
+                    written = self._sections[key].serialize(now).encode(_ENCODING, _ERRORS)
+                    f.write(written)
+                    position = end
+                f.write(data[position:])
+            if self.path.exists():
+                os.chmod(tmp_path, os.stat(self.path).st_mode & 0o7777)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if tmp_path.exists():
+                tmp_path.unlink()
+            raise
+        finally:
+            data.release()
+
+        # Offsets into the old buffer are stale; re-read on the next access
+        self._data = None
+        return True
@@ -0,0 +1,183 @@
+"""Search index over catalog entries.
+
+Entries are looked up through a trigram index: the candidates for a search
+are the entries containing its rarest trigram, and only those are checked
+for the search terms. Matches are ranked by where a term appears (whole
+name, start of the name, start of a word in it, elsewhere in it, title
+only). When nothing contains the terms, entries sharing most of their
+trigrams are returned instead, so small typos still find something.
+
+The natural version order, in which "GE-Proton9-9" sorts before
+"GE-Proton9-20", is computed with the index.
+
+The index only pays off for selective terms. A term shorter than a
+trigram has no postings and checks every entry, and every match is still
+ranked one by one. On a 100,000-entry catalog, a query matching a quarter
+or more of it ("proton", "9") takes about 8-17 ms (benchmarks/bench_search.py),
+no faster than the linear scan.
+"""
+import re
+from array import array
+from collections import Counter
+
+# Bump when the layout returned by SearchIndex.to_data() changes
+INDEX_FORMAT = 1
+
+# Share of a term's trigrams an entry needs to be a fuzzy match
+FUZZY_THRESHOLD = 0.5
+
+# Ranks of a match, best first
+RANK_NAME = 0
+RANK_NAME_PREFIX = 1
+RANK_WORD = 2
+RANK_NAME_SUBSTRING = 3
+RANK_TITLE = 4
+RANK_FUZZY = 5
+
+_NUMBER = re.compile(r'(\d+)')
+# Words are runs of letters or of digits: "GE-Proton9-20" is ge, proton, 9, 20
+_WORD_START = re.compile(r'(?<![a-z0-9])(?=[a-z0-9])|(?<=[a-z])(?=[0-9])|(?<=[0-9])(?=[a-z])')
+
+# Marks the start of each word in SearchIndex.words
+_MARK = "\x01"
+
+
+def version_key(name):
+    """Return a sort key that compares the numbers in name by value."""
+    parts = _NUMBER.split(name.lower())
+    # Strings and numbers alternate, so tuples compare position by position
+    parts[1::2] = map(int, parts[1::2])
+    return tuple(parts)
+
+
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class SearchIndex:
+    """Trigram index and natural version order of a list of catalog entries.
+
+    Positions refer to the list the index was built from. order[position]
+    is the entry's place when sorted by version_key() of its name.
+    """
+
+    def __init__(self, names, titles, words, order, postings):
+        # Lower-cased
+        self.names = names
+        self.titles = titles
+        # Lower-cased names with _MARK before every word, so matching a term
+        # marked the same way is a word match
+        self.words = words
+        self.order = order
+        # trigram -> positions, as the bytes of an array('I')
+        self._postings = postings
+
+    @classmethod
+    def build(cls, entries):
+        names = [entry['name'].lower() for entry in entries]
+        titles = [entry.get('title', '').lower() for entry in entries]
+        words = [_WORD_START.sub(_MARK, name) for name in names]
+        keys = [version_key(entry['name']) for entry in entries]
+        by_key = sorted(range(len(entries)), key=keys.__getitem__)
+        order = array('I', bytes(4 * len(entries)))
+        for place, position in enumerate(by_key):
+            order[position] = place
+        postings = {}
+        for position, (name, title) in enumerate(zip(names, titles)):
+            for trigram in _trigrams(name) | _trigrams(title):
+                positions = postings.get(trigram)
+                if positions is None:
+                    postings[trigram] = [position]
+                else:
+                    positions.append(position)
+        postings = {trigram: array('I', positions).tobytes()
+                    for trigram, positions in postings.items()}
+        return cls(names, titles, words, order, postings)
+
+    def to_data(self):
+        """Return the index as plain data, for marshal."""
+        return (INDEX_FORMAT, self.names, self.titles, self.words, self.order.tobytes(),
+                self._postings)
+
+    @classmethod
+    def from_data(cls, data):
+        """Rebuild an index from to_data(), or return None if its format is stale."""
+        if not isinstance(data, tuple) or len(data) != 6 or data[0] != INDEX_FORMAT:
+            return None
+        order = array('I')
+        order.frombytes(data[4])
+        return cls(data[1], data[2], data[3], order, data[5])
+
+    def __len__(self):
+        return len(self.names)
+
+    def _positions(self, trigram):
+        positions = array('I')
+        positions.frombytes(self._postings.get(trigram, b""))
+        return positions
+
+    def _candidates(self, terms):
+        """Return the positions that may contain every term."""
+        best = None
+        for term in terms:
+            for trigram in _trigrams(term):
+                size = len(self._postings.get(trigram, b""))
+                if best is None or size < best[0]:
+                    best = (size, trigram)
+        if best is None:
+            # Every term is shorter than a trigram
+            return range(len(self.names))
+        return self._positions(best[1])
+
+    def _ranks(self, positions, term):
+        """Return (rank of term, position) for positions that contain term."""
+        names = self.names
+        words = self.words
+        word = _WORD_START.sub(_MARK, term)
+        # One expression rather than a loop body: this runs for every match
+        return [(RANK_TITLE if term not in names[p]
+                 else RANK_NAME_SUBSTRING if word not in words[p]
+                 else RANK_WORD if not words[p].startswith(word)
+                 else RANK_NAME if names[p] == term
+                 else RANK_NAME_PREFIX, p) for p in positions]
+
+    def _fuzzy(self, terms):
+        results = []
+        for term in terms:
+            trigrams = _trigrams(term)
+            if not trigrams:
+                return []
+            shared = Counter()
+            for trigram in trigrams:
+                shared.update(self._positions(trigram))
+            results.append({position: count / len(trigrams)
+                            for position, count in shared.items()
+                            if count / len(trigrams) >= FUZZY_THRESHOLD})
+        positions = set(results[0]).intersection(*results[1:])
+        # Higher similarity ranks first: 5.0 for all trigrams shared, up to 5.5
+        return [(RANK_FUZZY + 1 - min(result[position] for result in results), position)
+                for position in sorted(positions)]
+
+    def search(self, query):
+        """Return (rank, position) for every entry matching query.
+
+        Every whitespace-separated term of query must appear in the entry's
+        name or title; an entry ranks as well as its worst-placed term. If
+        no entry matches, fuzzy matches are returned with ranks from
+        RANK_FUZZY up, lower being more similar. Results are in position
+        order.
+        """
+        terms = list(dict.fromkeys(query.lower().split()))
+        if not terms:
+            return [(RANK_NAME, position) for position in range(len(self.names))]
+        names = self.names
+        titles = self.titles
+        positions = self._candidates(terms)
+        for term in terms:
+            positions = [p for p in positions if term in names[p] or term in titles[p]]
+        if not positions:
+            return self._fuzzy(terms)
+        results = [self._ranks(positions, term) for term in terms]
+        if len(results) == 1:
+            return results[0]
+        return [(max(rank for rank, _ in matches), matches[0][1]) for matches in zip(*results)]
@@ -0,0 +1,72 @@
+import os
+
+
+def _scandir_names(path):
+    """Return the names of all entries in path, or an empty set."""
+    try:
+        with os.scandir(path) as entries:
+            return {entry.name for entry in entries}
+    except FileNotFoundError:
+        return set()
+
+
+def default_version_name(base_dir, default_link):
+    """Return the version name the default link points at, or None."""
+    try:
+        target = os.readlink(default_link)
+    except OSError:
+        return None
+    target = os.path.join(os.path.dirname(default_link), target)
+    if not os.path.exists(target):
+        return None  # Dangling link
+
+    # The link is created as base_dir / <version>, but base_dir itself may
+    # be reached through a symlink, so also compare the resolved paths
+    if os.path.normpath(os.path.dirname(target)) == os.path.normpath(base_dir):
+        return os.path.basename(target)
+    resolved = os.path.realpath(target)
+    if os.path.dirname(resolved) == os.path.realpath(base_dir):
+        return os.path.basename(resolved)
+    return None
+
+
+class StatusSnapshot:
+    """Installed and default state of all versions and components.
+
+    Built from one directory scan of the install manifests and of
+    components_dir and one read of the default link, so checking many catalog entries costs no
+    extra filesystem calls. The snapshot does not update itself; take a
+    new one after installing or changing the default.
+    """
+
+    def __init__(self, base_dir, default_link, components_dir, manifests):
+        self.installed = manifests.names()
+        self.components = _scandir_names(components_dir)
+        self.default = default_version_name(str(base_dir), str(default_link))
+
+    def is_installed(self, version_name):
+        """Check if a specific version is installed."""
+        return version_name in self.installed
+
+    def is_default(self, version_name):
+        """Check if a specific version is set as default."""
+        return version_name == self.default and version_name in self.installed
+
+    def is_component_installed(self, component_name):
+        """Check if a specific component is installed."""
+        return component_name in self.components
+
+    def versions(self, versions):
+        """Join catalog entries with their status, like get_versions()."""
+        return [{
+            "name": version["name"],
+            "installed": self.is_installed(version["name"]),
+            "is_default": self.is_default(version["name"])
+        } for version in versions]
+
+    def components_status(self, components):
+        """Join component entries with their status, like get_components()."""
+        return [{
+            "name": component["name"],
+            "installed": self.is_component_installed(component["name"])
+        } for component in components]
@@ -0,0 +1,178 @@
+"""Timed spans and counters for the slow paths of Vodka.
+
+Instrumented code wraps work in span() and reports amounts with count():
+
+    with trace.span("download", uri=uri) as s:
+        ...
+        s.set(bytes=size)
+    trace.count("download.bytes", size)
+
+Both do nothing until tracing is turned on with enable() or by registering
+a hook; span() then hands out one shared no-op object, so disabled
+instrumentation costs a function call and a flag check. Finished spans and
+counter updates are passed to every hook as Chrome trace event dicts.
+After enable() they are also recorded for summary() and write_trace()
+(viewable in chrome://tracing or Perfetto); with hooks alone nothing is
+kept, so a long-running process that only streams events doesn't
+accumulate them.
+"""
+import json
+import os
+import threading
+import time
+
+_enabled = False
+# Whether events are kept for summary() and write_trace()
+_recording = False
+_lock = threading.Lock()
+_events = []
+_counters = {}
+_hooks = []
+_start = time.perf_counter()
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def set(self, **args):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.begin = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter()
+        if exc_type is not None:
+            self.args["error"] = str(exc)
+        _emit({
+            "name": self.name,
+            "cat": self.name.split(".", 1)[0],
+            "ph": "X",
+            "ts": (self.begin - _start) * 1e6,
+            "dur": (end - self.begin) * 1e6,
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+            "args": self.args,
+        })
+        return False
+
+    def set(self, **args):
+        """Attach values (bytes, files, ...) to the span."""
+        self.args.update(args)
+
+
+def _emit(event):
+    with _lock:
+        if _recording:
+            _events.append(event)
+        hooks = list(_hooks)
+    for hook in hooks:
+        hook(event)
+
+
+def enabled():
+    return _enabled
+
+
+def enable():
+    """Start tracing and recording events."""
+    global _enabled, _recording
+    _enabled = True
+    _recording = True
+
+
+def disable():
+    """Stop recording; hooks stay registered but are no longer called."""
+    global _enabled, _recording
+    _enabled = False
+    _recording = False
+
+
+def reset():
+    """Forget all recorded events and counters."""
+    with _lock:
+        _events.clear()
+        _counters.clear()
+
+
+def add_hook(hook):
+    """Call hook(event) for every finished span and counter update.
+
+    Registering a hook enables tracing, but events are only recorded for
+    write_trace() once enable() is called. Events are dicts in Chrome trace
+    format: "ph" is "X" for spans, with "dur" in microseconds, and "C" for
+    counters, with the running total in "args".
+    """
+    global _enabled
+    with _lock:
+        _hooks.append(hook)
+    _enabled = True
+
+
+def remove_hook(hook):
+    with _lock:
+        _hooks.remove(hook)
+
+
+def span(name, **args):
+    """Return a context manager timing the enclosed block as name."""
+    if not _enabled:
+        return _NULL_SPAN
+    return _Span(name, args)
+
+
+def count(name, value=1):
+    """Add value to the counter name."""
+    if not _enabled:
+        return
+    with _lock:
+        total = _counters[name] = _counters.get(name, 0) + value
+    _emit({
+        "name": name,
+        "ph": "C",
+        "ts": (time.perf_counter() - _start) * 1e6,
+        "pid": os.getpid(),
+        "tid": threading.get_ident(),
+        "args": {name: total},
+    })
+
+
+def counters():
+    """Return the current counter totals."""
+    with _lock:
+        return dict(_counters)
+
+
+def summary():
+    """Return {span name: {"count", "seconds"}} totals of the recorded spans."""
+    totals = {}
+    with _lock:
+        events = list(_events)
+    for event in events:
+        if event["ph"] == "X":
+            total = totals.setdefault(event["name"], {"count": 0, "seconds": 0.0})
+            total["count"] += 1
+            total["seconds"] += event["dur"] / 1e6
+    return totals
+
+
+def write_trace(path):
+    """Write the recorded events as a Chrome trace JSON file."""
+    with _lock:
+        data = {"traceEvents": list(_events), "otherData": {"counters": dict(_counters)}}
+    with open(path, 'w') as f:
+        json.dump(data, f)
@@ -1,3 +1,9 @@
+import contextlib
+import fcntl
+import os
+from pathlib import Path
+
+
 def createAPIResponse(response_code, data = None, reason = None):
     response = {
         "response_code" : response_code
@@ -10,3 +16,40 @@ def createAPIResponse(response_code, data = None, reason = None):
         response.update({"reason" : reason})
 
     return response
+
+
+def atomic_write(path, data):
+    """Replace path with data so readers see either the old or new file."""
+    path = Path(path)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if tmp_path.exists():
+            tmp_path.unlink()
+        raise
+
+
+@contextlib.contextmanager
+def file_lock(path, on_wait=None):
+    """Hold an exclusive lock on path against other threads and processes.
+
+    The lock is an flock() on the file, so it is released when its holder
+    exits, even by crashing. If another holder has it, on_wait() is called
+    before blocking until it is free. The lock file is left in place.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            if on_wait is not None:
+                on_wait()
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(fd)
@@ -0,0 +1,139 @@
+"""Per-file manifests of installed trees, and checking trees against them.
+
+A file manifest records, for every regular file below a version's
+directory, its size, mtime and sha256, and for every symlink its target:
+
+    {"format": 1, "files": {"bin/wine": [size, mtime_ns, sha256], ...},
+     "links": {"lib/libwine.so": "libwine.so.1", ...}}
+
+It is written at install time from digests taken while extracting, so
+recording it costs a stat per file. verify_tree() re-hashes only the files
+whose size or mtime differ from the manifest (all of them with full=True),
+on a thread pool, and returns the manifest with the new mtimes of files
+that turned out unchanged so the next run can skip them.
+"""
+import os
+import stat
+from concurrent.futures import ThreadPoolExecutor
+
+from .integrity import file_sha256
+
+FILES_FORMAT = 1
+
+
+def _walk(root, lstat=True):
+    """Yield (relative path, lstat result or None) for everything below root but directories."""
+    stack = [""]
+    while stack:
+        relative = stack.pop()
+        with os.scandir(os.path.join(root, relative)) as entries:
+            for entry in entries:
+                path = os.path.join(relative, entry.name) if relative else entry.name
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(path)
+                else:
+                    yield path, entry.stat(follow_symlinks=False) if lstat else None
+
+
+def _hash_all(root, paths, workers):
+    """Return {relative path: sha256} for paths below root, hashed in parallel."""
+    def digest(path):
+        try:
+            return path, file_sha256(os.path.join(root, path))
+        except OSError:
+            return path, None
+
+    workers = workers or min(8, os.cpu_count() or 1)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return dict(pool.map(digest, paths))
+
+
+def build_file_manifest(root, digests=None, workers=None):
+    """Record every file and symlink below root.
+
+    digests maps absolute paths to sha256 digests already known, e.g. from
+    extraction; other files are hashed. Returns (manifest, total size of
+    the regular files).
+    """
+    root = os.path.realpath(root)
+    digests = digests or {}
+    files = {}
+    links = {}
+    unknown = []
+    total = 0
+    for path, st in _walk(root):
+        if stat.S_ISLNK(st.st_mode):
+            links[path] = os.readlink(os.path.join(root, path))
+        elif stat.S_ISREG(st.st_mode):
+            digest = digests.get(os.path.join(root, path))
+            files[path] = [st.st_size, st.st_mtime_ns, digest]
+            total += st.st_size
+            if digest is None:
+                unknown.append(path)
+    for path, digest in _hash_all(root, unknown, workers).items():
+        files[path][2] = digest
+    return {"format": FILES_FORMAT, "files": files, "links": links}, total
+
+
+def verify_tree(root, manifest, full=False, workers=None):
+    """Check the tree at root against a file manifest.
+
+    Returns (report, manifest). The report lists "missing", "modified"
+    (content or symlink target changed, or a symlink became a file or the
+    other way round) and "added" paths, counts the files "checked" and
+    "hashed" and the "bytes_hashed". Files the dedup store shares are
+    hardlinks or reflinks, so they are still regular files and pass if
+    their content matches. The returned manifest carries the current
+    mtimes of files whose content matched.
+    """
+    root = os.path.realpath(root)
+    files = {path: list(record) for path, record in manifest.get("files", {}).items()}
+    links = manifest.get("links", {})
+    missing = []
+    modified = []
+    to_hash = []
+    stats = {}
+    for path, record in files.items():
+        full_path = os.path.join(root, path)
+        try:
+            st = os.lstat(full_path)
+        except OSError:
+            missing.append(path)
+            continue
+        if not stat.S_ISREG(st.st_mode):
+            modified.append(path)
+            continue
+        stats[path] = st
+        if full or st.st_size != record[0] or st.st_mtime_ns != record[1] or record[2] is None:
+            to_hash.append(path)
+    for path, target in links.items():
+        try:
+            if os.readlink(os.path.join(root, path)) != target:
+                modified.append(path)
+        except FileNotFoundError:
+            missing.append(path)
+        except OSError:
+            modified.append(path)  # No longer a symlink
+
+    hashed = _hash_all(root, to_hash, workers)
+    bytes_hashed = 0
+    for path, digest in hashed.items():
+        st = stats[path]
+        bytes_hashed += st.st_size
+        if digest is None or digest != files[path][2]:
+            modified.append(path)
+        else:
+            files[path][0:2] = [st.st_size, st.st_mtime_ns]
+
+    added = sorted(path for path, _ in _walk(root, lstat=False)
+                   if path not in files and path not in links)
+    report = {
+        "ok": not (missing or modified or added),
+        "missing": sorted(missing),
+        "modified": sorted(modified),
+        "added": added,
+        "checked": len(files) + len(links),
+        "hashed": len(hashed),
+        "bytes_hashed": bytes_hashed,
+    }
+    return report, {"format": FILES_FORMAT, "files": files, "links": links}
@@ -0,0 +1,70 @@
+import os
+import subprocess
+import threading
+import time
+from pathlib import Path
+
+from . import trace
+
+
+def prefix_env(prefix=None):
+    """Return the environment for running Wine in prefix (or the default one)."""
+    env = os.environ.copy()
+    if prefix is not None:
+        env["WINEPREFIX"] = str(Path(prefix).expanduser())
+    return env
+
+
+def _prefix_key(env):
+    prefix = env.get("WINEPREFIX") or str(Path.home() / ".wine")
+    return os.path.realpath(prefix)
+
+
+class WineServerPool:
+    """Persistent wineservers, one per Wine version and prefix.
+
+    A wine process that finds no wineserver for its prefix starts one,
+    boots the prefix and lets the server exit a few seconds after the last
+    client, so every cold command pays that startup again. The pool starts
+    the server itself with "wineserver -p<idle_timeout>", which keeps it
+    running for idle_timeout seconds after the last client is gone. Later
+    commands, also from other processes, attach to the warm server, and an
+    unused server still shuts itself down.
+    """
+
+    def __init__(self, idle_timeout=300):
+        self.idle_timeout = idle_timeout
+        # (wineserver path, prefix) -> time the server was last handed out
+        self._servers = {}
+        self._lock = threading.Lock()
+
+    def ensure(self, wineserver, env):
+        """Make sure a persistent wineserver is running for env's prefix."""
+        key = (str(wineserver), _prefix_key(env))
+        with self._lock:
+            last_used = self._servers.get(key)
+            now = time.monotonic()
+            if last_used is None or now - last_used >= self.idle_timeout:
+                # The command returns once the server accepts connections. It
+                # fails harmlessly when a server for the prefix already runs.
+                with trace.span("process.wineserver", prefix=key[1]):
+                    subprocess.run([str(wineserver), f"-p{int(self.idle_timeout)}"], env=env,
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            self._servers[key] = now
+
+    def shutdown(self, wineserver, env):
+        """Stop the wineserver for env's prefix, if one is running."""
+        key = (str(wineserver), _prefix_key(env))
+        with self._lock:
+            self._servers.pop(key, None)
+            subprocess.run([str(wineserver), "-k"], env=env,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    def shutdown_all(self):
+        """Stop every wineserver this pool started."""
+        with self._lock:
+            servers = list(self._servers)
+            self._servers.clear()
+        for wineserver, prefix in servers:
+            subprocess.run([wineserver, "-k"], env=prefix_env(prefix),
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)